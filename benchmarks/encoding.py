@@ -0,0 +1,106 @@
+"""
+Response encoding benchmark
+
+    python -m benchmarks.encoding
+    python -m benchmarks.encoding --visits 10 1000
+
+Compares JSON with MessagePack (encoding.py) for the /visits/ and
+/me/visits/ listings: payload size, raw and gzipped, and the median time to
+encode the validated response model and to decode the payload on the client.
+Both encodings start from the same validated models, so the time spent in
+validation is left out. Decoded JSON keeps dates and UUIDs as strings while
+MessagePack decodes them to date and UUID objects.
+"""
+
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from pydantic import TypeAdapter
+
+from getdigitalnomadapi.encoding import packb, unpackb
+from getdigitalnomadapi.models import VisitPublic, VisitsUserMePublicSummary
+
+REPEATS = 20
+LISTINGS = {
+    "/visits/": TypeAdapter(list[VisitPublic]),
+    "/me/visits/": TypeAdapter(VisitsUserMePublicSummary),
+}
+
+
+def make_listing(path: str, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    user_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(max(1, count // 50))]
+    day = date(2010, 1, 1)
+    visits = []
+    for i in range(count):
+        start = day + timedelta(days=rng.randint(1, 30))
+        day = start + timedelta(days=rng.randint(1, 60))
+        visits.append(
+            {
+                "id": i + 1,
+                "start": start,
+                "end": day if i < count - 1 else None,
+                "user_id": rng.choice(user_ids),
+                "country_id": rng.randint(1, 249),
+            }
+        )
+    if path == "/me/visits/":
+        return LISTINGS[path].validate_python({"num_visit": count, "visits": visits})
+    return LISTINGS[path].validate_python(visits)
+
+
+def median_ms(function, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        function(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def encode_json(adapter: TypeAdapter, value) -> bytes:
+    # What FastAPI's JSONResponse does with a response model
+    content = adapter.dump_python(value, mode="json")
+    return json.dumps(content, separators=(",", ":")).encode()
+
+
+def encode_msgpack(adapter: TypeAdapter, value) -> bytes:
+    return packb(adapter.dump_python(value))
+
+
+def run(counts: list[int]):
+    print(
+        f"{'listing':<12} {'visits':>7} {'format':<8} {'bytes':>10} {'gzip':>9}"
+        f" {'encode ms':>10} {'decode ms':>10}"
+    )
+    for path, adapter in LISTINGS.items():
+        for count in counts:
+            value = make_listing(path, count)
+            for name, encode, decode in (
+                ("json", encode_json, json.loads),
+                ("msgpack", encode_msgpack, unpackb),
+            ):
+                payload = encode(adapter, value)
+                print(
+                    f"{path:<12} {count:>7} {name:<8} {len(payload):>10}"
+                    f" {len(gzip.compress(payload)):>9}"
+                    f" {median_ms(encode, adapter, value):>10.2f}"
+                    f" {median_ms(decode, payload):>10.2f}"
+                )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.encoding")
+    parser.add_argument("--visits", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args(argv)
+    run(args.visits)
+
+
+if __name__ == "__main__":
+    main()
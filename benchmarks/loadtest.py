@@ -0,0 +1,313 @@
+"""
+HTTP load test for the API
+
+    python -m benchmarks.loadtest generate --database-url sqlite:///loadtest.db
+    python -m benchmarks.loadtest run --database-url sqlite:///loadtest.db --output results.json
+    python -m benchmarks.loadtest run --url http://localhost:8000 --output results.json
+    python -m benchmarks.loadtest compare old.json new.json
+
+`run` drives the ASGI app in-process against `--database-url` unless `--url`
+points at a running server. Results hold p50/p95/p99 latency and
+requests/sec per endpoint.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+from . import synthetic
+
+logger = logging.getLogger(__name__)
+
+PREFIX_API_V1 = "/api/v1"
+
+"""
+Scenarios
+    Each scenario makes one request as a virtual user and returns the
+    response; the key is the endpoint name used in the report.
+"""
+
+
+def _random_window(rng: random.Random, years: int) -> dict:
+    start = date(2010, 1, 1) + timedelta(days=rng.randrange(365 * 15))
+    return {
+        "start_dt": start.isoformat(),
+        "end_dt": (start + timedelta(days=365 * years)).isoformat(),
+    }
+
+
+async def login(client: httpx.AsyncClient, user: "VirtualUser"):
+    response = await client.post(
+        PREFIX_API_V1 + "/token/",
+        data={"username": user.email, "password": synthetic.PASSWORD},
+    )
+    if response.status_code == 200:
+        user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        if user.user_id is None:
+            # Once per virtual user, visit_write needs the id
+            me = await client.get(PREFIX_API_V1 + "/me/", headers=user.headers)
+            if me.status_code == 200:
+                user.user_id = me.json()["id"]
+    return response
+
+
+async def me_visits(client: httpx.AsyncClient, user: "VirtualUser"):
+    return await client.get(
+        PREFIX_API_V1 + "/me/visits/",
+        headers=user.headers,
+        params=_random_window(user.rng, 2),
+    )
+
+
+async def me_summary(client: httpx.AsyncClient, user: "VirtualUser"):
+    return await client.get(
+        PREFIX_API_V1 + "/me/summary/",
+        headers=user.headers,
+        params=_random_window(user.rng, 1),
+    )
+
+
+async def countries(client: httpx.AsyncClient, user: "VirtualUser"):
+    return await client.get(PREFIX_API_V1 + "/countries/")
+
+
+async def visit_write(client: httpx.AsyncClient, user: "VirtualUser"):
+    start = date(2026, 1, 1) + timedelta(days=user.rng.randrange(365))
+    return await client.post(
+        PREFIX_API_V1 + "/visits/",
+        headers=user.headers,
+        json={
+            "start": start.isoformat(),
+            "end": (start + timedelta(days=user.rng.randrange(1, 30))).isoformat(),
+            "user_id": user.user_id,
+            "country_id": user.rng.randrange(1, 250),
+        },
+    )
+
+
+SCENARIOS = {
+    "login": (login, 1),
+    "me_visits": (me_visits, 30),
+    "me_summary": (me_summary, 20),
+    "countries": (countries, 10),
+    "visit_write": (visit_write, 5),
+}
+
+
+class VirtualUser:
+    def __init__(self, index: int, users: int, seed: int):
+        self.rng = random.Random(seed * 1_000_003 + index)
+        self.email = synthetic.user_email(self.rng.randrange(users))
+        self.headers = {}
+        self.user_id = None
+
+
+"""
+Runner
+"""
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def build_report(samples: dict[str, list], elapsed: float, meta: dict) -> dict:
+    endpoints = {}
+    for name, rows in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in rows)
+        errors = sum(1 for _, status_code in rows if status_code >= 400)
+        endpoints[name] = {
+            "requests": len(rows),
+            "errors": errors,
+            "rps": round(len(rows) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "meta": {
+            **meta,
+            "elapsed_s": round(elapsed, 3),
+            "total_rps": round(total / elapsed, 2),
+        },
+        "endpoints": endpoints,
+    }
+
+
+async def _virtual_user(client, user, scenarios, weights, deadline, samples):
+    async def timed(name, scenario):
+        start = time.perf_counter()
+        try:
+            response = await scenario(client, user)
+            status_code = response.status_code
+        except httpx.HTTPError as e:
+            logger.warning("%s failed: %r", name, e)
+            status_code = 599
+        samples.setdefault(name, []).append((time.perf_counter() - start, status_code))
+
+    await timed("login", login)
+    names = list(scenarios)
+    while time.perf_counter() < deadline:
+        name = user.rng.choices(names, weights=weights)[0]
+        await timed(name, scenarios[name])
+
+
+async def run(
+    client: httpx.AsyncClient,
+    duration: float = 30.0,
+    concurrency: int = 20,
+    users: int = 100_000,
+    seed: int = 0,
+    scenarios: list[str] | None = None,
+) -> tuple[dict, float]:
+    selected = {name: SCENARIOS[name] for name in (scenarios or SCENARIOS)}
+    weights = [weight for _, weight in selected.values()]
+    samples: dict[str, list] = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(
+        *(
+            _virtual_user(
+                client,
+                VirtualUser(index, users, seed),
+                {name: scenario for name, (scenario, _) in selected.items()},
+                weights,
+                deadline,
+                samples,
+            )
+            for index in range(concurrency)
+        )
+    )
+    return samples, time.perf_counter() - start
+
+
+def in_process_client(database_url: str) -> httpx.AsyncClient:
+    """Client calling the ASGI app directly, with sessions on `database_url`"""
+    from sqlmodel import Session, create_engine
+
+    from getdigitalnomadapi.database import get_session
+    from getdigitalnomadapi.main import app
+
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+
+    def get_loadtest_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_loadtest_session
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://loadtest"
+    )
+
+
+"""
+Compare
+"""
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    lines = [f"{'endpoint':<14}{'metric':<8}{'old':>12}{'new':>12}{'change':>10}"]
+    for name in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        before = old["endpoints"].get(name, {})
+        after = new["endpoints"].get(name, {})
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            a, b = before.get(metric), after.get(metric)
+            change = f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+            lines.append(f"{name:<14}{metric:<8}{a!s:>12}{b!s:>12}{change:>10}")
+    return lines
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="create a synthetic database")
+    generate.add_argument("--database-url", default="sqlite:///loadtest.db")
+    generate.add_argument("--users", type=int, default=100_000)
+    generate.add_argument("--visits", type=int, default=5_000_000)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--countries-csv", default=synthetic.COUNTRIES_CSV)
+    generate.add_argument("--schengen-csv", default=synthetic.SCHENGEN_CSV)
+
+    load = commands.add_parser("run", help="run the scenarios and write a report")
+    load.add_argument("--url", help="base URL of a running server, default in-process")
+    load.add_argument("--database-url", default="sqlite:///loadtest.db")
+    load.add_argument("--users", type=int, default=100_000)
+    load.add_argument("--duration", type=float, default=30.0)
+    load.add_argument("--concurrency", type=int, default=20)
+    load.add_argument("--seed", type=int, default=0)
+    load.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    load.add_argument("--output", default="loadtest-results.json")
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "generate":
+        synthetic.generate(
+            args.database_url,
+            users=args.users,
+            visits=args.visits,
+            seed=args.seed,
+            countries_csv=args.countries_csv,
+            schengen_csv=args.schengen_csv,
+        )
+    elif args.command == "run":
+
+        async def run_load():
+            if args.url:
+                client = httpx.AsyncClient(base_url=args.url)
+            else:
+                client = in_process_client(args.database_url)
+            async with client:
+                return await run(
+                    client,
+                    duration=args.duration,
+                    concurrency=args.concurrency,
+                    users=args.users,
+                    seed=args.seed,
+                    scenarios=args.scenario,
+                )
+
+        samples, elapsed = asyncio.run(run_load())
+        report = build_report(
+            samples,
+            elapsed,
+            {
+                "target": args.url or f"in-process:{args.database_url}",
+                "concurrency": args.concurrency,
+                "duration_s": args.duration,
+                "seed": args.seed,
+                "python": platform.python_version(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+        for name, endpoint in report["endpoints"].items():
+            logger.info("%s %s", name, endpoint)
+    else:
+        with open(args.old) as old, open(args.new) as new:
+            print("\n".join(compare(json.load(old), json.load(new))))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Microbenchmarks for the hottest code paths
+
+    python -m benchmarks.micro                  # compare against baselines.json
+    python -m benchmarks.micro --update         # record new baselines
+    python -m benchmarks.micro --case summary   # only cases whose name contains "summary"
+
+Each case records the median wall time and the tracemalloc peak. The run
+fails (exit code 1) when a case is slower or uses more memory than its
+baseline by more than the tolerance (--tolerance or BENCH_TOLERANCE,
+default 0.25 = 25%). Baselines are machine specific, record them on the
+machine that runs the comparison.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from getdigitalnomadapi.dependencies import (
+    get_current_active_user,
+    get_current_admin_user,
+    get_current_user,
+)
+from getdigitalnomadapi.models import Country, User, Visit
+from getdigitalnomadapi.routers.me import process_summary
+from getdigitalnomadapi.security import create_access_token
+from getdigitalnomadapi.visitdays import VisitDays
+
+logger = logging.getLogger(__name__)
+
+BASELINES = Path(__file__).with_name("baselines.json")
+DEFAULT_TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25"))
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+MIN_TIME = 0.5  # seconds spent per case before stopping early
+
+"""
+Fixtures
+"""
+
+
+def make_countries(count: int = 249, schengen: int = 29) -> list[Country]:
+    return [
+        Country(id=i + 1, name=f"Country {i}", code=f"{i:03d}", schengen=i < schengen)
+        for i in range(count)
+    ]
+
+
+def make_visits(
+    count: int, years: int, countries: list[Country], seed: int = 0
+) -> tuple[list[Visit], date, date]:
+    """`count` visits of up to a month spread over `years` years, sorted by start"""
+    rng = random.Random(seed)
+    start_dt = date(2000, 1, 1)
+    end_dt = start_dt + timedelta(days=365 * years - 1)
+    span = (end_dt - start_dt).days
+    visits = []
+    for i in range(count):
+        start = start_dt + timedelta(days=rng.randrange(span))
+        country = countries[rng.randrange(len(countries))]
+        visits.append(
+            Visit(
+                id=i + 1,
+                start=start,
+                end=min(start + timedelta(days=rng.randrange(30)), end_dt),
+                country_id=country.id,
+                country=country,
+            )
+        )
+    visits.sort(key=lambda visit: visit.start)
+    return visits, start_dt, end_dt
+
+
+"""
+Cases
+    Each factory prepares its inputs and returns the callable to time.
+"""
+
+SUMMARY_CASES = [(10, 1), (100, 1), (100, 5), (1_000, 10), (1_000, 30), (10_000, 30)]
+
+
+def summary_case(count: int, years: int):
+    countries = make_countries()
+    visits, start_dt, end_dt = make_visits(count, years, countries)
+    visits = VisitDays.from_rows(
+        (visit.country_id, visit.start, visit.end) for visit in visits
+    )
+
+    def run():
+        process_summary(
+            start_dt=start_dt, end_dt=end_dt, visits=visits, countries=countries
+        )
+
+    return run
+
+
+def auth_case(depth: str):
+    """get_current_user -> get_current_active_user -> get_current_admin_user"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    user = User(
+        username="bench",
+        email="bench@example.com",
+        full_name="Bench",
+        hashed_password="not-used",
+        disabled=False,
+        admin=True,
+    )
+    session.add(user)
+    session.commit()
+    token = create_access_token(data={"sub": str(user.id)})
+    loop = asyncio.new_event_loop()
+
+    async def chain():
+        current_user = await get_current_user(token=token, session=session)
+        if depth in ("active", "admin"):
+            current_user = await get_current_active_user(current_user=current_user)
+        if depth == "admin":
+            current_user = await get_current_admin_user(current_user=current_user)
+        return current_user
+
+    def run():
+        loop.run_until_complete(chain())
+
+    return run
+
+
+CASES = {
+    **{
+        f"summary_{count}_visits_{years}y": (summary_case, (count, years))
+        for count, years in SUMMARY_CASES
+    },
+    "auth_current_user": (auth_case, ("user",)),
+    "auth_active_user": (auth_case, ("active",)),
+    "auth_admin_user": (auth_case, ("admin",)),
+}
+
+
+"""
+Runner
+"""
+
+
+def measure(run) -> dict:
+    run()  # warm up caches and lazy imports
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MAX_REPEATS:
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+        if len(timings) >= MIN_REPEATS and time.perf_counter() - started > MIN_TIME:
+            break
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "time_ms": round(statistics.median(timings) * 1000, 4),
+        "min_ms": round(min(timings) * 1000, 4),
+        "repeats": len(timings),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_cases(selected: list[str] | None = None) -> dict:
+    results = {}
+    for name, (factory, args) in CASES.items():
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        results[name] = measure(factory(*args))
+        logger.info("%s %s", name, results[name])
+    return results
+
+
+def compare(results: dict, baselines: dict, tolerance: float) -> list[str]:
+    """Return a line per regression beyond `tolerance`"""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        for metric in ("time_ms", "peak_kb"):
+            limit = baseline[metric] * (1 + tolerance)
+            if result[metric] > limit:
+                regressions.append(
+                    f"{name} {metric} {result[metric]} > {baseline[metric]} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.micro")
+    parser.add_argument("--update", action="store_true", help="rewrite baselines")
+    parser.add_argument("--case", action="append", help="substring of case names")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    results = run_cases(args.case)
+
+    baselines = {}
+    if args.baselines.exists():
+        baselines = json.loads(args.baselines.read_text())
+
+    if args.update:
+        baselines.update(results)
+        args.baselines.write_text(
+            json.dumps(baselines, indent=2, sort_keys=True) + "\n"
+        )
+        logger.info("Wrote %d baselines to %s", len(results), args.baselines)
+        return 0
+
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        logger.error("Regression: %s", regression)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import csv
+import logging
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import insert
+from sqlmodel import SQLModel, create_engine
+
+from getdigitalnomadapi import presence  # noqa: F401, creates visit_rtree
+from getdigitalnomadapi.models import Country, User, Visit
+from getdigitalnomadapi.security import get_password_hash
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES_CSV = "./data/countries_iso_3166_with_regional_codes.csv"
+SCHENGEN_CSV = "./data/countries_schengen_members.csv"
+PASSWORD = "loadtest"
+
+"""
+Synthetic dataset
+    Every user shares PASSWORD (hashed once) so load tests can log in as any
+    of them. Usernames and emails are derived from the user index, see
+    user_email().
+"""
+
+
+def user_email(index: int) -> str:
+    return f"user{index:07d}@loadtest.example"
+
+
+def read_countries(
+    countries_csv: str = COUNTRIES_CSV, schengen_csv: str = SCHENGEN_CSV
+) -> list[dict]:
+    """Same ISO 3166 and Schengen lists as seed.create_countries()"""
+    with open(schengen_csv, mode="r") as file:
+        schengen_members = {line.get("name") for line in csv.DictReader(file)}
+    with open(countries_csv, mode="r") as file:
+        return [
+            {
+                "name": line.get("name"),
+                "code": line.get("alpha-2"),
+                "schengen": line.get("name") in schengen_members,
+            }
+            for line in csv.DictReader(file)
+        ]
+
+
+def _insert_batches(connection, table, rows, batch_size: int) -> int:
+    total = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            connection.execute(insert(table), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        connection.execute(insert(table), batch)
+        total += len(batch)
+    return total
+
+
+def _visit_counts(rng: random.Random, users: int, visits: int) -> list[int]:
+    """Skewed split of `visits` across users, a few frequent travellers and a long tail"""
+    weights = [rng.paretovariate(2.0) for _ in range(users)]
+    scale = visits / sum(weights)
+    counts = [max(1, int(weight * scale)) for weight in weights]
+    # Hand out the rounding remainder, or take back what the floor of one
+    # visit added from the heaviest travellers, so the total is exact
+    # unless there are more users than visits
+    shortfall = visits - sum(counts)
+    for i in rng.sample(range(users), min(users, max(shortfall, 0))):
+        counts[i] += 1
+    for i in sorted(range(users), key=counts.__getitem__, reverse=True):
+        if shortfall >= 0:
+            break
+        taken = min(-shortfall, counts[i] - 1)
+        counts[i] -= taken
+        shortfall += taken
+    return counts
+
+
+def _user_visits(
+    rng: random.Random,
+    user_id: uuid.UUID,
+    count: int,
+    country_ids: list[int],
+    country_weights: list[float],
+    first_day: date,
+    last_day: date,
+    now: datetime,
+):
+    """Back to back, non-overlapping stays, most users travel a couple of times a month"""
+    span = (last_day - first_day).days
+    mean_gap = max(span / (count * 2), 1)
+    mean_stay = max(span / (count * 2), 1)
+    day = first_day + timedelta(days=rng.randrange(max(int(mean_gap), 1)))
+    countries = rng.choices(country_ids, weights=country_weights, k=count)
+    for i, country_id in enumerate(countries):
+        if day > last_day:
+            return
+        stay = 1 + int(rng.expovariate(1 / mean_stay))
+        end = min(day + timedelta(days=stay - 1), last_day)
+        still_visiting = i == count - 1 and rng.random() < 0.02
+        yield {
+            "created_at": now,
+            "updated_at": now,
+            "start": day,
+            "end": None if still_visiting else end,
+            "user_id": user_id,
+            "country_id": country_id,
+        }
+        day = end + timedelta(days=1 + int(rng.expovariate(1 / mean_gap)))
+
+
+def generate(
+    database_url: str,
+    users: int = 100_000,
+    visits: int = 5_000_000,
+    seed: int = 0,
+    first_day: date = date(2010, 1, 1),
+    last_day: date = date(2025, 12, 31),
+    batch_size: int = 50_000,
+    countries_csv: str = COUNTRIES_CSV,
+    schengen_csv: str = SCHENGEN_CSV,
+) -> dict:
+    """
+    Create the schema on `database_url` and fill it with a reproducible
+    dataset; the same seed always produces the same rows
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    engine = create_engine(database_url)
+    SQLModel.metadata.create_all(engine)
+    countries = read_countries(countries_csv, schengen_csv)
+    hashed_password = get_password_hash(PASSWORD)
+    start = time.perf_counter()
+
+    with engine.begin() as connection:
+        _insert_batches(
+            connection,
+            Country.__table__,
+            (
+                {**country, "created_at": now, "updated_at": now}
+                for country in countries
+            ),
+            batch_size,
+        )
+        country_ids = [
+            row.id
+            for row in connection.execute(
+                Country.__table__.select().order_by(Country.id)
+            )
+        ]
+
+    # Zipf-like popularity with a random (but seeded) order of countries
+    popularity = list(range(1, len(country_ids) + 1))
+    rng.shuffle(popularity)
+    country_weights = [1 / rank**1.1 for rank in popularity]
+
+    user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(users)]
+    with engine.begin() as connection:
+        _insert_batches(
+            connection,
+            User.__table__,
+            (
+                {
+                    "id": user_id,
+                    "created_at": now,
+                    "updated_at": now,
+                    "username": f"user{index:07d}",
+                    "email": user_email(index),
+                    "full_name": f"Load Test {index}",
+                    "disabled": False,
+                    "admin": False,
+                    "email_validated": True,
+                    "hashed_password": hashed_password,
+                }
+                for index, user_id in enumerate(user_ids)
+            ),
+            batch_size,
+        )
+
+    counts = _visit_counts(rng, users, visits)
+    with engine.begin() as connection:
+        visit_total = _insert_batches(
+            connection,
+            Visit.__table__,
+            (
+                visit
+                for user_id, count in zip(user_ids, counts)
+                for visit in _user_visits(
+                    rng,
+                    user_id,
+                    count,
+                    country_ids,
+                    country_weights,
+                    first_day,
+                    last_day,
+                    now,
+                )
+            ),
+            batch_size,
+        )
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "Generated %d countries, %d users, %d visits in %.1fs",
+        len(country_ids),
+        users,
+        visit_total,
+        elapsed,
+    )
+    return {"countries": len(country_ids), "users": users, "visits": visit_total}
@@ -0,0 +1,90 @@
+"""
+Worker boot time and memory, preloaded vs imported per worker
+
+    python -m benchmarks.workers --workers 4
+
+Starts the production server twice, once with --preload (the app imported
+in the parent before forking) and once with --no-preload (every worker
+imports it, as N independent processes would), and reports per worker the
+time from fork to ready and the private memory, i.e. the pages not shared
+with the parent or other workers. Linux only (/proc/<pid>/smaps_rollup).
+"""
+
+import argparse
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+from getdigitalnomadapi.server import private_memory_mb
+
+READY = re.compile(r"Worker \d+ \(pid (\d+)\) ready in (\d+) ms")
+BOOT_TIMEOUT = 60
+
+
+def measure(preload: bool, workers: int, port: int) -> dict:
+    command = [
+        sys.executable,
+        "-m",
+        "getdigitalnomadapi.server",
+        "--workers",
+        str(workers),
+        "--port",
+        str(port),
+        "--preload" if preload else "--no-preload",
+    ]
+    env = dict(os.environ, JOB_PROCESSES="0")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        command, stderr=subprocess.PIPE, text=True, env=env, bufsize=1
+    )
+    ready: dict[int, int] = {}
+    try:
+        deadline = time.monotonic() + BOOT_TIMEOUT
+        while len(ready) < workers and time.monotonic() < deadline:
+            line = process.stderr.readline()
+            if not line:
+                break
+            match = READY.search(line)
+            if match:
+                ready[int(match[1])] = int(match[2])
+        all_ready = time.perf_counter() - started
+        memory = [private_memory_mb(pid) or 0.0 for pid in ready]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.communicate(timeout=BOOT_TIMEOUT)
+    if len(ready) < workers:
+        raise RuntimeError(f"only {len(ready)} of {workers} workers became ready")
+    return {
+        "mode": "preload" if preload else "no-preload",
+        "all_ready_s": round(all_ready, 2),
+        "boot_ms": statistics.median(ready.values()),
+        "private_mb": round(statistics.median(memory), 1),
+        "total_private_mb": round(sum(memory), 1),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    results = [measure(preload, args.workers, args.port) for preload in (True, False)]
+    print(
+        f"{'mode':<12} {'all ready':>10} {'boot/worker':>12} "
+        f"{'private/worker':>15} {'private total':>14}"
+    )
+    for result in results:
+        print(
+            f"{result['mode']:<12} {result['all_ready_s']:>9.2f}s "
+            f"{result['boot_ms']:>10.0f}ms {result['private_mb']:>12.1f}MB "
+            f"{result['total_private_mb']:>12.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
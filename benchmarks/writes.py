@@ -0,0 +1,184 @@
+"""
+Write path benchmark
+
+    python -m benchmarks.writes --concurrency 8 --duration 10
+
+Counts the SQL statements each create, update and delete end-point runs,
+then measures write throughput with concurrent clients cycling through
+create -> patch -> delete of a visit, in-process against a fresh SQLite
+file.
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from getdigitalnomadapi import presence  # noqa: F401 visit_rtree with the tables
+from getdigitalnomadapi.database import get_session
+from getdigitalnomadapi.main import PREFIX_API_V1, app
+from getdigitalnomadapi.models import Country, User
+
+COUNTRIES = 20
+USERS = 200
+
+
+def setup(database_url: str):
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Country(name=f"Country {i}", code=f"C{i:02d}", schengen=i % 2 == 0)
+            for i in range(COUNTRIES)
+        )
+        session.add_all(
+            User(
+                username=f"writer{i}",
+                email=f"writer{i}@example.com",
+                full_name=f"Writer {i}",
+                hashed_password="-",
+                disabled=False,
+            )
+            for i in range(USERS)
+        )
+        session.commit()
+        user_ids = session.exec(select(User.id)).all()
+
+    def get_benchmark_session():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_benchmark_session
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://writes"
+    )
+    return engine, client, user_ids
+
+
+def visit_json(user_id, day: date) -> dict:
+    return {
+        "user_id": str(user_id),
+        "country_id": 1 + day.toordinal() % COUNTRIES,
+        "start": day.isoformat(),
+        "end": (day + timedelta(days=3)).isoformat(),
+    }
+
+
+"""
+Statements per operation
+"""
+
+
+async def count_statements(engine, client: httpx.AsyncClient, user_id) -> dict:
+    executed = []
+    event.listen(
+        engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: executed.append(statement),
+    )
+    counts = {}
+
+    async def measure(name: str, request):
+        before = len(executed)
+        response = await request
+        response.raise_for_status()
+        counts[name] = len(executed) - before
+        return response.json()
+
+    visits = PREFIX_API_V1 + "/visits/"
+    visit = await measure(
+        "create_visit", client.post(visits, json=visit_json(user_id, date(2001, 1, 1)))
+    )
+    await measure(
+        "update_visit",
+        client.patch(visits + str(visit["id"]), json={"end": "2001-01-09"}),
+    )
+    await measure("delete_visit", client.delete(visits + str(visit["id"])))
+
+    countries = PREFIX_API_V1 + "/countries/"
+    country = await measure(
+        "create_country", client.post(countries, json={"name": "New", "code": "NW"})
+    )
+    await measure(
+        "update_country",
+        client.patch(countries + str(country["id"]), json={"schengen": True}),
+    )
+    await measure("delete_country", client.delete(countries + str(country["id"])))
+
+    await measure(
+        "update_user",
+        client.patch(
+            PREFIX_API_V1 + f"/users/{user_id}", json={"full_name": "Renamed"}
+        ),
+    )
+    return counts
+
+
+"""
+Throughput
+"""
+
+
+async def writer(client, user_id, deadline: float, latencies: list, errors: list):
+    day = date(2002, 1, 1)
+    visits = PREFIX_API_V1 + "/visits/"
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        created = await client.post(visits, json=visit_json(user_id, day))
+        if created.status_code != 200:
+            errors.append(created.status_code)
+            continue
+        url = visits + str(created.json()["id"])
+        patched = await client.patch(url, json={"end": str(day + timedelta(days=5))})
+        deleted = await client.delete(url)
+        errors.extend(r.status_code for r in (patched, deleted) if r.status_code != 200)
+        latencies.append(time.perf_counter() - started)
+        day += timedelta(days=10)
+
+
+async def run(concurrency: int, duration: float):
+    with tempfile.TemporaryDirectory() as directory:
+        engine, client, user_ids = setup(f"sqlite:///{Path(directory) / 'writes.db'}")
+        async with client:
+            counts = await count_statements(engine, client, user_ids[0])
+            latencies: list[float] = []
+            errors: list[int] = []
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(
+                *(
+                    writer(client, user_ids[i + 1], deadline, latencies, errors)
+                    for i in range(concurrency)
+                )
+            )
+        engine.dispose()
+
+    print(f"{'operation':<16}{'statements':>11}")
+    for name, count in counts.items():
+        print(f"{name:<16}{count:>11}")
+    writes = 3 * len(latencies)
+    print(
+        f"\n{concurrency} writers, {duration:.0f}s: {writes / duration:.1f} writes/s, "
+        f"cycle p50 {statistics.median(latencies) * 1000:.1f} ms, "
+        f"{len(errors)} errors"
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.writes")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args(argv)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Visit change feed
+
+    python -m getdigitalnomadapi.changes compact
+
+Clients keep a copy of their visits and ask /me/visits/changes for what
+changed after their cursor. The routers record every visit write with
+log_visit_changes in the same transaction as the write. The command above
+removes old tombstones, run it daily.
+"""
+
+import argparse
+import logging
+import time
+import uuid
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Connection, and_, delete, func, insert, literal
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from .config import VISIT_CHANGES_RETENTION_DAYS
+from .database import engine
+from .models import (
+    Visit,
+    VisitChange,
+    VisitChangeHorizon,
+    VisitChangePublic,
+    VisitChanges,
+)
+
+logger = logging.getLogger(__name__)
+
+"""
+Change log
+    VisitChange keeps one row per (user, visit): the latest change, with
+    deleted set for a tombstone. A write replaces the row, so it gets the
+    next id and the log never holds more than one row per visit a user ever
+    had. Ids are the cursors; the visit itself is read from the visit table
+    when the changes are fetched, so an entry is the visit as it is now.
+
+    A visit moved to another user is a tombstone for the previous user and a
+    change for the new one. Tombstones older than VISIT_CHANGES_RETENTION_DAYS
+    are removed by compact_changes, which records the highest removed id per
+    user in VisitChangeHorizon. A cursor below the horizon may have missed a
+    delete and gets a full snapshot instead.
+"""
+
+
+def log_visit_changes(
+    session: Session, changes: Iterable[tuple[uuid.UUID | None, int, bool]]
+):
+    """Record (user_id, visit_id, deleted) changes. The caller commits."""
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "user_id": user_id,
+            "visit_id": visit_id,
+            "deleted": deleted,
+            "changed_at": now,
+        }
+        for user_id, visit_id, deleted in changes
+        if user_id is not None
+    ]
+    if rows:
+        # REPLACE deletes the previous row of the visit and inserts a new one
+        session.execute(insert(VisitChange).prefix_with("OR REPLACE"), rows)
+
+
+def log_visit_range_changes(
+    connection: Session | Connection,
+    first_id: int,
+    last_id: int,
+    deleted: bool = False,
+):
+    """
+    Record the visits with ids in [first_id, last_id] as changed, or deleted
+    when called before deleting them, for data migrations rewriting visits
+    in batches, see datamigrations.py. The caller commits.
+    """
+    visit = Visit.__table__
+    changed_at = literal(datetime.now(timezone.utc), VisitChange.changed_at.type)
+    connection.execute(
+        insert(VisitChange)
+        .prefix_with("OR REPLACE")
+        .from_select(
+            ["user_id", "visit_id", "deleted", "changed_at"],
+            select(visit.c.user_id, visit.c.id, literal(deleted), changed_at)
+            .where(visit.c.id.between(first_id, last_id))
+            .where(visit.c.user_id.is_not(None)),
+        )
+    )
+
+
+def forget_user_changes(session: Session, user_id: uuid.UUID):
+    """Remove the change log of a user about to be deleted"""
+    session.execute(delete(VisitChange).where(VisitChange.user_id == user_id))
+    session.execute(
+        delete(VisitChangeHorizon).where(VisitChangeHorizon.user_id == user_id)
+    )
+
+
+def read_visit_changes(
+    session: Session, user_id: uuid.UUID, since: int | None, limit: int
+) -> VisitChanges:
+    horizon = session.get(VisitChangeHorizon, user_id)
+    if since is None or (horizon is not None and since < horizon.horizon):
+        return visit_snapshot(session, user_id)
+
+    rows = session.exec(
+        select(VisitChange.id, VisitChange.visit_id, Visit)
+        .outerjoin(
+            Visit,
+            and_(
+                Visit.id == VisitChange.visit_id,
+                Visit.user_id == VisitChange.user_id,
+                ~VisitChange.deleted,
+            ),
+        )
+        .where(VisitChange.user_id == user_id)
+        .where(VisitChange.id > since)
+        .order_by(VisitChange.id)
+        .limit(limit + 1)
+    ).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return VisitChanges(
+        changes=[
+            VisitChangePublic(visit_id=visit_id, deleted=visit is None, visit=visit)
+            for _, visit_id, visit in rows
+        ],
+        cursor=rows[-1][0] if rows else since,
+        reset=False,
+        more=more,
+    )
+
+
+def visit_snapshot(session: Session, user_id: uuid.UUID) -> VisitChanges:
+    # Read the cursor first: a change committed in between is sent again
+    # with the next request, which is harmless
+    cursor = session.exec(select(func.max(VisitChange.id))).one() or 0
+    visits = session.exec(
+        select(Visit).where(Visit.user_id == user_id).order_by(Visit.id)
+    ).all()
+    return VisitChanges(
+        changes=[
+            VisitChangePublic(visit_id=visit.id, deleted=False, visit=visit)
+            for visit in visits
+        ],
+        cursor=cursor,
+        reset=True,
+        more=False,
+    )
+
+
+"""
+Compaction
+"""
+
+
+def compact_changes(
+    session: Session, retention_days: int = VISIT_CHANGES_RETENTION_DAYS
+) -> int:
+    """Remove tombstones older than `retention_days`, returns rows removed"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    expired = and_(VisitChange.deleted, VisitChange.changed_at < cutoff)
+    horizon = VisitChangeHorizon.__table__
+    upsert = sqlite_insert(horizon).from_select(
+        ["user_id", "horizon"],
+        select(VisitChange.user_id, func.max(VisitChange.id))
+        .where(expired)
+        .group_by(VisitChange.user_id),
+    )
+    session.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"horizon": func.max(horizon.c.horizon, upsert.excluded.horizon)},
+        )
+    )
+    removed = session.execute(delete(VisitChange).where(expired)).rowcount
+    session.commit()
+    return removed
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m getdigitalnomadapi.changes")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument(
+        "--retention-days", type=int, default=VISIT_CHANGES_RETENTION_DAYS
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        removed = compact_changes(session, args.retention_days)
+    logger.info("Removed %d tombstones in %.1fs", removed, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+"""
+Database
+    DATABASE_URL: SQLAlchemy URL of the application database
+"""
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///get-digital-nomad.db")
+
+"""
+Profiling
+    PROFILE_SAMPLE_RATE: fraction (0.0 - 1.0) of requests profiled at random
+    PROFILE_BUFFER_SIZE: number of profiles kept in memory for admins to fetch
+"""
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+"""
+Logging
+    LOG_LEVEL: root logger level name, e.g. DEBUG, INFO, WARNING
+    LOG_FORMAT: "text" for the human readable console format or "json"
+    SUMMARY_CSV_DUMP: write the per-day summary frame to ./data for debugging
+"""
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+SUMMARY_CSV_DUMP = os.getenv("SUMMARY_CSV_DUMP", "false").lower() in ("1", "true")
+
+"""
+Visits
+    VISIT_OVERLAP_POLICY: "reject" overlapping visit writes with 409, or
+        "merge" them into overlapping visits of the same country
+"""
+
+VISIT_OVERLAP_POLICY = os.getenv("VISIT_OVERLAP_POLICY", "reject").lower()
+
+"""
+Visit changes (/me/visits/changes)
+    VISIT_CHANGES_RETENTION_DAYS: tombstones of deleted visits older than
+        this are removed by compaction, clients with an older cursor resync
+"""
+
+VISIT_CHANGES_RETENTION_DAYS = int(os.getenv("VISIT_CHANGES_RETENTION_DAYS", "30"))
+
+"""
+Jobs
+    JOB_WORKERS: asyncio tasks taking jobs off the queue
+    JOB_PROCESSES: processes for CPU bound job work, 0 runs jobs in threads
+    JOB_MAX_ATTEMPTS: runs of a job (restarts after crashes) before it fails
+    JOB_LEASE_SECONDS: a running job is leased to the worker running it,
+        which renews the lease every third of this; a job whose lease ran out
+        was orphaned by a crashed worker and is requeued at startup
+"""
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_PROCESSES = int(os.getenv("JOB_PROCESSES", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+"""
+Server (python -m getdigitalnomadapi.server)
+    WEB_CONCURRENCY: worker processes, 0 sizes from the usable CPU count
+    WORKER_MAX_REQUESTS: requests served before a worker is recycled, 0 never
+    WORKER_MAX_REQUESTS_JITTER: random extra requests so workers do not all
+        recycle at once
+    WORKER_MAX_MEMORY_MB: private (not shared) memory of a worker above which
+        it is recycled, 0 never
+    WORKER_PIN_CPUS: pin each worker to one CPU
+    GRACEFUL_TIMEOUT: seconds a worker gets to finish in-flight requests
+"""
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+WORKER_MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "0"))
+WORKER_MAX_MEMORY_MB = int(os.getenv("WORKER_MAX_MEMORY_MB", "0"))
+WORKER_PIN_CPUS = os.getenv("WORKER_PIN_CPUS", "false").lower() in ("1", "true")
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+
+"""
+Events (/me/events)
+    SSE_MAX_STREAMS: open event streams per worker, more are refused with 503
+    SSE_QUEUE_SIZE: events buffered per stream; a client falling further
+        behind gets a single resync event instead
+    SSE_HEARTBEAT_SECONDS: idle time after which a comment line is sent to
+        keep proxies from closing the connection
+"""
+
+SSE_MAX_STREAMS = int(os.getenv("SSE_MAX_STREAMS", "100"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "16"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+"""
+Batch (/api/v1/batch)
+    BATCH_MAX_REQUESTS: sub-requests accepted in one batch
+"""
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+
+"""
+Summary periods (/me/summary/periods)
+    SUMMARY_MAX_PERIODS: periods computed in one request
+"""
+
+SUMMARY_MAX_PERIODS = int(os.getenv("SUMMARY_MAX_PERIODS", "500"))
+
+"""
+Single flight (routers/me.py)
+    SUMMARY_TIMEOUT_SECONDS: wait for a summary or periods computation
+    TIMELINE_TIMEOUT_SECONDS: wait for a timeline computation
+"""
+
+SUMMARY_TIMEOUT_SECONDS = float(os.getenv("SUMMARY_TIMEOUT_SECONDS", "30"))
+TIMELINE_TIMEOUT_SECONDS = float(os.getenv("TIMELINE_TIMEOUT_SECONDS", "10"))
+
+"""
+Warm-up (/health/ready)
+    WARMUP: warm up before /health/ready succeeds, "false" is ready at once
+    WARMUP_CONNECTIONS: database connections opened ahead of traffic
+"""
+
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true")
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+
+"""
+Data migrations (datamigrations.py)
+    DATA_MIGRATION_BATCH_SIZE: rows per batch, each batch is one transaction
+    DATA_MIGRATION_PAUSE_SECONDS: sleep between batches so live requests get
+        the database in between
+"""
+
+DATA_MIGRATION_BATCH_SIZE = int(os.getenv("DATA_MIGRATION_BATCH_SIZE", "1000"))
+DATA_MIGRATION_PAUSE_SECONDS = float(os.getenv("DATA_MIGRATION_PAUSE_SECONDS", "0.05"))
+
+"""
+Idempotency keys (idempotency.py)
+    IDEMPOTENCY_TTL_SECONDS: how long a response is replayed for its key
+    IDEMPOTENCY_MAX_KEYS: stored responses kept, the oldest are evicted first
+    IDEMPOTENCY_LOCK_SECONDS: a key whose first request has not finished
+        after this long (its worker died) may be taken over by a retry
+"""
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
@@ -1,17 +1,25 @@
 import logging
+from contextvars import ContextVar
 
 from sqlmodel import Session, create_engine
 
+from .config import DATABASE_URL
+
 logger = logging.getLogger(__name__)
 
-sqlite_file_name = "get-digital-nomad.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+# engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, echo=True)
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
 
-# engine = create_engine(sqlite_url, connect_args={"check_same_thread": False}, echo=True)
-engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
+# Set by the batch endpoint so its sub-requests share one session
+shared_session: ContextVar[Session | None] = ContextVar("shared_session", default=None)
 
 
 def get_session():
+    session = shared_session.get()
+    if session is not None:
+        yield session
+        return
     with Session(engine) as session:
         yield session
 
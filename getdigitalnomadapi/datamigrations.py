@@ -0,0 +1,163 @@
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from alembic import op
+from sqlalchemy import Column, Connection, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .config import DATA_MIGRATION_BATCH_SIZE, DATA_MIGRATION_PAUSE_SECONDS
+from .models import DataMigration
+
+logger = logging.getLogger(__name__)
+
+REPORT_SECONDS = 10
+
+"""
+Batched data migrations
+    A data migration over a large table in one transaction holds the SQLite
+    write lock for the whole run and starts over after a failure.
+    run_batched walks the table in primary key order instead, `batch_size`
+    rows at a time. Each batch is its own BEGIN IMMEDIATE ... COMMIT
+    transaction together with its checkpoint in the datamigration table, so
+    a rerun continues after the last committed batch. It sleeps `pause`
+    seconds between batches so requests are served meanwhile and logs
+    progress in rows per second.
+
+    In a revision, keep the schema change and the backfill in separate
+    revisions, and run the backfill with run_batched_op:
+
+        visit = sa.table("visit", sa.column("id"), sa.column("nights"))
+
+        def backfill(connection, first_id, last_id):
+            connection.execute(
+                sa.update(visit)
+                .where(visit.c.id.between(first_id, last_id))
+                .values(nights=...)
+            )
+            log_visit_range_changes(connection, first_id, last_id)
+
+        def upgrade() -> None:
+            run_batched_op("visit_nights", visit.c.id, backfill)
+
+    A backfill changing what clients see of visits records the batch in the
+    visit change feed with changes.log_visit_range_changes, in the batch's
+    transaction, or clients that synced before never get the change.
+
+    `process` must be idempotent: rows written by the application while the
+    migration runs are not locked, and the batch of a crash is processed
+    again. The key must be an integer primary key.
+"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def run_batched(
+    connection: Connection,
+    name: str,
+    key: Column,
+    process: Callable[[Connection, int, int], object],
+    batch_size: int = DATA_MIGRATION_BATCH_SIZE,
+    pause: float = DATA_MIGRATION_PAUSE_SECONDS,
+) -> int:
+    """
+    Call process(connection, first_id, last_id) for each batch of rows of
+    key.table with first_id <= key <= last_id, returns the rows walked by
+    this run. A finished migration of the same `name` is skipped.
+    """
+    checkpoints = DataMigration.__table__
+    # The batches manage their own transactions
+    if connection.get_execution_options().get("isolation_level") != "AUTOCOMMIT":
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+    connection.execute(
+        sqlite_insert(checkpoints)
+        .values(name=name, rows=0, started_at=_now(), updated_at=_now())
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    checkpoint = connection.execute(
+        select(checkpoints).where(checkpoints.c.name == name)
+    ).one()
+    if checkpoint.finished_at is not None:
+        logger.info("%s finished at %s, skipped", name, checkpoint.finished_at)
+        return 0
+
+    last_id = checkpoint.last_id
+    pending = key.is_not(None) if last_id is None else key > last_id
+    total = connection.execute(
+        select(func.count()).select_from(key.table).where(pending)
+    ).scalar_one()
+    if last_id is not None:
+        logger.info("%s resuming after %s=%s", name, key.name, last_id)
+
+    started = reported = time.perf_counter()
+    walked = 0
+    while True:
+        pending = key.is_not(None) if last_id is None else key > last_id
+        batch = select(key).where(pending).order_by(key).limit(batch_size).subquery()
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            first_id, batch_last_id, rows = connection.execute(
+                select(func.min(batch.c[0]), func.max(batch.c[0]), func.count())
+            ).one()
+            if rows:
+                process(connection, first_id, batch_last_id)
+                last_id = batch_last_id
+            connection.execute(
+                update(checkpoints)
+                .where(checkpoints.c.name == name)
+                .values(
+                    last_id=last_id,
+                    rows=checkpoints.c.rows + rows,
+                    updated_at=_now(),
+                    finished_at=None if rows else _now(),
+                )
+            )
+            connection.exec_driver_sql("COMMIT")
+        except BaseException:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        if not rows:
+            break
+
+        walked += rows
+        now = time.perf_counter()
+        if now - reported >= REPORT_SECONDS:
+            reported = now
+            logger.info(
+                "%s: %d/%d rows, %.0f rows/s",
+                name,
+                walked,
+                total,
+                walked / (now - started),
+            )
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "%s finished: %d rows in %.1fs, %.0f rows/s",
+        name,
+        walked,
+        elapsed,
+        walked / elapsed if elapsed else 0,
+    )
+    return walked
+
+
+def run_batched_op(
+    name: str,
+    key: Column,
+    process: Callable[[Connection, int, int], object],
+    batch_size: int = DATA_MIGRATION_BATCH_SIZE,
+    pause: float = DATA_MIGRATION_PAUSE_SECONDS,
+) -> int:
+    """run_batched on the connection of the running Alembic migration"""
+    context = op.get_context()
+    if context.as_sql:
+        raise RuntimeError(f"{name} is a batched data migration, run it online")
+    # Commits the revisions so far, the batches then commit one by one
+    with context.autocommit_block():
+        return run_batched(op.get_bind(), name, key, process, batch_size, pause)
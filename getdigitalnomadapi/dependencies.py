@@ -1,4 +1,5 @@
 import logging
+from contextvars import ContextVar
 from typing import Annotated
 
 from fastapi import Depends, HTTPException, status
@@ -7,47 +8,59 @@ from jwt import ExpiredSignatureError, InvalidTokenError
 from sqlmodel import Session, select
 
 from .database import get_session
+from .metrics import JWT_DECODE_FAILURES, JWT_DECODES
 from .models import TokenData, User
 from .security import check_jwt
 
 logger = logging.getLogger(__name__)
 SessionDep = Annotated[Session, Depends(get_session)]
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/token")
+# Set by the batch endpoint, its sub-requests carry the same token
+authenticated_user: ContextVar[User | None] = ContextVar(
+    "authenticated_user", default=None
+)
 
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     session: SessionDep,
 ):
+    user = authenticated_user.get()
+    if user is not None:
+        return user
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    JWT_DECODES.inc()
     try:
         payload = check_jwt(token)
         user_id_str: str = payload.get("sub")
-        print(user_id_str)
+        logger.debug("Token for user id %s", user_id_str)
         if user_id_str is None:
-            logging.error("payload sub:id is None")
+            logger.error("payload sub:id is None")
+            JWT_DECODE_FAILURES.inc("missing_sub")
             raise credentials_exception
         token_data = TokenData(id_uuid=user_id_str)
     except ExpiredSignatureError as e:
-        logging.error(repr(e))
+        logger.error(repr(e))
+        JWT_DECODE_FAILURES.inc("expired")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=repr(e),
             headers={"WWW-Authenticate": "Bearer"},
         )
     except InvalidTokenError as e:
-        logging.error(repr(e))
+        logger.error(repr(e))
+        JWT_DECODE_FAILURES.inc("invalid")
         raise credentials_exception
 
     # user = get_user_by_id(id=token_data.id_uuid)
     user = session.exec(select(User).where(User.id == token_data.id_uuid)).first()
 
     if user is None:
-        logging.error("UserId %s is not found", token_data.id_uuid)
+        logger.error("UserId %s is not found", token_data.id_uuid)
         raise credentials_exception
     return user
 
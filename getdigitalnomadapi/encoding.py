@@ -0,0 +1,163 @@
+import functools
+import inspect
+import logging
+import struct
+import uuid
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+
+import msgpack
+import numpy as np
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+"""
+MessagePack encoding
+    Routes of routers using route_class=NegotiatedRoute answer in
+    MessagePack when the Accept header prefers it over JSON, and accept
+    MessagePack request bodies (Content-Type: application/msgpack). The
+    same response models are encoded with native types instead of strings:
+        date      ext type 1, int32 big endian days since 1970-01-01
+        UUID      ext type 2, the 16 bytes
+        datetime  the MessagePack timestamp extension (-1), naive is UTC
+    unpackb decodes them back to date, UUID and aware datetime.
+"""
+
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+JSON_TYPES = ("application/json", "application/*", "*/*")
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DAYS = struct.Struct(">i")
+DATE_EXT = 1
+UUID_EXT = 2
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, date):
+        return msgpack.ExtType(DATE_EXT, DAYS.pack(obj.toordinal() - EPOCH_ORDINAL))
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(UUID_EXT, obj.bytes)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    raise TypeError(f"Cannot encode {type(obj).__name__} as MessagePack")
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == DATE_EXT:
+        return date.fromordinal(EPOCH_ORDINAL + DAYS.unpack(data)[0])
+    if code == UUID_EXT:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
+
+
+def packb(obj) -> bytes:
+    return msgpack.packb(obj, default=_default, datetime=False)
+
+
+def unpackb(data: bytes):
+    return msgpack.unpackb(data, ext_hook=_ext_hook, timestamp=3)
+
+
+def _quality(accept: str, media_types: tuple) -> float:
+    best = 0.0
+    for media_range in accept.split(","):
+        media_type, *params = (part.strip() for part in media_range.split(";"))
+        if media_type.lower() not in media_types:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def accepts_msgpack(accept: str) -> bool:
+    """MessagePack is listed and not ranked below JSON"""
+    q = _quality(accept, MSGPACK_TYPES)
+    return q > 0 and q >= _quality(accept, JSON_TYPES)
+
+
+# Set per request by NegotiatedRoute for its endpoint wrapper
+msgpack_wanted: ContextVar[bool] = ContextVar("msgpack_wanted", default=False)
+
+
+class MsgPackRequest(Request):
+    """Presents a MessagePack body to FastAPI as an already decoded JSON body"""
+
+    def __init__(self, scope, receive):
+        headers = [
+            (name, b"application/json" if name == b"content-type" else value)
+            for name, value in scope["headers"]
+        ]
+        super().__init__({**scope, "headers": headers}, receive)
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = unpackb(await self.body())
+        return self._json
+
+
+class NegotiatedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        route = self
+
+        def encode(result):
+            if isinstance(result, Response) or not msgpack_wanted.get():
+                return result
+            # Validate through the response model as FastAPI would, but keep
+            # Python types for the encoder
+            if route.response_model is not None:
+                adapter = route._response_adapter
+                result = adapter.dump_python(
+                    adapter.validate_python(result, from_attributes=True)
+                )
+            return Response(content=packb(result), media_type=MSGPACK)
+
+        if inspect.iscoroutinefunction(endpoint):
+
+            @functools.wraps(endpoint)
+            async def negotiated_endpoint(*args, **kwargs):
+                return encode(await endpoint(*args, **kwargs))
+
+        else:
+
+            @functools.wraps(endpoint)
+            def negotiated_endpoint(*args, **kwargs):
+                return encode(endpoint(*args, **kwargs))
+
+        super().__init__(path, negotiated_endpoint, **kwargs)
+        if self.response_model is not None:
+            self._response_adapter = TypeAdapter(self.response_model)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            content_type = request.headers.get("content-type", "")
+            if content_type.split(";")[0].strip().lower() in MSGPACK_TYPES:
+                request = MsgPackRequest(request.scope, request.receive)
+            token = msgpack_wanted.set(
+                accepts_msgpack(request.headers.get("accept", ""))
+            )
+            try:
+                response = await handler(request)
+            finally:
+                msgpack_wanted.reset(token)
+            response.headers.append("Vary", "Accept")
+            return response
+
+        return negotiated_handler
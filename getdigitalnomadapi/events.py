@@ -0,0 +1,110 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import uuid
+
+from .config import SSE_MAX_STREAMS, SSE_QUEUE_SIZE
+from .metrics import SSE_EVENTS_DROPPED, SSE_STREAMS
+
+logger = logging.getLogger(__name__)
+
+"""
+Change notifications
+    An in-process pub/sub keyed by user id. The visit handlers publish after
+    they commit and every /me/events stream of that user on this worker gets
+    the event. Streams on other workers do not; clients resync on reconnect.
+
+    Each stream has a bounded queue. A client that falls SSE_QUEUE_SIZE events
+    behind has its buffered events replaced by one resync event, so a slow
+    reader never holds memory or slows down the publisher.
+"""
+
+
+class TooManyStreams(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, user_id: uuid.UUID, queue_size: int):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    def deliver(self, message: dict):
+        """Runs on the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            dropped = 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                dropped += 1
+            SSE_EVENTS_DROPPED.inc(amount=dropped)
+            self.queue.put_nowait({"id": message["id"], "event": "resync", "data": {}})
+
+
+class EventBroker:
+    def __init__(
+        self, max_streams: int = SSE_MAX_STREAMS, queue_size: int = SSE_QUEUE_SIZE
+    ):
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers: dict[uuid.UUID, set[Subscription]] = {}
+        self._streams = 0
+        self._ids = itertools.count(1)
+
+    @property
+    def full(self) -> bool:
+        return self._streams >= self.max_streams
+
+    def subscribe(self, user_id: uuid.UUID) -> Subscription:
+        """Call on the event loop that reads the subscription, then unsubscribe"""
+        with self._lock:
+            if self._streams >= self.max_streams:
+                raise TooManyStreams()
+            subscription = Subscription(user_id, self.queue_size)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._streams += 1
+        SSE_STREAMS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.user_id, set())
+            if subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+            self._streams -= 1
+        SSE_STREAMS.dec()
+
+    def publish(self, user_id: uuid.UUID | None, event: str, data: dict):
+        """Thread safe, sync handlers publish from the threadpool"""
+        if user_id is None:
+            return
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        if not subscriptions:
+            return
+        message = {"id": next(self._ids), "event": event, "data": data}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # Loop already closed, the stream is going away
+                pass
+
+
+def format_event(message: dict) -> str:
+    return (
+        f"id: {message['id']}\n"
+        f"event: {message['event']}\n"
+        f"data: {json.dumps(message['data'], default=str)}\n\n"
+    )
+
+
+broker = EventBroker()
@@ -0,0 +1,325 @@
+import hashlib
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session
+
+from .config import (
+    IDEMPOTENCY_LOCK_SECONDS,
+    IDEMPOTENCY_MAX_KEYS,
+    IDEMPOTENCY_TTL_SECONDS,
+)
+from .database import get_session, shared_session
+from .encoding import NegotiatedRoute
+from .metrics import IDEMPOTENT_REPLAYS
+from .models import IdempotencyKey
+from .singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Stores between evictions of the oldest keys beyond IDEMPOTENCY_MAX_KEYS
+EVICT_EVERY = 100
+
+"""
+Idempotency keys
+    A POST carrying an Idempotency-Key header runs once per key: its
+    response (status, headers and body) is stored in the idempotencykey
+    table and a retry with the same key gets that response back, marked
+    Idempotent-Replayed: true, instead of writing again. Keys are scoped to
+    the method, path and Authorization header, so callers cannot see each
+    other's responses.
+
+    A request first inserts a pending row for its key. Identical requests
+    arriving meanwhile in the same worker await the first one, see
+    singleflight.py; in another worker they find the pending row and get
+    409 with Retry-After until it is done, or take it over once it is older
+    than IDEMPOTENCY_LOCK_SECONDS. Reusing a key with a different body is
+    422. Server errors are not stored, the key is released so the retry
+    runs again, as failed writes are rolled back.
+
+    The endpoint commits its write on its own session before its response
+    exists, so the response is stored in a later transaction. To keep a
+    worker dying in between from letting a retry write again, every commit
+    made while the endpoint runs also sets committed_at on the key's pending
+    row, in the same transaction. A pending row with committed_at is not
+    taken over or released: retries get 409 until the key expires, as the
+    write happened but its response is lost.
+
+    Stored responses expire after IDEMPOTENCY_TTL_SECONDS, expired rows are
+    deleted on every new key and the oldest stored responses beyond
+    IDEMPOTENCY_MAX_KEYS every EVICT_EVERY new keys, pending rows are left
+    to the TTL. Sub-requests of /batch run on its session and are not
+    deduplicated.
+"""
+
+
+# The key of the endpoint running in this context, for _mark_committed
+_running_key: ContextVar[str | None] = ContextVar("idempotency_key", default=None)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_committed(session: Session):
+    key_id = _running_key.get()
+    if key_id is None:
+        return
+    table = IdempotencyKey.__table__
+    session.execute(
+        update(table)
+        .where(table.c.id == key_id)
+        .where(table.c.status_code.is_(None))
+        .values(committed_at=_now())
+    )
+
+
+@contextmanager
+def _session(request: Request):
+    """A session from get_session, or from its override in tests"""
+    provider = request.app.dependency_overrides.get(get_session, get_session)
+    yield from provider()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def in_progress() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"A request with this {HEADER} is in progress",
+        headers={"Retry-After": "1"},
+    )
+
+
+def response_lost() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"A request with this {HEADER} was applied, its response was lost",
+    )
+
+
+class IdempotencyStore:
+    def __init__(self):
+        self.stored = 0
+
+    def claim(self, session: Session, key_id: str, request_hash: str):
+        """
+        The stored response of `key_id`, or None once its pending row is
+        ours. Raises 409 while another worker runs it.
+        """
+        now = _now()
+        table = IdempotencyKey.__table__
+        claimed = session.execute(
+            sqlite_insert(table)
+            .values(id=key_id, request_hash=request_hash, headers=[], created_at=now)
+            .on_conflict_do_nothing(index_elements=["id"])
+        ).rowcount
+        if claimed:
+            self.evict(session, now)
+            session.commit()
+            return None
+
+        row = session.get(IdempotencyKey, key_id)
+        if row is None:  # evicted meanwhile
+            raise in_progress()
+        age = now - _as_utc(row.created_at)
+        if row.status_code is not None and age < timedelta(
+            seconds=IDEMPOTENCY_TTL_SECONDS
+        ):
+            return IdempotencyKey.model_validate(row)
+        if row.status_code is None and age < timedelta(
+            seconds=IDEMPOTENCY_LOCK_SECONDS
+        ):
+            raise in_progress()
+        if row.status_code is None and row.committed_at is not None:
+            raise response_lost()
+        # Expired, or left pending by a worker that died before writing
+        taken = session.execute(
+            update(table)
+            .where(table.c.id == key_id)
+            .where(table.c.created_at == row.created_at)
+            .values(
+                request_hash=request_hash,
+                status_code=None,
+                body=None,
+                created_at=now,
+                committed_at=None,
+            )
+        ).rowcount
+        session.commit()
+        if not taken:
+            raise in_progress()
+        logger.info("Idempotency key %s taken over", key_id)
+        return None
+
+    def save(
+        self, session: Session, key_id: str, request_hash: str, response: Response
+    ) -> IdempotencyKey:
+        stored = IdempotencyKey(
+            id=key_id,
+            request_hash=request_hash,
+            status_code=response.status_code,
+            headers=[
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in response.raw_headers
+                if name != b"content-length"
+            ],
+            body=response.body,
+            created_at=_now(),
+        )
+        table = IdempotencyKey.__table__
+        saved = session.execute(
+            update(table)
+            .where(table.c.id == key_id)
+            .values(
+                status_code=stored.status_code, headers=stored.headers, body=stored.body
+            )
+        ).rowcount
+        session.commit()
+        if not saved:
+            # Evicted or expired meanwhile, a retry runs the request again
+            logger.warning("Idempotency key %s was gone, response not stored", key_id)
+        return stored
+
+    def release(self, session: Session, key_id: str):
+        table = IdempotencyKey.__table__
+        session.execute(
+            delete(table)
+            .where(table.c.id == key_id)
+            .where(table.c.status_code.is_(None))
+            .where(table.c.committed_at.is_(None))
+        )
+        session.commit()
+
+    def evict(self, session: Session, now: datetime):
+        table = IdempotencyKey.__table__
+        session.execute(
+            delete(table).where(
+                table.c.created_at < now - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+            )
+        )
+        self.stored += 1
+        if self.stored % EVICT_EVERY == 0:
+            # Pending rows are requests still running, only the TTL removes them
+            done = table.c.status_code.is_not(None)
+            newest = (
+                select(table.c.id)
+                .where(done)
+                .order_by(table.c.created_at.desc())
+                .limit(IDEMPOTENCY_MAX_KEYS)
+            )
+            evicted = session.execute(
+                delete(table).where(done).where(table.c.id.not_in(newest))
+            ).rowcount
+            if evicted:
+                logger.info("Evicted %d idempotency keys", evicted)
+
+
+store = IdempotencyStore()
+
+
+def replay(stored: IdempotencyKey, replayed: bool) -> Response:
+    response = Response(content=stored.body, status_code=stored.status_code)
+    response.raw_headers = [
+        (name.encode("latin-1"), value.encode("latin-1"))
+        for name, value in stored.headers
+    ] + [(b"content-length", str(len(stored.body)).encode("latin-1"))]
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+class IdempotentRoute(NegotiatedRoute):
+    """NegotiatedRoute whose POSTs honour the Idempotency-Key header"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self
+
+        async def idempotent_handler(request: Request) -> Response:
+            key = request.headers.get(HEADER)
+            if (
+                key is None
+                or request.method != "POST"
+                or shared_session.get() is not None
+            ):
+                return await handler(request)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters",
+                )
+
+            body = await request.body()
+
+            async def receive():
+                # The body again for the endpoint, which reads it on its own
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            request = Request(request.scope, receive)
+            request_hash = hashlib.sha256(body).hexdigest()
+            scope = "\n".join(
+                (
+                    request.method,
+                    request.url.path,
+                    request.headers.get("authorization", ""),
+                    key,
+                )
+            )
+            key_id = hashlib.sha256(scope.encode()).hexdigest()
+            ran = False
+
+            async def execute():
+                nonlocal ran
+                ran = True
+                with _session(request) as session:
+                    stored = store.claim(session, key_id, request_hash)
+                    if stored is not None:
+                        return stored, True
+                    try:
+                        token = _running_key.set(key_id)
+                        try:
+                            response = await handler(request)
+                        finally:
+                            _running_key.reset(token)
+                    except HTTPException as e:
+                        if e.status_code >= 500:
+                            store.release(session, key_id)
+                            raise
+                        response = JSONResponse(
+                            {"detail": e.detail}, e.status_code, headers=e.headers
+                        )
+                    except BaseException:
+                        store.release(session, key_id)
+                        raise
+                    if response.status_code >= 500 or not hasattr(response, "body"):
+                        store.release(session, key_id)
+                        return response, False
+                    return store.save(session, key_id, request_hash, response), False
+
+            result, replayed = await single_flight.do("idempotency", key_id, execute)
+            if isinstance(result, Response):
+                return result
+            if result.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"{HEADER} was used for a different request body",
+                )
+            replayed = replayed or not ran
+            if replayed:
+                IDEMPOTENT_REPLAYS.inc(route.path)
+            return replay(result, replayed)
+
+        return idempotent_handler
@@ -1,8 +1,31 @@
-from fastapi import APIRouter, Depends, Query
+import logging
+import uuid
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Integer, and_, case, cast, func
+from sqlmodel import Session, select
 
 from ..dependencies import SessionDep, get_current_admin_user
-from ..models import User, UserAdmin
-from ..routers.users import delete_user, read_user, read_users
+from ..models import (
+    Country,
+    PresencePage,
+    User,
+    UserAdmin,
+    UserAdminPage,
+    UserAdminSummary,
+    UserPublic,
+    Visit,
+    VisitOverlap,
+)
+from ..overlaps import scan_overlaps
+from ..presence import find_present_users
+from ..profiling import get_profile, list_profiles
+from ..routers.users import delete_user, read_user
+
+logger = logging.getLogger(__name__)
+
+SCHENGEN_WINDOW_DAYS = 180
 
 router = APIRouter(
     prefix="/admin",
@@ -21,20 +44,131 @@ async def update_admin():
 """
 
 
-@router.get("/user/", response_model=list[UserAdmin])
+def read_user_summaries(
+    session: Session, after: uuid.UUID | None = None, limit: int = 100
+) -> list[UserAdminSummary]:
+    """
+    One page of users ordered by id with their visit aggregates, in one
+    grouped query. Schengen days are those of the last SCHENGEN_WINDOW_DAYS
+    up to today, an open visit counts up to today and days of overlapping
+    visits are summed, as in presence.py.
+    """
+    today = date.today()
+    window_start = today - timedelta(days=SCHENGEN_WINDOW_DAYS - 1)
+    first_day = func.max(Visit.start, window_start)
+    last_day = func.min(func.coalesce(Visit.end, today), today)
+    days = cast(func.julianday(last_day) - func.julianday(first_day), Integer) + 1
+
+    # Page the users first, so only their visits are joined and grouped
+    page = select(User.id).order_by(User.id).limit(limit)
+    if after is not None:
+        page = page.where(User.id > after)
+    page = page.subquery()
+    rows = session.exec(
+        select(
+            *(User.__table__.c[name] for name in UserPublic.model_fields),
+            func.count(Visit.id).label("visits"),
+            func.min(Visit.start).label("first_visit"),
+            func.max(Visit.start).label("last_visit"),
+            func.count(Visit.country_id.distinct()).label("countries"),
+            func.sum(
+                case((and_(Country.schengen, last_day >= first_day), days), else_=0)
+            ).label("schengen_days_180"),
+        )
+        .join(page, page.c.id == User.id)
+        .outerjoin(Visit, Visit.user_id == User.id)
+        .outerjoin(Country, Country.id == Visit.country_id)
+        .group_by(User.id)
+        .order_by(User.id)
+    )
+    return [UserAdminSummary.model_validate(row._mapping) for row in rows]
+
+
+@router.get("/user/", response_model=UserAdminPage)
 async def read_admin_users(
-    *, session: SessionDep, offset: int = 0, limit: int = Query(default=100, le=100)
-) -> list[User]:
-    return await read_users(session=session, offset=offset, limit=limit)
+    *,
+    session: SessionDep,
+    after: uuid.UUID | None = None,
+    limit: int = Query(default=100, le=100),
+):
+    """Users with visit aggregates, full visits are on /admin/user/{user_id}"""
+    users = read_user_summaries(session, after=after, limit=limit)
+    next_after = users[-1].id if len(users) == limit else None
+    return UserAdminPage(users=users, next_after=next_after)
 
 
 @router.get("/user/{user_id}", response_model=UserAdmin)
-async def read_admin_user(*, session: SessionDep, user_id: int) -> User:
+async def read_admin_user(*, session: SessionDep, user_id: uuid.UUID) -> User:
     user = await read_user(session=session, user_id=user_id)
-    print("users visits:", user.visits)
+    logger.debug("Admin read of user %s", user.id)
     return user
 
 
 @router.delete("/user/{user_id}")
-async def delete_admin_user(*, session: SessionDep, user_id: int):
+async def delete_admin_user(*, session: SessionDep, user_id: uuid.UUID):
     return await delete_user(session=session, user_id=user_id)
+
+
+"""
+/admin/visits
+"""
+
+
+@router.get("/visits/overlaps", response_model=list[VisitOverlap])
+async def read_admin_visit_overlaps(*, session: SessionDep):
+    rows = session.exec(
+        select(Visit.id, Visit.user_id, Visit.start, Visit.end)
+        .where(Visit.user_id.is_not(None))
+        .order_by(Visit.user_id, Visit.start)
+    )
+    return scan_overlaps(rows)
+
+
+@router.get("/visits/presence", response_model=PresencePage)
+async def read_admin_visit_presence(
+    *,
+    session: SessionDep,
+    start_dt: date,
+    end_dt: date,
+    country_id: int | None = None,
+    schengen: bool = False,
+    after: uuid.UUID | None = None,
+    limit: int = Query(default=100, le=1000),
+):
+    """Users in `country_id`, or in any Schengen country, between two dates"""
+    if country_id is None and not schengen:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="country_id or schengen=true is required",
+        )
+    users = find_present_users(
+        session,
+        start_dt=start_dt,
+        end_dt=end_dt,
+        country_id=country_id,
+        schengen=schengen,
+        after=after,
+        limit=limit,
+    )
+    next_after = users[-1]["user_id"] if len(users) == limit else None
+    return PresencePage(users=users, next_after=next_after)
+
+
+"""
+/admin/profiles
+"""
+
+
+@router.get("/profiles/")
+async def read_admin_profiles():
+    return list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+async def read_admin_profile(*, profile_id: str):
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+        )
+    return profile
@@ -0,0 +1,320 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from . import database
+from .config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_PROCESSES, JOB_WORKERS
+from .models import Country, Job, Visit
+from .routers.me import load_summary
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class JobCancelled(Exception):
+    pass
+
+
+"""
+Job kinds
+    Each kind takes (session, job, report) and returns (result, media_type).
+    report(fraction) stores progress and raises JobCancelled once the job
+    has been cancelled, so cancellation is checked at every progress step.
+"""
+
+
+def _json_default(value):
+    # numpy scalars from the pandas summary
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def summary_job(session: Session, job: Job, report) -> tuple[str, str]:
+    start_dt = date.fromisoformat(job.params.get("start_dt", "1970-01-01"))
+    end_dt = date.fromisoformat(job.params.get("end_dt", "2038-01-01"))
+    # report() commits, which expires loaded rows, so report before loading
+    report(0.1)
+    summary = load_summary(session, job.user_id, start_dt, end_dt)
+    return json.dumps(summary, default=_json_default), "application/json"
+
+
+def export_job(session: Session, job: Job, report) -> tuple[str, str]:
+    """Full visit history of the user as CSV"""
+    total = len(
+        session.exec(select(Visit.id).where(Visit.user_id == job.user_id)).all()
+    )
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["id", "country_code", "country_name", "start", "end"])
+    last_id = 0
+    written = 0
+    while True:
+        rows = session.exec(
+            select(Visit.id, Country.code, Country.name, Visit.start, Visit.end)
+            .join(Country, Country.id == Visit.country_id, isouter=True)
+            .where(Visit.user_id == job.user_id)
+            .where(Visit.id > last_id)
+            .order_by(Visit.id)
+            .limit(EXPORT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        writer.writerows(rows)
+        last_id = rows[-1][0]
+        written += len(rows)
+        report(written / total)
+    return output.getvalue(), "text/csv"
+
+
+JOB_KINDS = {
+    "summary": summary_job,
+    "export": export_job,
+}
+
+
+"""
+Execution
+"""
+
+
+def _lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def run_job(job_id: uuid.UUID, engine=None, owner: str | None = None):
+    """
+    Run one job to completion, leased to `owner`. Module level so a process
+    pool can pickle it; child processes use the application engine.
+    """
+    with Session(engine or database.engine) as session:
+        claimed = session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .where(Job.status == "queued")
+            .values(
+                status="running",
+                attempts=Job.attempts + 1,
+                started_at=datetime.now(timezone.utc),
+                owner=owner,
+                lease_expires_at=_lease_expiry(),
+            )
+        ).rowcount
+        session.commit()
+        if not claimed:
+            return
+        job = session.get(Job, job_id)
+
+        def report(fraction: float):
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(progress=round(min(fraction, 1.0), 4))
+            )
+            session.commit()
+            status = session.exec(select(Job.status).where(Job.id == job_id)).one()
+            if status == "cancelling":
+                raise JobCancelled()
+
+        try:
+            if job.attempts > JOB_MAX_ATTEMPTS:
+                raise RuntimeError(f"gave up after {JOB_MAX_ATTEMPTS} attempts")
+            result, media_type = JOB_KINDS[job.kind](session, job, report)
+        except JobCancelled:
+            session.rollback()
+            job.status = "cancelled"
+            logger.info("Job %s cancelled", job_id)
+        except Exception as e:
+            session.rollback()
+            logger.exception("Job %s failed", job_id)
+            job.status = "failed"
+            job.error = repr(e)
+        else:
+            job.status = "succeeded"
+            job.progress = 1.0
+            job.result = result
+            job.result_media_type = media_type
+        job.finished_at = datetime.now(timezone.utc)
+        session.add(job)
+        session.commit()
+
+
+class JobRunner:
+    """
+    JOB_WORKERS asyncio tasks take job ids off a queue and hand the work to
+    a process pool (JOB_PROCESSES > 0) or to threads. State lives in the job
+    table, so jobs survive restarts: start() requeues queued jobs and jobs
+    left running by a crashed process. A broken process pool is replaced and
+    its jobs requeued.
+
+    Running jobs are leased to the runner's owner (host and pid), a heartbeat
+    task renews the leases of its jobs every third of JOB_LEASE_SECONDS while
+    they run, also while a job reports no progress. Only jobs whose lease ran
+    out are requeued, so a starting worker leaves the jobs of live ones alone.
+    """
+
+    def __init__(
+        self, workers: int = JOB_WORKERS, processes: int = JOB_PROCESSES, engine=None
+    ):
+        self.workers = workers
+        self.processes = processes
+        self.engine = engine
+        self.queue: asyncio.Queue | None = None
+        self.tasks: list[asyncio.Task] = []
+        self.executor: ProcessPoolExecutor | None = None
+        self.owner: str | None = None
+        self.running: set[uuid.UUID] = set()
+
+    def _engine(self):
+        return self.engine or database.engine
+
+    def recover(self) -> list[uuid.UUID]:
+        now = datetime.now(timezone.utc)
+        expired = or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+        with Session(self._engine()) as session:
+            requeued = session.execute(
+                update(Job)
+                .where(Job.status == "running")
+                .where(expired)
+                .values(status="queued", owner=None, lease_expires_at=None)
+            ).rowcount
+            session.execute(
+                update(Job)
+                .where(Job.status == "cancelling")
+                .where(expired)
+                .values(status="cancelled", finished_at=now)
+            )
+            session.commit()
+            if requeued:
+                logger.warning("Requeued %d orphaned jobs", requeued)
+            return session.exec(
+                select(Job.id).where(Job.status == "queued").order_by(Job.created_at)
+            ).all()
+
+    def _requeue(self, job_id: uuid.UUID) -> bool:
+        """Requeue a job whose process died, True unless it is finished"""
+        with Session(self._engine()) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .where(Job.status == "running")
+                .values(status="queued")
+            )
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .where(Job.status == "cancelling")
+                .values(status="cancelled", finished_at=datetime.now(timezone.utc))
+            )
+            session.commit()
+            status = session.exec(select(Job.status).where(Job.id == job_id)).first()
+            return status == "queued"
+
+    def _renew(self, job_ids: list[uuid.UUID]):
+        with Session(self._engine()) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id.in_(job_ids))
+                .where(Job.owner == self.owner)
+                .where(Job.status.in_(("running", "cancelling")))
+                .values(lease_expires_at=_lease_expiry())
+            )
+            session.commit()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            if self.running:
+                try:
+                    await asyncio.to_thread(self._renew, list(self.running))
+                except Exception:
+                    logger.exception("Renewing job leases failed")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, the parent's pooled SQLite connections must not be forked
+        return ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        # Workers sharing the broken pool all get here, the first replaces it
+        if self.executor is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+            logger.warning("Process pool broken, replaced")
+
+    async def start(self):
+        # After any fork of the server, each worker is its own owner
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.queue = asyncio.Queue()
+        if self.processes:
+            self.executor = self._new_executor()
+        for job_id in await asyncio.to_thread(self.recover):
+            self.submit(job_id)
+        self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self.tasks.append(asyncio.create_task(self._heartbeat()))
+        logger.info(
+            "Job runner started with %d workers, %d processes",
+            self.workers,
+            self.processes,
+        )
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, job_id: uuid.UUID):
+        if self.queue is None:
+            logger.warning("Job runner not started, job %s stays queued", job_id)
+            return
+        self.queue.put_nowait(job_id)
+
+    async def join(self):
+        await self.queue.join()
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id = await self.queue.get()
+            executor = self.executor
+            self.running.add(job_id)
+            try:
+                if executor:
+                    await loop.run_in_executor(
+                        executor, run_job, job_id, None, self.owner
+                    )
+                else:
+                    await asyncio.to_thread(run_job, job_id, self._engine(), self.owner)
+            except BrokenProcessPool:
+                # A process died (OOM, segfault), taking the pool with it. The
+                # job runs again, run_job fails it after JOB_MAX_ATTEMPTS
+                logger.exception("Job %s lost its process", job_id)
+                self._replace_executor(executor)
+                if await asyncio.to_thread(self._requeue, job_id):
+                    self.submit(job_id)
+            except Exception:
+                logger.exception("Job %s crashed its worker", job_id)
+            finally:
+                self.running.discard(job_id)
+                self.queue.task_done()
+
+
+runner = JobRunner()
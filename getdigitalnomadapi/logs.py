@@ -0,0 +1,83 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import LOG_FORMAT, LOG_LEVEL
+
+TEXT_FORMAT = "%(asctime)s.%(msecs)03dZ | %(levelname)-8s | %(name)s->%(filename)s:%(lineno)-3s - %(message)s"
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+_listener: QueueListener | None = None
+
+
+class UTCFormatter(logging.Formatter):
+    # Reuses record.created instead of calling datetime.now() per record
+    converter = time.gmtime
+
+
+class JsonFormatter(UTCFormatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": f"{self.formatTime(record, DATE_FORMAT)}.{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.filename}:{record.lineno}",
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT):
+    """
+    Log records are put on a queue by the request path and formatted and
+    written to stderr by a QueueListener thread
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = UTCFormatter(fmt=TEXT_FORMAT, datefmt=DATE_FORMAT)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    os.register_at_fork(after_in_child=_restart_listener)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_listener():
+    # Threads do not survive fork, so a forked worker starts its own listener
+    # on a fresh queue; records still queued in the parent are the parent's
+    global _listener
+    if _listener is not None:
+        log_queue = queue.SimpleQueue()
+        for handler in logging.getLogger().handlers:
+            if isinstance(handler, QueueHandler):
+                handler.queue = log_queue
+        _listener = QueueListener(
+            log_queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
@@ -1,41 +1,50 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
 
 from fastapi import APIRouter, FastAPI
 
+from . import jobs
+from .config import WARMUP
 from .internal import admin
-from .routers import countries, token, users, visits, me
+from .logs import setup_logging
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
+from .routers import batch, countries, health, metrics, stats, token, users, visits, me
+from .routers import jobs as jobs_router
+from .warmup import readiness, warm_up
 
 PREFIX_API_V1 = "/api/v1"
 
 
-def adj_tz(*ags):
-    return datetime.now(timezone.utc).timetuple()
-
-
-logging.Formatter.converter = adj_tz
-logging.basicConfig(
-    format="%(asctime)s.%(msecs)03dZ | %(levelname)-8s | %(name)s->%(filename)s:%(lineno)-3s - %(message)s",
-    datefmt="%Y-%m-%dT%H:%M:%S",
-    level=logging.DEBUG,
-)
+setup_logging()
 logger = logging.getLogger(__name__)
 logger.info("Starting App")
 # External libraries can be noisy so set them differently than the global logging level
 logging.getLogger("passlib").setLevel(logging.INFO)
 logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.CRITICAL)
 logging.getLogger("python_multipart").setLevel(logging.INFO)
-logging.getLogger("python_multipart").setLevel(logging.INFO)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if WARMUP:
+        warm_up_task = asyncio.create_task(warm_up())
+    else:
+        readiness.ready = True
+    await jobs.runner.start()
     yield
+    # Fail readiness first so no new traffic is sent while stopping
+    readiness.ready = False
+    if WARMUP:
+        warm_up_task.cancel()
+    await jobs.runner.stop()
     logger.info("Exiting App")
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 api_v1_router = APIRouter(prefix=PREFIX_API_V1)
 api_v1_router.include_router(token.router)
@@ -44,4 +53,9 @@ api_v1_router.include_router(admin.router)
 api_v1_router.include_router(users.router)
 api_v1_router.include_router(countries.router)
 api_v1_router.include_router(visits.router)
+api_v1_router.include_router(stats.router)
+api_v1_router.include_router(jobs_router.router)
+api_v1_router.include_router(batch.router)
 app.include_router(api_v1_router)
+app.include_router(metrics.router)
+app.include_router(health.router)
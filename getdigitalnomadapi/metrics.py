@@ -0,0 +1,308 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+"""
+Metric types
+    Every thread writes to its own shard (a plain dict) so the hot path takes
+    no lock; the registry lock is only taken when a thread writes its first
+    sample and when /metrics merges the shards on scrape. Shards of finished
+    threads, such as those the threadpool recycles, are then folded into one
+    base shard, so the shards stay bounded by the live threads.
+"""
+
+_registry: list["Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._local = threading.local()
+        # Thread ident -> (thread, shard) of the live writing threads
+        self._shards: dict[int, tuple[threading.Thread, dict]] = {}
+        self._base: dict = {}  # samples of finished threads
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            thread = threading.current_thread()
+            with _registry_lock:
+                # A new thread may reuse the ident of a finished one
+                self._fold_finished()
+                self._shards[thread.ident] = (thread, shard)
+            return shard
+
+    def _fold_finished(self):
+        """
+        Move the shards of finished threads, which write no more, into the
+        base shard. The registry lock must be held.
+        """
+        for ident, (thread, shard) in list(self._shards.items()):
+            if not thread.is_alive():
+                self._add(self._base, shard)
+                del self._shards[ident]
+
+    def _copy(self, shard: dict) -> dict:
+        return shard.copy()
+
+    def _add(self, total: dict, shard: dict):
+        for labelvalues, value in shard.items():
+            total[labelvalues] = total.get(labelvalues, 0) + value
+
+    def _merged(self) -> dict:
+        with _registry_lock:
+            self._fold_finished()
+            shards = [self._copy(self._base)] + [
+                self._copy(shard) for _, shard in self._shards.values()
+            ]
+        merged = {}
+        for shard in shards:
+            self._add(merged, shard)
+        return merged
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}"
+            for labelvalues, value in sorted(self._merged().items())
+        ]
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge that can be moved up and down from any thread"""
+
+    type = "gauge"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class CallbackGauge(Metric):
+    """Gauge read from `callback` at scrape time"""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def samples(self) -> list[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.warning("Metric %s unavailable: %r", self.name, e)
+            return []
+        return [f"{self.name} {value}"]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labelvalues):
+        shard = self._shard()
+        # [count per bucket..., count in +Inf, sum]
+        row = shard.get(labelvalues)
+        if row is None:
+            row = shard[labelvalues] = [0] * (len(self.buckets) + 2)
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def _copy(self, shard: dict) -> dict:
+        return {labelvalues: list(row) for labelvalues, row in shard.copy().items()}
+
+    def _add(self, total: dict, shard: dict):
+        for labelvalues, row in shard.items():
+            merged = total.setdefault(labelvalues, [0] * len(row))
+            for i, value in enumerate(row):
+                merged[i] += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labelvalues, row in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {row[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+"""
+Application metrics
+"""
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+DB_POOL_CHECKED_OUT = CallbackGauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the SQLAlchemy pool",
+    lambda: engine.pool.checkedout(),
+)
+DB_POOL_OVERFLOW = CallbackGauge(
+    "db_pool_overflow",
+    "Connections opened beyond the SQLAlchemy pool size",
+    lambda: max(engine.pool.overflow(), 0),
+)
+DB_POOL_SIZE = CallbackGauge(
+    "db_pool_size",
+    "Configured size of the SQLAlchemy pool",
+    lambda: engine.pool.size(),
+)
+JWT_DECODES = Counter(
+    "jwt_decode_total",
+    "JWT access tokens decoded",
+)
+JWT_DECODE_FAILURES = Counter(
+    "jwt_decode_failures_total",
+    "JWT access tokens rejected by reason",
+    ("reason",),
+)
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying passwords",
+    ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+SUMMARY_ROWS = Histogram(
+    "summary_rows",
+    "Rows returned by process_summary",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+SSE_STREAMS = Gauge(
+    "sse_streams",
+    "Open /me/events streams",
+)
+SSE_EVENTS_DROPPED = Counter(
+    "sse_events_dropped_total",
+    "Events dropped for slow /me/events clients, replaced by a resync",
+)
+SINGLE_FLIGHT_COMPUTATIONS = Counter(
+    "single_flight_computations_total",
+    "Expensive reads computed, by endpoint",
+    ("endpoint",),
+)
+SINGLE_FLIGHT_COALESCED = Counter(
+    "single_flight_coalesced_total",
+    "Requests served by an identical request's computation, by endpoint",
+    ("endpoint",),
+)
+SINGLE_FLIGHT_TIMEOUTS = Counter(
+    "single_flight_timeouts_total",
+    "Requests that gave up waiting for a computation, by endpoint",
+    ("endpoint",),
+)
+IDEMPOTENT_REPLAYS = Counter(
+    "idempotent_replays_total",
+    "Retries answered with the stored response of their Idempotency-Key",
+    ("endpoint",),
+)
+
+
+"""
+Middleware
+"""
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # Label with the route template, not the raw path, to bound cardinality
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+            HTTP_REQUEST_DURATION.observe(duration, scope["method"], route)
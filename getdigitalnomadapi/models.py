@@ -1,9 +1,13 @@
 import uuid
 from datetime import date, datetime, timezone
+from typing import Any, Literal
 
 from pydantic import EmailStr
+from sqlalchemy import JSON, Index, Text, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
+from .config import BATCH_MAX_REQUESTS
+
 """
 Token Model
 """
@@ -83,6 +87,21 @@ class UserAdmin(UserPublicWithVisits):
     pass
 
 
+class UserAdminSummary(UserPublic):
+    """Visit aggregates for the admin listing, dates are visit starts"""
+
+    visits: int
+    first_visit: date | None
+    last_visit: date | None
+    countries: int
+    schengen_days_180: int
+
+
+class UserAdminPage(SQLModel):
+    users: list[UserAdminSummary]
+    next_after: uuid.UUID | None
+
+
 class UserUpdate(SQLModel):
     username: str | None = None
     hashed_password: str | None = None
@@ -139,6 +158,9 @@ class VisitBase(MySQLModel):
 
 
 class Visit(VisitBase, table=True):
+    # Range scans of one user's visits by date, see overlaps.py
+    __table_args__ = (Index("ix_visit_user_id_start", "user_id", "start"),)
+
     id: int | None = Field(default=None, primary_key=True)
 
     user: User | None = Relationship(back_populates="visits")
@@ -148,7 +170,8 @@ class Visit(VisitBase, table=True):
 
 
 class VisitCreate(VisitBase):
-    pass
+    user_id: uuid.UUID | None = None
+    country_id: int | None = None
 
 
 class VisitPublic(VisitBase):
@@ -174,7 +197,8 @@ class VisitPublicWithCountryAndUser(VisitPublic):
 
 class VisitUserMePublic(SQLModel):
     id: int
-    country_id: int
+    # None once the country is deleted
+    country_id: int | None
     start: date | None
     end: date | None
 
@@ -182,3 +206,256 @@ class VisitUserMePublic(SQLModel):
 class VisitsUserMePublicSummary(SQLModel):
     num_visit: int
     visits: list[VisitUserMePublic]
+
+
+class VisitChange(SQLModel, table=True):
+    """Latest change of each visit per user, see changes.py"""
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "visit_id"),
+        Index("ix_visitchange_user_id_id", "user_id", "id"),
+        # Ids are cursors, never reuse them
+        {"sqlite_autoincrement": True},
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.id")
+    visit_id: int
+    deleted: bool = False
+    changed_at: datetime
+
+
+class VisitChangeHorizon(SQLModel, table=True):
+    """Highest change id of the user removed by compaction"""
+
+    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
+    horizon: int
+
+
+class VisitChangePublic(SQLModel):
+    visit_id: int
+    deleted: bool
+    visit: VisitUserMePublic | None
+
+
+class VisitChanges(SQLModel):
+    changes: list[VisitChangePublic]
+    cursor: int
+    # The changes are a full snapshot replacing the client's copy
+    reset: bool
+    more: bool
+
+
+class VisitTimeline(SQLModel):
+    startDate: date
+    endDate: date
+    # [country_id | None | list[country_id], first_day, run_length]
+    segments: list[tuple[int | list[int] | None, date, int]]
+
+
+class VisitOverlap(SQLModel):
+    user_id: uuid.UUID | None
+    visit_id: int
+    overlapping_visit_id: int
+    start: date
+    end: date | None
+
+
+class PresenceUser(SQLModel):
+    user_id: uuid.UUID
+    days: int
+
+
+class PresencePage(SQLModel):
+    users: list[PresenceUser]
+    next_after: uuid.UUID | None
+
+
+"""
+Statistics Model
+    Maintained incrementally by stats.py from the visit write paths, only
+    completed visits (end set) are counted.
+    CountryMonthStat per country per month (first day of the month):
+        visits: visits starting in the month
+        stay_days: total length of those visits
+        days: days spent in the country during the month
+        users: distinct users in the country during the month
+    CountryMonthUser counts each user's visits per country per month so
+    `users` can be kept exact as visits come and go.
+"""
+
+
+class CountryMonthStat(SQLModel, table=True):
+    country_id: int = Field(foreign_key="country.id", primary_key=True)
+    month: date = Field(primary_key=True, index=True)
+    visits: int = 0
+    stay_days: int = 0
+    days: int = 0
+    users: int = 0
+
+
+class CountryMonthUser(SQLModel, table=True):
+    country_id: int = Field(foreign_key="country.id", primary_key=True)
+    month: date = Field(primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.id", primary_key=True)
+    visits: int = 0
+
+
+class CountryStatPublic(SQLModel):
+    country_id: int
+    country_name: str
+    country_code: str
+    visits: int
+    days: int
+    avg_stay_days: float | None
+
+
+class CountryMonthStatPublic(SQLModel):
+    month: date
+    visits: int
+    days: int
+    users: int
+    avg_stay_days: float | None
+
+
+class SchengenShare(SQLModel):
+    month: date
+    schengen_days: int
+    days: int
+    share: float
+
+
+"""
+Schengen plan Model
+    Hypothetical trips are Schengen days unless country_id is a non Schengen
+    country. max_stay answers "how long can I stay entering on `entry`",
+    earliest_entry "when can I start a `trip_days` trip", searched from
+    `earliest_from` (default today) for `search_days` days.
+"""
+
+
+class SchengenTrip(SQLModel):
+    start: date
+    end: date
+    country_id: int | None = None
+
+
+class SchengenPlanRequest(SQLModel):
+    trips: list[SchengenTrip] = []
+    entry: date | None = None
+    trip_days: int | None = Field(default=None, ge=1, le=90)
+    earliest_from: date | None = None
+    search_days: int = Field(default=365, ge=1, le=3650)
+
+
+class SchengenPlan(SQLModel):
+    entry: date | None = None
+    days_used: int | None = None  # in the 180 days before entry
+    max_stay: int | None = None
+    leave_by: date | None = None
+    trip_days: int | None = None
+    earliest_entry: date | None = None
+
+
+"""
+Job Model
+    Long running work (summaries, exports) run by jobs.JobRunner off the
+    request path. status: queued -> running -> succeeded | failed, or
+    cancelling -> cancelled when a client cancels.
+"""
+
+
+class JobBase(MySQLModel):
+    kind: str
+    params: dict = Field(default_factory=dict, sa_type=JSON)
+
+
+class Job(JobBase, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.id", index=True)
+    status: str = Field(default="queued", index=True)
+    progress: float = 0.0
+    attempts: int = 0
+    error: str | None = None
+    result: str | None = Field(default=None, sa_type=Text)
+    result_media_type: str | None = None
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    # Worker running the job, until its lease runs out, see jobs.py
+    owner: str | None = None
+    lease_expires_at: datetime | None = None
+
+
+class JobCreate(SQLModel):
+    kind: Literal["summary", "export"]
+    params: dict = {}
+
+
+class JobPublic(JobBase):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    status: str
+    progress: float
+    attempts: int
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+
+"""
+Batch Model
+    Sub-requests of POST /api/v1/batch, paths relative to /api/v1
+"""
+
+
+class BatchItem(SQLModel):
+    id: str | None = None
+    method: Literal["GET", "POST", "PATCH", "PUT", "DELETE"] = "GET"
+    path: str
+    query: dict[str, str | int | float | bool] = {}
+    body: Any = None
+
+
+class BatchRequest(SQLModel):
+    requests: list[BatchItem] = Field(min_length=1, max_length=BATCH_MAX_REQUESTS)
+
+
+class BatchResponseItem(SQLModel):
+    id: str | None
+    status: int
+    body: Any
+
+
+"""
+Data Migration Model
+    Checkpoints of batched data migrations, see datamigrations.py
+"""
+
+
+class DataMigration(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    last_id: int | None = None  # last primary key done, None before the first
+    rows: int = 0
+    started_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+
+"""
+Idempotency Key Model
+    Responses stored for Idempotency-Key retries, see idempotency.py
+"""
+
+
+class IdempotencyKey(SQLModel, table=True):
+    __table_args__ = (Index("ix_idempotencykey_created_at", "created_at"),)
+
+    id: str = Field(primary_key=True)  # sha256 of method, path, caller and key
+    request_hash: str  # sha256 of the body
+    status_code: int | None = None  # None while the first request runs
+    headers: list = Field(default_factory=list, sa_type=JSON)
+    body: bytes | None = None
+    created_at: datetime
+    # Set in the transaction of the request's write, see idempotency.py
+    committed_at: datetime | None = None
@@ -0,0 +1,77 @@
+import logging
+import uuid
+from datetime import date
+
+from sqlalchemy.sql.operators import is_
+from sqlmodel import Session, or_, select
+
+from .models import Visit
+
+logger = logging.getLogger(__name__)
+
+# An open visit (end is None) is treated as lasting forever
+OPEN_END = date.max
+
+"""
+Overlap detection
+    Visits are closed intervals [start, end]. Single writes are checked with
+    a range query on ix_visit_user_id_start, the whole table is scanned with
+    a sweep over visits sorted by (user_id, start).
+"""
+
+
+def find_overlapping_visits(
+    session: Session,
+    user_id: uuid.UUID,
+    start: date,
+    end: date | None,
+    exclude_id: int | None = None,
+) -> list[Visit]:
+    query = (
+        select(Visit)
+        .where(Visit.user_id == user_id)
+        .where(Visit.start <= (end or OPEN_END))
+        .where(or_(Visit.end >= start, is_(Visit.end, None)))
+    )
+    if exclude_id is not None:
+        query = query.where(Visit.id != exclude_id)
+    return session.exec(query.order_by(Visit.start.asc())).all()
+
+
+def merge_into(visit: Visit, overlaps: list[Visit]):
+    """Stretch `visit` to cover every visit in `overlaps`"""
+    visit.start = min([visit.start] + [other.start for other in overlaps])
+    ends = [visit.end] + [other.end for other in overlaps]
+    visit.end = None if None in ends else max(ends)
+
+
+def scan_overlaps(rows) -> list[dict]:
+    """
+    `rows` of (id, user_id, start, end) sorted by user_id then start, e.g.
+    straight from an ORDER BY on the index. Each visit starting before the
+    furthest end seen so far for the same user is reported against the
+    visit owning that end, so the sweep is linear after the sort.
+    """
+    overlaps = []
+    current_user = None
+    reach_id, reach_end = None, None
+    for visit_id, user_id, start, end in rows:
+        end = end or OPEN_END
+        if user_id != current_user:
+            current_user = user_id
+            reach_id, reach_end = visit_id, end
+            continue
+        if start <= reach_end:
+            overlap_end = min(end, reach_end)
+            overlaps.append(
+                {
+                    "user_id": user_id,
+                    "visit_id": visit_id,
+                    "overlapping_visit_id": reach_id,
+                    "start": start,
+                    "end": None if overlap_end == OPEN_END else overlap_end,
+                }
+            )
+        if end > reach_end:
+            reach_id, reach_end = visit_id, end
+    return overlaps
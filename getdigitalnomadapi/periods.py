@@ -0,0 +1,110 @@
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+
+from .presence import OPEN_END_DAY, to_day
+from .visitdays import VisitDays, to_date
+
+logger = logging.getLogger(__name__)
+
+GRANULARITY_MONTHS = {"month": 1, "quarter": 3, "year": 12}
+
+"""
+Period summaries
+    Days per country for many periods from one pass over a user's visits.
+    Each visit adds +1 on its first day and -1 after its last day on a day
+    axis spanning the visits within the periods; a cumulative sum gives the visits in progress
+    per country per day and a second one the present days so far, C. The
+    days of every period [a, b] are then C[b + 1] - C[a]. Overlapping visits
+    to one country count once, as in process_summary, and the Schengen row
+    counts days in any Schengen country. An open visit (end None) runs to
+    the end of the last period.
+"""
+
+
+def period_ranges(
+    granularity: str, start_dt: date, end_dt: date, year_start: int = 1
+) -> list[tuple[date, date]]:
+    """
+    Calendar periods covering [start_dt, end_dt], the first and last clipped
+    to it. Years, and the quarters in them, begin on the first of month
+    `year_start`, so year_start=4 gives April to March fiscal years.
+    """
+    step = GRANULARITY_MONTHS[granularity]
+    # Months since year 0 of the period start on or before start_dt
+    month = start_dt.year * 12 + start_dt.month - 1
+    month -= (month - (year_start - 1)) % step
+    periods = []
+    while True:
+        first = date(month // 12, month % 12 + 1, 1)
+        if first > end_dt:
+            return periods
+        month += step
+        last = date(month // 12, month % 12 + 1, 1) - timedelta(days=1)
+        periods.append((max(first, start_dt), min(last, end_dt)))
+
+
+def daily_presence(
+    visits: VisitDays, schengen_ids, first: date, last: date
+) -> tuple[list[int], np.ndarray]:
+    """
+    The country ids of `visits` and whether each of them, then any Schengen
+    country, was visited on each day of [first, last], as an array
+    [country + 1, day]
+    """
+    country_ids, country = np.unique(visits.country_id, return_inverse=True)
+    n_days = (last - first).days + 1
+    first_day = to_day(first)
+    start = np.maximum(visits.start.astype(np.int64), first_day) - first_day
+    end = np.minimum(visits.end.astype(np.int64), to_day(last)) - first_day
+    inside = start <= end
+    boundaries = np.zeros((len(country_ids), n_days + 1), dtype=np.int32)
+    np.add.at(boundaries, (country[inside], start[inside]), 1)
+    np.add.at(boundaries, (country[inside], end[inside] + 1), -1)
+    present = np.cumsum(boundaries[:, :n_days], axis=1, dtype=np.int32) > 0
+    schengen = np.isin(country_ids, list(schengen_ids))
+    present = np.vstack([present, present[schengen].any(axis=0)])
+    return country_ids.tolist(), present
+
+
+def period_days(
+    visits: VisitDays, schengen_ids, periods: list[tuple[date, date]]
+) -> tuple[list[int], np.ndarray, np.ndarray]:
+    """
+    Returns the country ids of `visits`, their days per period as an array
+    [country, period] and the days in Schengen countries (`schengen_ids`)
+    per period.
+    """
+    if not periods:
+        country_ids = np.unique(visits.country_id).tolist()
+        empty = np.zeros((len(country_ids) + 1, 0), dtype=np.int64)
+        return country_ids, empty[:-1], empty[-1]
+    period_start = np.array([to_day(start) for start, _ in periods], dtype=np.int64)
+    period_end = np.array([to_day(end) for _, end in periods], dtype=np.int64)
+    # The axis only spans the visits within the periods, up to the day after
+    # the last finite end or open start: from then on only open visits are
+    # present, the same every day
+    first_day = int(period_start.min())
+    last_day = int(period_end.max())
+    if len(visits):
+        first_day = max(first_day, int(visits.start.min()))
+        end = np.where(visits.end == OPEN_END_DAY, visits.start, visits.end)
+        last_day = min(last_day, int(end.max()) + 1)
+    last_day = max(first_day, last_day)
+    country_ids, present = daily_presence(
+        visits, schengen_ids, to_date(first_day), to_date(last_day)
+    )
+
+    n_days = present.shape[1]
+    cumulative = np.zeros((len(present), n_days + 1), dtype=np.int64)
+    np.cumsum(present, axis=1, out=cumulative[:, 1:])
+
+    def days_through(day: np.ndarray) -> np.ndarray:
+        """Present days from the start of the axis through `day`"""
+        within = cumulative[:, np.clip(day - first_day + 1, 0, n_days)]
+        beyond = present[:, -1:] * np.maximum(day - last_day, 0)
+        return within + beyond
+
+    days = days_through(period_end) - days_through(period_start - 1)
+    return country_ids, days[:-1], days[-1]
@@ -0,0 +1,108 @@
+import logging
+import uuid
+from datetime import date
+
+from sqlalchemy import DDL, event, text
+from sqlmodel import Session, select
+
+from .models import Country, Visit
+
+logger = logging.getLogger(__name__)
+
+EPOCH = date(1970, 1, 1)
+OPEN_END_DAY = 2**31 - 1
+
+"""
+Presence index
+    visit_rtree is a SQLite R*Tree over (day range, country_id) holding
+    user_id as an auxiliary column. Triggers on visit keep it in sync, so
+    "who was in country X between D1 and D2" is answered from the index
+    without scanning visit. Days are integers counted from 1970-01-01 and an
+    open visit (end NULL) runs to OPEN_END_DAY. Days of one user's
+    overlapping visits are summed, not deduplicated.
+"""
+
+_START_DAY = "CAST(julianday(NEW.start) - 2440587.5 AS INTEGER)"
+_END_DAY = (
+    f'COALESCE(CAST(julianday(NEW."end") - 2440587.5 AS INTEGER), {OPEN_END_DAY})'
+)
+_ROW = f"{_START_DAY}, {_END_DAY}, NEW.country_id, NEW.country_id, NEW.user_id"
+
+RTREE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS visit_rtree USING rtree_i32("
+    "id, min_day, max_day, min_country, max_country, +user_id)",
+    "CREATE TRIGGER IF NOT EXISTS visit_rtree_insert AFTER INSERT ON visit "
+    "WHEN NEW.country_id IS NOT NULL BEGIN "
+    f"INSERT INTO visit_rtree VALUES (NEW.id, {_ROW}); END",
+    "CREATE TRIGGER IF NOT EXISTS visit_rtree_update AFTER UPDATE ON visit BEGIN "
+    "DELETE FROM visit_rtree WHERE id = OLD.id; "
+    f"INSERT INTO visit_rtree SELECT NEW.id, {_ROW} WHERE NEW.country_id IS NOT NULL; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS visit_rtree_delete AFTER DELETE ON visit BEGIN "
+    "DELETE FROM visit_rtree WHERE id = OLD.id; END",
+]
+
+# Databases created with SQLModel.metadata.create_all (tests, load tests)
+# get the index too; existing databases get it from the Alembic migration
+for statement in RTREE_DDL:
+    event.listen(
+        Visit.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+
+
+def to_day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+def _user_id(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(value)
+
+
+def find_present_users(
+    session: Session,
+    start_dt: date,
+    end_dt: date,
+    country_id: int | None = None,
+    schengen: bool = False,
+    after: uuid.UUID | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    """
+    Users with a visit to `country_id` (or any Schengen country) overlapping
+    [start_dt, end_dt], ordered by user id, with the number of overlapping
+    days. Page with `after`, the last user id of the previous page.
+    """
+    params = {
+        "start_day": to_day(start_dt),
+        "end_day": to_day(end_dt),
+        "limit": limit,
+        "after": after.hex if after else "",
+    }
+    if schengen:
+        country_ids = session.exec(select(Country.id).where(Country.schengen)).all()
+    else:
+        country_ids = [country_id]
+    # One R*Tree probe per country; an IN or a join on country would scan
+    # every visit in the date range instead
+    probes = []
+    for i, probe_country_id in enumerate(country_ids):
+        params[f"country_{i}"] = probe_country_id
+        probes.append(
+            "SELECT user_id, min_day, max_day FROM visit_rtree "
+            "WHERE min_day <= :end_day AND max_day >= :start_day "
+            f"AND min_country <= :country_{i} AND max_country >= :country_{i} "
+            "AND user_id > :after"
+        )
+    if not probes:
+        return []
+
+    rows = session.connection().execute(
+        text(
+            "SELECT r.user_id, "
+            "SUM(MIN(r.max_day, :end_day) - MAX(r.min_day, :start_day) + 1) AS days "
+            f"FROM ({' UNION ALL '.join(probes)}) r "
+            "GROUP BY r.user_id ORDER BY r.user_id LIMIT :limit"
+        ),
+        params,
+    )
+    return [{"user_id": _user_id(user_id), "days": days} for user_id, days in rows]
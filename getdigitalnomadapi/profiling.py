@@ -0,0 +1,258 @@
+import cProfile
+import inspect
+import logging
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException, status
+
+from .config import PROFILE_BUFFER_SIZE, PROFILE_SAMPLE_RATE
+from .database import get_session
+from .dependencies import (
+    get_current_active_user,
+    get_current_admin_user,
+    get_current_user,
+)
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_TOP_FUNCTIONS = 50
+
+# Own time of functions matching these fragments is summed per bucket
+BREAKDOWN_BUCKETS = {
+    "sqlalchemy": ("/sqlalchemy/", "/sqlmodel/", "sqlite3"),
+    "pandas": ("/pandas/", "/numpy/"),
+    "serialization": ("/pydantic/", "pydantic_core", "/json/", "fastapi/encoders"),
+}
+
+profiles: deque[dict] = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiling_active = False
+# HTTP requests in the middleware, and entered it since startup
+_in_flight = 0
+_started = 0
+
+"""
+Limits
+    cProfile records the event loop thread from enable() to disable(), so a
+    profile also holds the coroutines of other requests the loop ran
+    meanwhile; `concurrent_requests` counts them, a profile is only clean
+    when it is 0. Sync endpoints run in the threadpool and are not recorded,
+    their profile shows time waiting on the pool and has `threadpool` set.
+"""
+
+
+"""
+Profile store
+"""
+
+
+def list_profiles() -> list[dict]:
+    return [
+        {key: value for key, value in profile.items() if key != "functions"}
+        for profile in reversed(profiles)
+    ]
+
+
+def get_profile(profile_id: str) -> dict | None:
+    for profile in profiles:
+        if profile["id"] == profile_id:
+            return profile
+    return None
+
+
+def _function_name(func: tuple) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name
+    return f"{filename}:{lineno}({name})"
+
+
+def _bucket(func: tuple) -> str:
+    name = _function_name(func)
+    for bucket, fragments in BREAKDOWN_BUCKETS.items():
+        if any(fragment in name for fragment in fragments):
+            return bucket
+    return "other"
+
+
+def build_profile(profiler: cProfile.Profile) -> tuple[dict, list[dict]]:
+    """
+    Reduce the raw profiler stats to a time breakdown per bucket and the top
+    functions by cumulative time, each with its callers so the call tree can
+    be rebuilt
+    """
+    stats = pstats.Stats(profiler).stats
+    breakdown = {bucket: 0.0 for bucket in BREAKDOWN_BUCKETS}
+    breakdown["other"] = 0.0
+    for func, (_, _, tottime, _, _) in stats.items():
+        breakdown[_bucket(func)] += tottime
+
+    top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    functions = [
+        {
+            "function": _function_name(func),
+            "ncalls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+            "callers": [_function_name(caller) for caller in callers],
+        }
+        for func, (_, ncalls, tottime, cumtime, callers) in top[:PROFILE_TOP_FUNCTIONS]
+    ]
+    breakdown_ms = {
+        bucket: round(value * 1000, 3) for bucket, value in breakdown.items()
+    }
+    return breakdown_ms, functions
+
+
+"""
+Middleware
+"""
+
+
+def _profile_requested(scope) -> bool:
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            return value in (b"1", b"true")
+    query = parse_qs(scope["query_string"].decode("latin-1"))
+    return query.get("profile", [""])[-1] in ("1", "true")
+
+
+async def _authorize_admin(scope):
+    """
+    Run the same dependency chain as admin routes; the session dependency is
+    looked up through the app so test overrides still apply
+    """
+    authorization = ""
+    for key, value in scope["headers"]:
+        if key == b"authorization":
+            authorization = value.decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    app = scope["app"]
+    sessions = app.dependency_overrides.get(get_session, get_session)()
+    session = next(sessions)
+    try:
+        user = await get_current_user(token=token, session=session)
+        user = await get_current_active_user(current_user=user)
+        return await get_current_admin_user(current_user=user)
+    finally:
+        sessions.close()
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request when an admin sends `X-Profile: 1` (or
+    `?profile=1`), and a random PROFILE_SAMPLE_RATE fraction of all requests.
+    Results go to the in-memory ring buffer served from /admin/profiles/.
+    See Limits above for what a profile does and does not record.
+    """
+
+    def __init__(self, app, sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight, _started
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        _in_flight += 1
+        _started += 1
+        try:
+            await self._dispatch(scope, receive, send)
+        finally:
+            _in_flight -= 1
+
+    async def _dispatch(self, scope, receive, send):
+        admin = None
+        if _profile_requested(scope):
+            try:
+                admin = await _authorize_admin(scope)
+            except HTTPException:
+                # Only a debug flag, others get their normal response
+                pass
+        if admin is not None:
+            trigger = f"admin:{admin.id}"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            trigger = "sampled"
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        await self.profile(scope, receive, send, trigger)
+
+    async def profile(self, scope, receive, send, trigger: str):
+        global _profiling_active
+        if _profiling_active:
+            # Only one profiler can be attached to the thread at a time
+            logger.warning("Profiler busy, not profiling %s", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status_code = None
+
+        async def send_with_profile_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode())
+                ]
+            await send(message)
+
+        _profiling_active = True
+        running, started = _in_flight - 1, _started
+        profiler = cProfile.Profile()
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            # Requests that were running or started while profiling
+            concurrent = running + _started - started
+            _profiling_active = False
+            route = scope.get("route")
+            endpoint = getattr(route, "endpoint", None)
+            breakdown, functions = build_profile(profiler)
+            profiles.append(
+                {
+                    "id": profile_id,
+                    "trigger": trigger,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query_string": scope["query_string"].decode("latin-1"),
+                    "status_code": status_code,
+                    "started_at": started_at,
+                    "duration_ms": round(duration * 1000, 3),
+                    "concurrent_requests": concurrent,
+                    "threadpool": endpoint is not None
+                    and not inspect.iscoroutinefunction(endpoint),
+                    "breakdown_ms": breakdown,
+                    "functions": functions,
+                }
+            )
+            logger.info(
+                "Profiled %s %s in %.1fms (id=%s)",
+                scope["method"],
+                scope["path"],
+                duration * 1000,
+                profile_id,
+            )
@@ -0,0 +1,155 @@
+import asyncio
+import base64
+import json
+import logging
+from typing import Annotated
+from urllib.parse import urlencode
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+
+from ..database import shared_session
+from ..dependencies import SessionDep, authenticated_user, get_current_active_user
+from ..models import BatchItem, BatchRequest, BatchResponseItem, User
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"],
+)
+
+# Nested batches, and streams that never finish
+EXCLUDED_PATHS = ("/batch", "/me/events")
+
+"""
+Batch
+    Runs sub-requests against the routers in-process. The caller is
+    authenticated once and all sub-requests share that user and one database
+    session. Consecutive GETs run concurrently, every other method runs on its
+    own in order, so a write sees the reads before it and the reads after it
+    see the write. All GET handlers are async and use the session from the
+    event loop only, never from two threads at once.
+"""
+
+
+def _query_string(query: dict) -> bytes:
+    return urlencode(
+        {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in query.items()
+        }
+    ).encode()
+
+
+def _decode_body(body: bytes, content_type: str):
+    if not body:
+        return None
+    if content_type.startswith("application/json"):
+        return json.loads(body)
+    if content_type.startswith("text/"):
+        return body.decode()
+    return base64.b64encode(body).decode()
+
+
+async def dispatch(request: Request, prefix: str, item: BatchItem) -> BatchResponseItem:
+    path = prefix + item.path
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    headers = [(b"content-type", b"application/json")]
+    if "authorization" in request.headers:
+        headers.append(
+            (b"authorization", request.headers["authorization"].encode("latin-1"))
+        )
+    scope = {
+        key: request.scope[key]
+        for key in (
+            "type",
+            "asgi",
+            "http_version",
+            "scheme",
+            "server",
+            "client",
+            "root_path",
+            "app",
+            "state",
+        )
+        if key in request.scope
+    }
+    scope.update(
+        method=item.method,
+        path=path,
+        raw_path=path.encode(),
+        query_string=_query_string(item.query),
+        headers=headers,
+    )
+
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    response = {"status": 500, "content_type": "", "body": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            for key, value in message["headers"]:
+                if key == b"content-type":
+                    response["content_type"] = value.decode("latin-1")
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        # Through the whole app, so sub-requests show up in metrics and
+        # errors are turned into responses as usual
+        await request.app(scope, receive, send)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", item.method, path)
+        return BatchResponseItem(
+            id=item.id, status=500, body={"detail": "Internal Server Error"}
+        )
+    return BatchResponseItem(
+        id=item.id,
+        status=response["status"],
+        body=_decode_body(b"".join(response["body"]), response["content_type"]),
+    )
+
+
+@router.post("", response_model=list[BatchResponseItem])
+async def batch(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    request: Request,
+    batch: BatchRequest,
+):
+    for item in batch.requests:
+        if not item.path.startswith("/") or item.path.startswith(EXCLUDED_PATHS):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"path {item.path!r} can not be batched",
+            )
+    prefix = request.scope["path"].removesuffix(router.prefix)
+
+    user_token = authenticated_user.set(current_user)
+    session_token = shared_session.set(session)
+    try:
+        responses: list[BatchResponseItem] = []
+        items = batch.requests
+        i = 0
+        while i < len(items):
+            j = i + 1
+            if items[i].method == "GET":
+                while j < len(items) and items[j].method == "GET":
+                    j += 1
+            responses += await asyncio.gather(
+                *(dispatch(request, prefix, item) for item in items[i:j])
+            )
+            i = j
+    finally:
+        authenticated_user.reset(user_token)
+        shared_session.reset(session_token)
+    return responses
@@ -1,32 +1,41 @@
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
+from ..changes import log_visit_changes
 from ..database import get_session
 from ..dependencies import SessionDep
+from ..idempotency import IdempotentRoute
 from ..models import (
     Country,
     CountryCreate,
     CountryPublic,
     CountryUpdate,
+    Visit,
 )
+from ..search import country_index
+from ..singleflight import single_flight
+from ..stats import record_visit_change
+from ..writes import delete_returning, insert_returning, update_returning
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/countries",
     tags=["countries"],
+    route_class=IdempotentRoute,
 )
 
 
 @router.post("/", response_model=CountryPublic)
 async def create_country(*, session: SessionDep, country: CountryCreate) -> Country:
-    db_country = Country.model_validate(country)
     try:
-        session.add(db_country)
+        db_country = insert_returning(session, Country.model_validate(country))
         session.commit()
+        country_index.invalidate()
     except IntegrityError as e:
         session.rollback()
         logger.error(repr(e))
@@ -34,8 +43,6 @@ async def create_country(*, session: SessionDep, country: CountryCreate) -> Coun
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=repr(e),
         )
-    else:
-        session.refresh(db_country)
 
     return db_country
 
@@ -51,6 +58,19 @@ async def read_countries(
     return countries
 
 
+@router.get("/search", response_model=list[CountryPublic])
+async def search_countries(
+    *,
+    session: SessionDep,
+    q: str,
+    limit: int = Query(default=10, le=50),
+) -> list[CountryPublic]:
+    """Prefix search over names, codes and aliases with typo fallback, see search.py"""
+    if country_index.stale:
+        country_index.load(session)
+    return country_index.search(q, limit)
+
+
 @router.get("/{country_id}", response_model=CountryPublic)
 async def read_country(*, session: SessionDep, country_id: int) -> Country:
     country = session.get(Country, country_id)
@@ -65,27 +85,49 @@ async def read_country(*, session: SessionDep, country_id: int) -> Country:
 def update_country(
     *, session: SessionDep, country_id: int, country: CountryUpdate
 ) -> Country:
-    db_country = session.get(Country, country_id)
+    country_data = country.model_dump(exclude_unset=True)
+    try:
+        db_country = update_returning(session, Country, country_id, country_data)
+        session.commit()
+        country_index.invalidate()
+    except IntegrityError as e:
+        session.rollback()
+        logger.error(repr(e))
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=repr(e),
+        )
     if not db_country:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="country not found"
         )
-    country_data = country.model_dump(exclude_unset=True)
-    for key, value in country_data.items():
-        setattr(db_country, key, value)
-    session.add(db_country)
-    session.commit()
-    session.refresh(db_country)
     return db_country
 
 
 @router.delete("/{country_id}")
 async def delete_country(*, session: SessionDep, country_id: int):
-    country = session.get(Country, country_id)
-    if not country:
+    # Visits keep their rows without a country, as the ORM delete did
+    visits = session.execute(
+        update(Visit)
+        .where(Visit.country_id == country_id)
+        .values(country_id=None)
+        .returning(Visit.user_id, Visit.id, Visit.start, Visit.end)
+    ).all()
+    if not delete_returning(session, Country, country_id):
+        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="country not found"
         )
-    session.delete(country)
+    for user_id, _, start, end in visits:
+        record_visit_change(
+            session,
+            before=(user_id, country_id, start, end),
+            after=(user_id, None, start, end),
+        )
+    log_visit_changes(
+        session, [(user_id, visit_id, False) for user_id, visit_id, *_ in visits]
+    )
     session.commit()
+    country_index.invalidate()
+    single_flight.written(*(user_id for user_id, *_ in visits))
     return {"ok": True}
@@ -0,0 +1,30 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, status
+
+from ..warmup import RETRY_SECONDS, readiness
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+)
+
+
+@router.get("/live")
+async def read_live():
+    """The process is up and serving, restart it when this fails"""
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def read_ready():
+    """Send traffic only once the warm-up in warmup.py has finished"""
+    if not readiness.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=readiness.error or "Warming up",
+            headers={"Retry-After": str(RETRY_SECONDS)},
+        )
+    return {"status": "ready", "warmup_ms": round(readiness.warmup_ms or 0)}
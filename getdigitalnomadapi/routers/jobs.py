@@ -0,0 +1,128 @@
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import update
+from sqlmodel import select
+
+from .. import jobs
+from ..dependencies import SessionDep, get_current_active_user
+from ..models import Job, JobCreate, JobPublic, User
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+"""
+Background jobs of the current logged in user
+    Submit with POST, poll GET /jobs/{id} until status is succeeded, failed
+    or cancelled, then download GET /jobs/{id}/result.
+"""
+
+
+def _get_own_job(session, job_id: uuid.UUID, user: User) -> Job:
+    job = session.get(Job, job_id)
+    if not job or job.user_id != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job
+
+
+@router.post("/", response_model=JobPublic, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    job: JobCreate,
+):
+    db_job = Job(kind=job.kind, params=job.params, user_id=current_user.id)
+    session.add(db_job)
+    session.commit()
+    session.refresh(db_job)
+    jobs.runner.submit(db_job.id)
+    logger.info("Job %s (%s) queued for %s", db_job.id, db_job.kind, current_user.id)
+    return db_job
+
+
+@router.get("/", response_model=list[JobPublic])
+async def read_jobs(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    offset: int = 0,
+    limit: int = Query(default=100, le=100),
+):
+    return session.exec(
+        select(Job)
+        .where(Job.user_id == current_user.id)
+        .order_by(Job.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    ).all()
+
+
+@router.get("/{job_id}", response_model=JobPublic)
+async def read_job(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    job_id: uuid.UUID,
+):
+    return _get_own_job(session, job_id, current_user)
+
+
+@router.get("/{job_id}/result")
+async def read_job_result(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    job_id: uuid.UUID,
+):
+    job = _get_own_job(session, job_id, current_user)
+    if job.status != "succeeded":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status}, no result available",
+        )
+    return Response(content=job.result, media_type=job.result_media_type)
+
+
+@router.delete("/{job_id}", response_model=JobPublic)
+async def cancel_job(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    job_id: uuid.UUID,
+):
+    """
+    A queued job is cancelled right away; a running job is marked cancelling
+    and stops at its next progress report
+    """
+    job = _get_own_job(session, job_id, current_user)
+    # Conditional on the status, as the worker may claim or finish the job
+    # meanwhile, see run_job
+    for current, values in (
+        ("queued", {"status": "cancelled", "finished_at": datetime.now(timezone.utc)}),
+        ("running", {"status": "cancelling"}),
+    ):
+        changed = session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .where(Job.status == current)
+            .values(**values)
+        ).rowcount
+        if changed:
+            session.commit()
+            break
+    session.refresh(job)
+    if not changed and job.status != "cancelling":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job.status}"
+        )
+    return job
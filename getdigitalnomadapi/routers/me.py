@@ -1,20 +1,52 @@
+import asyncio
 import logging
-from datetime import date, datetime, timezone
-from typing import Annotated
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Annotated, Literal
 
+import numpy as np
 import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.sql.operators import is_
-from sqlmodel import or_, select
+from sqlmodel import Session, or_, select
 
+from ..changes import read_visit_changes
+from ..config import (
+    SSE_HEARTBEAT_SECONDS,
+    SUMMARY_CSV_DUMP,
+    SUMMARY_MAX_PERIODS,
+    SUMMARY_TIMEOUT_SECONDS,
+    TIMELINE_TIMEOUT_SECONDS,
+)
 from ..dependencies import SessionDep, get_current_active_user
-from ..models import Country, User, UserPublic, Visit, VisitsUserMePublicSummary
+from ..encoding import NegotiatedRoute
+from ..events import TooManyStreams, broker, format_event
+from ..metrics import SUMMARY_ROWS
+from ..models import (
+    Country,
+    SchengenPlan,
+    SchengenPlanRequest,
+    User,
+    UserPublic,
+    Visit,
+    VisitChanges,
+    VisitsUserMePublicSummary,
+    VisitTimeline,
+)
+from ..periods import GRANULARITY_MONTHS, daily_presence, period_days, period_ranges
+from ..presence import OPEN_END_DAY, to_day
+from ..schengen import MAX_DAYS, WINDOW_DAYS, SchengenCalendar
+from ..singleflight import single_flight
+from ..timeline import build_timeline, encode_timeline_binary
+from ..visitdays import VisitDays, fetch_visit_days, to_date
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/me",
     tags=["me"],
+    route_class=NegotiatedRoute,
 )
 
 """
@@ -22,6 +54,34 @@ End-points for current logged in user
 """
 
 
+async def coalesced(name: str, session: Session, timeout: float, load, *args):
+    """
+    load(session, *args) computed once for concurrent requests with the same
+    args, see singleflight.py. It runs in a thread on its own session so it
+    outlives the request that started it. args[0] is the user id, requests
+    after a write of the user do not join a computation from before it.
+    """
+    bind = session.get_bind()
+
+    def run():
+        with Session(bind) as load_session:
+            return load(load_session, *args)
+
+    try:
+        return await single_flight.do(
+            name,
+            (single_flight.version(args[0]), args),
+            lambda: asyncio.to_thread(run),
+            timeout,
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{name} is taking too long",
+            headers={"Retry-After": "1"},
+        )
+
+
 @router.get("/", response_model=UserPublic)
 async def read_me(
     *,
@@ -74,6 +134,24 @@ async def read_me_visits(
     return data
 
 
+@router.get("/visits/changes", response_model=VisitChanges)
+async def read_me_visit_changes(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    since: int | None = None,
+    limit: int = Query(default=1000, ge=1, le=1000),
+):
+    """
+    Visits created, updated (`deleted` false, with the visit) or deleted
+    after the `since` cursor, oldest first. Pass the returned `cursor` as
+    `since` next time, again right away while `more` is true. Without
+    `since`, or with one older than the kept tombstones, all visits are
+    returned with `reset` true, see changes.py.
+    """
+    return read_visit_changes(session, current_user.id, since, limit)
+
+
 @router.get("/summary/")
 async def read_me_summary(
     *,
@@ -88,86 +166,451 @@ async def read_me_summary(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
 
+    return await coalesced(
+        "summary",
+        session,
+        SUMMARY_TIMEOUT_SECONDS,
+        load_summary,
+        user.id,
+        start_dt,
+        end_dt,
+    )
+
+
+def load_summary(
+    session: Session,
+    user_id: uuid.UUID,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+) -> dict:
     if start_dt is None:
         start_dt = date(1970, 1, 1)
 
     if end_dt is None:
         end_dt = date(2038, 1, 1)
 
-    visits = session.exec(
-        select(Visit)
-        .where(Visit.user_id == user.id)
-        .where(or_(Visit.end >= start_dt, is_(Visit.end, None)))
-        .where(Visit.start <= end_dt)
-        .order_by(Visit.start.asc())
-    ).all()
-
-    countries = session.exec(select(Country)).all()
+    visits = fetch_visit_days(session, user_id, start_dt, end_dt)
+    countries = visit_countries(session, visits)
 
     return process_summary(
         start_dt=start_dt, end_dt=end_dt, visits=visits, countries=countries
     )
 
 
+def visit_countries(session: Session, visits: VisitDays) -> list:
+    """id, name, code and schengen of the countries of `visits`"""
+    country_ids = np.unique(visits.country_id).tolist()
+    if not country_ids:
+        return []
+    return session.exec(
+        select(Country.id, Country.name, Country.code, Country.schengen).where(
+            Country.id.in_(country_ids)
+        )
+    ).all()
+
+
+@router.get("/summary/periods")
+async def read_me_summary_periods(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    granularity: Literal["month", "quarter", "year"] | None = None,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    year_start: int = Query(default=1, ge=1, le=12),
+    period: Annotated[list[str], Query()] = [],
+):
+    """
+    Summaries for many periods from one fetch of the visits, see periods.py.
+    Either a `granularity`, years (and their quarters) beginning in month
+    `year_start` and by default spanning the user's visits, or explicit
+    `period=2024-01-01/2024-03-31` ranges. Only countries with days in a
+    period are listed for it.
+    """
+    if (granularity is None) == (not period):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either granularity or period is required",
+        )
+    if len(period) > SUMMARY_MAX_PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"More than {SUMMARY_MAX_PERIODS} periods",
+        )
+    periods = []
+    for value in period:
+        try:
+            first, last = (date.fromisoformat(part) for part in value.split("/"))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"period {value!r} is not START/END",
+            )
+        if last < first:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"period {value!r} ends before it starts",
+            )
+        periods.append((first, last))
+    if periods:
+        start_dt = min(first for first, _ in periods)
+        end_dt = max(last for _, last in periods)
+    return await coalesced(
+        "summary_periods",
+        session,
+        SUMMARY_TIMEOUT_SECONDS,
+        load_summary_periods,
+        current_user.id,
+        granularity,
+        start_dt,
+        end_dt,
+        year_start,
+        tuple(periods),
+    )
+
+
+def load_summary_periods(
+    session: Session,
+    user_id: uuid.UUID,
+    granularity: str | None,
+    start_dt: date | None,
+    end_dt: date | None,
+    year_start: int,
+    periods: tuple[tuple[date, date], ...],
+) -> dict:
+    visits = fetch_visit_days(session, user_id, start_dt, end_dt)
+
+    if granularity is not None:
+        if start_dt is None:
+            start_dt = to_date(visits.start.min()) if len(visits) else date.today()
+        if end_dt is None:
+            end = np.where(visits.end == OPEN_END_DAY, to_day(date.today()), visits.end)
+            end_dt = to_date(end.max()) if len(visits) else date.today()
+        months = (end_dt.year - start_dt.year) * 12 + end_dt.month - start_dt.month
+        if months // GRANULARITY_MONTHS[granularity] >= SUMMARY_MAX_PERIODS:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"More than {SUMMARY_MAX_PERIODS} periods",
+            )
+        periods = period_ranges(granularity, start_dt, end_dt, year_start)
+
+    countries = {country.id: country for country in visit_countries(session, visits)}
+    schengen_ids = {country.id for country in countries.values() if country.schengen}
+    country_ids, days, schengen_days = period_days(visits, schengen_ids, periods)
+    results = []
+    for i, (first, last) in enumerate(periods):
+        summary = [
+            {
+                "days": int(days[j, i]),
+                "country_id": country_id,
+                "country_name": countries[country_id].name,
+                "country_code": countries[country_id].code,
+            }
+            for j, country_id in enumerate(country_ids)
+            if days[j, i]
+        ]
+        if schengen_days[i]:
+            summary.append(
+                {
+                    "days": int(schengen_days[i]),
+                    "country_id": None,
+                    "country_name": "Schengen",
+                    "country_code": None,
+                }
+            )
+        results.append(
+            {
+                "startDate": first.strftime("%Y-%m-%d"),
+                "endDate": last.strftime("%Y-%m-%d"),
+                "totalDays": (last - first).days + 1,  # Inclusive
+                "summary": summary,
+            }
+        )
+    return {"periods": results}
+
+
+@router.post("/schengen/plan", response_model=SchengenPlan)
+async def plan_me_schengen(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    plan: SchengenPlanRequest,
+):
+    """
+    Longest stay entering on `entry` and earliest start of a `trip_days`
+    trip under the 90/180 rule, given the stored visits and the proposed
+    `trips`, see schengen.py. An open visit counts up to today.
+    """
+    if plan.entry is None and plan.trip_days is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="entry or trip_days is required",
+        )
+    for trip in plan.trips:
+        if trip.end < trip.start:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"trip starting {trip.start} ends before it starts",
+            )
+    today = date.today()
+    earliest_from = plan.earliest_from or today
+    entries = []
+    if plan.entry is not None:
+        entries.append(plan.entry)
+    if plan.trip_days is not None:
+        search_to = earliest_from + timedelta(days=plan.search_days - 1)
+        entries += [earliest_from, search_to]
+    first_entry = min(entries)
+    last_exit = max(entries) + timedelta(days=MAX_DAYS - 1)
+
+    visits = fetch_visit_days(
+        session,
+        current_user.id,
+        first_entry - timedelta(days=WINDOW_DAYS),
+        last_exit + timedelta(days=WINDOW_DAYS - 1),
+        schengen=True,
+    ).ending_by(today)
+    trip_country_ids = {trip.country_id for trip in plan.trips} - {None}
+    schengen_ids = set(
+        session.exec(
+            select(Country.id)
+            .where(Country.id.in_(trip_country_ids))
+            .where(Country.schengen)
+        ).all()
+        if trip_country_ids
+        else ()
+    )
+    trips = VisitDays.from_rows(
+        (trip.country_id or 0, trip.start, trip.end)
+        for trip in plan.trips
+        if trip.country_id is None or trip.country_id in schengen_ids
+    )
+    calendar = SchengenCalendar(visits.concat(trips), first_entry, last_exit)
+
+    result = SchengenPlan(trip_days=plan.trip_days)
+    if plan.entry is not None:
+        result.entry = plan.entry
+        result.days_used = calendar.days_used(plan.entry - timedelta(days=1))
+        result.max_stay = calendar.max_stay(plan.entry)
+        if result.max_stay:
+            result.leave_by = plan.entry + timedelta(days=result.max_stay - 1)
+    if plan.trip_days is not None:
+        result.earliest_entry = calendar.earliest_entry(
+            plan.trip_days, earliest_from, search_to
+        )
+    return result
+
+
+def summary_delta(old: dict | None, new: dict) -> dict:
+    """Summary rows that changed since `old`, keyed by country_id (None is Schengen)"""
+    old_rows = {row["country_id"]: row for row in old["summary"]} if old else {}
+    new_rows = {row["country_id"]: row for row in new["summary"]}
+    return {
+        "startDate": new["startDate"],
+        "endDate": new["endDate"],
+        "totalDays": new["totalDays"],
+        "changed": [
+            {**row, "days": int(row["days"])}
+            for country_id, row in new_rows.items()
+            if old_rows.get(country_id, {}).get("days") != row["days"]
+        ],
+        "removed": [
+            country_id for country_id in old_rows if country_id not in new_rows
+        ],
+    }
+
+
+@router.get("/events")
+async def read_me_events(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    summary: bool = False,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+):
+    """
+    Server-Sent Events. A `visits` event is sent whenever the user's visits
+    change; with summary=true it is followed by a `summary` event holding the
+    summary rows that changed. `resync` means events were dropped, refetch.
+    """
+    if broker.full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many event streams",
+            headers={"Retry-After": str(int(SSE_HEARTBEAT_SECONDS))},
+        )
+    return StreamingResponse(
+        event_stream(current_user.id, session, summary, start_dt, end_dt),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def event_stream(
+    user_id: uuid.UUID,
+    session: Session,
+    summary: bool,
+    start_dt: date | None,
+    end_dt: date | None,
+    heartbeat: float = SSE_HEARTBEAT_SECONDS,
+):
+    try:
+        subscription = broker.subscribe(user_id)
+    except TooManyStreams:
+        return
+    queue = subscription.queue
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        last_summary = None
+        if summary:
+            last_summary = await asyncio.to_thread(
+                _stream_summary, session, user_id, start_dt, end_dt
+            )
+            yield format_event(
+                {"id": 0, "event": "summary", "data": summary_delta(None, last_summary)}
+            )
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            # Coalesce a burst of changes into one summary recompute
+            messages = [message]
+            while not queue.empty():
+                messages.append(queue.get_nowait())
+            for message in messages:
+                yield format_event(message)
+            if summary:
+                current = await asyncio.to_thread(
+                    _stream_summary, session, user_id, start_dt, end_dt
+                )
+                yield format_event(
+                    {
+                        "id": messages[-1]["id"],
+                        "event": "summary",
+                        "data": summary_delta(last_summary, current),
+                    }
+                )
+                last_summary = current
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _stream_summary(session, user_id, start_dt, end_dt) -> dict:
+    try:
+        return load_summary(session, user_id, start_dt, end_dt)
+    finally:
+        # Do not hold a pooled connection for the lifetime of the stream
+        session.close()
+
+
+@router.get("/timeline", response_model=VisitTimeline)
+async def read_me_timeline(
+    *,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: SessionDep,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    format: Literal["json", "binary"] = "json",
+):
+    """
+    Run-length encoded presence for calendar rendering, see timeline.py.
+    Without a range the timeline spans the user's visits.
+    """
+    start_dt, end_dt, segments = await coalesced(
+        "timeline",
+        session,
+        TIMELINE_TIMEOUT_SECONDS,
+        load_timeline,
+        current_user.id,
+        start_dt,
+        end_dt,
+    )
+    if format == "binary":
+        return Response(
+            content=encode_timeline_binary(segments, start_dt),
+            media_type="application/octet-stream",
+        )
+    return VisitTimeline(startDate=start_dt, endDate=end_dt, segments=segments)
+
+
+def load_timeline(
+    session: Session, user_id: uuid.UUID, start_dt: date | None, end_dt: date | None
+) -> tuple[date, date, list[list]]:
+    query = select(Visit.country_id, Visit.start, Visit.end).where(
+        Visit.user_id == user_id
+    )
+    if start_dt is not None:
+        query = query.where(or_(Visit.end >= start_dt, is_(Visit.end, None)))
+    if end_dt is not None:
+        query = query.where(Visit.start <= end_dt)
+    rows = session.exec(query).all()
+
+    if start_dt is None:
+        start_dt = min((start for _, start, _ in rows), default=date.today())
+    if end_dt is None:
+        end_dt = max((end or date.today() for _, _, end in rows), default=date.today())
+    if end_dt < start_dt:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="end_dt is before start_dt",
+        )
+    return start_dt, end_dt, build_timeline(rows, start_dt, end_dt)
+
+
 """
 Process the visits and return summary dict for easy render in UI
 """
 
 
 def process_summary(
-    start_dt: date, end_dt: date, visits: list[Visit], countries: list[Country]
+    start_dt: date, end_dt: date, visits: VisitDays, countries: list[Country]
 ):
-    my_dict = []
     summary = []  # Results
-    if visits:
-        for visit in visits:
-            my_visit = visit.model_dump()
-            my_visit["country_name"] = visit.country.name
-            my_dict.append(my_visit)
-        df_raw = pd.DataFrame.from_dict(my_dict)
-        df_raw["start"] = pd.to_datetime(df_raw["start"], format="%Y-%m-%d")
-        df_raw["end"] = pd.to_datetime(df_raw["end"], format="%Y-%m-%d")
-
-        unique_countries = df_raw["country_id"].unique()
-        df_start_dt = df_raw["start"].min().date()
-        if max(pd.isnull(df_raw["end"])) is True:
-            df_end_dt = end_dt
-        else:
-            df_end_dt = max(df_raw["start"].max().date(), df_raw["end"].max().date())
-        print(f"Countries: {unique_countries}")
-        print(f"start_dt: {df_start_dt}")
-        print(f"end_dt: {df_end_dt}")
-        index = pd.date_range(df_start_dt, df_end_dt)
-        columns = unique_countries
-        df = pd.DataFrame(data={}, index=index, columns=columns)
-        for visit in visits:
-            visit_country_id = visit.country_id
-            visit_start_dt = visit.start
-            visit_end_dt = visit.end
-            df.loc[visit_start_dt:visit_end_dt, visit_country_id] = int(1)
-            if visit.country.schengen:
-                df.loc[visit_start_dt:visit_end_dt, "schengen"] = int(1)
-        df.to_csv("./data/me-visits.csv")
-
-        for i, v in df[start_dt:end_dt].sum().items():
-            if i == "schengen":
-                days = v
-                country_id = None
-                country_name = "Schengen"
-                country_code = None
-            else:
-                days = v
-                country_id = i
-                country_name = countries[i - 1].name
-                country_code = countries[i - 1].code
-
-            summary_row = {
-                "days": days,
-                "country_id": country_id,
-                "country_name": country_name,
-                "country_code": country_code,
-            }
-            summary.append(summary_row)
+    if len(visits):
+        countries_by_id = {country.id: country for country in countries}
+        schengen_ids = {country.id for country in countries if country.schengen}
+        # The day axis only spans the visits within [start_dt, end_dt]
+        first_day = max(to_day(start_dt), int(visits.start.min()))
+        last_day = min(to_day(end_dt), int(visits.end.max()))
+        first, last = to_date(first_day), to_date(max(first_day, last_day))
+        country_ids, present = daily_presence(visits, schengen_ids, first, last)
+        if last_day < first_day:
+            present[:] = False
+        logger.debug(
+            "Summary countries=%s start_dt=%s end_dt=%s", country_ids, first, last
+        )
+        if SUMMARY_CSV_DUMP:
+            pd.DataFrame(
+                present.T.astype(int),
+                index=pd.date_range(first, last),
+                columns=country_ids + ["schengen"],
+            ).to_csv("./data/me-visits.csv")
+
+        days = present.sum(axis=1)
+        # Countries in order of their first visit, as visits are by start
+        _, first_visit = np.unique(visits.country_id, return_index=True)
+        for i in np.argsort(first_visit, kind="stable"):
+            country = countries_by_id[country_ids[i]]
+            summary.append(
+                {
+                    "days": int(days[i]),
+                    "country_id": country.id,
+                    "country_name": country.name,
+                    "country_code": country.code,
+                }
+            )
+        if np.isin(visits.country_id, list(schengen_ids)).any():
+            summary.append(
+                {
+                    "days": int(days[-1]),
+                    "country_id": None,
+                    "country_name": "Schengen",
+                    "country_code": None,
+                }
+            )
 
     ret_dict = {
         "startDate": start_dt.strftime("%Y-%m-%d"),
@@ -175,4 +618,5 @@ def process_summary(
         "totalDays": (end_dt - start_dt).days + 1,  # Inclusive
     }
     ret_dict["summary"] = summary
+    SUMMARY_ROWS.observe(len(summary))
     return ret_dict
@@ -0,0 +1,137 @@
+import logging
+from datetime import date
+
+from fastapi import APIRouter, HTTPException, Query, status
+from sqlalchemy import func
+from sqlmodel import select
+
+from ..dependencies import SessionDep
+from ..models import (
+    Country,
+    CountryMonthStat,
+    CountryMonthStatPublic,
+    CountryStatPublic,
+    SchengenShare,
+)
+from ..stats import month_start
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+"""
+Read-only end-points over the aggregates maintained by stats.py
+"""
+
+
+def _avg_stay(visits: int, stay_days: int) -> float | None:
+    return round(stay_days / visits, 2) if visits else None
+
+
+def _month_range(query, start_month: date | None, end_month: date | None):
+    if start_month is not None:
+        query = query.where(CountryMonthStat.month >= month_start(start_month))
+    if end_month is not None:
+        query = query.where(CountryMonthStat.month <= month_start(end_month))
+    return query
+
+
+@router.get("/countries", response_model=list[CountryStatPublic])
+async def read_country_stats(
+    *,
+    session: SessionDep,
+    start_month: date | None = None,
+    end_month: date | None = None,
+    limit: int = Query(default=20, le=250),
+):
+    """Most visited countries"""
+    visits = func.sum(CountryMonthStat.visits)
+    query = (
+        select(
+            Country.id,
+            Country.name,
+            Country.code,
+            visits,
+            func.sum(CountryMonthStat.stay_days),
+            func.sum(CountryMonthStat.days),
+        )
+        .join(Country, Country.id == CountryMonthStat.country_id)
+        .group_by(Country.id)
+        .order_by(visits.desc())
+        .limit(limit)
+    )
+    rows = session.exec(_month_range(query, start_month, end_month)).all()
+    return [
+        CountryStatPublic(
+            country_id=country_id,
+            country_name=name,
+            country_code=code,
+            visits=visits,
+            days=days,
+            avg_stay_days=_avg_stay(visits, stay_days),
+        )
+        for country_id, name, code, visits, stay_days, days in rows
+    ]
+
+
+@router.get("/countries/{country_id}", response_model=list[CountryMonthStatPublic])
+async def read_country_month_stats(
+    *,
+    session: SessionDep,
+    country_id: int,
+    start_month: date | None = None,
+    end_month: date | None = None,
+):
+    if not session.get(Country, country_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="country not found"
+        )
+    query = (
+        select(CountryMonthStat)
+        .where(CountryMonthStat.country_id == country_id)
+        .order_by(CountryMonthStat.month)
+    )
+    stats = session.exec(_month_range(query, start_month, end_month)).all()
+    return [
+        CountryMonthStatPublic(
+            month=stat.month,
+            visits=stat.visits,
+            days=stat.days,
+            users=stat.users,
+            avg_stay_days=_avg_stay(stat.visits, stat.stay_days),
+        )
+        for stat in stats
+    ]
+
+
+@router.get("/schengen", response_model=list[SchengenShare])
+async def read_schengen_share(
+    *,
+    session: SessionDep,
+    start_month: date | None = None,
+    end_month: date | None = None,
+):
+    """Share of all travel days spent in the Schengen area, per month"""
+    query = (
+        select(
+            CountryMonthStat.month,
+            func.sum(CountryMonthStat.days).filter(Country.schengen),
+            func.sum(CountryMonthStat.days),
+        )
+        .join(Country, Country.id == CountryMonthStat.country_id)
+        .group_by(CountryMonthStat.month)
+        .order_by(CountryMonthStat.month)
+    )
+    rows = session.exec(_month_range(query, start_month, end_month)).all()
+    return [
+        SchengenShare(
+            month=month,
+            schengen_days=schengen_days or 0,
+            days=days,
+            share=round((schengen_days or 0) / days, 4) if days else 0.0,
+        )
+        for month, schengen_days, days in rows
+    ]
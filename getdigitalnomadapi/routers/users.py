@@ -4,11 +4,14 @@ from datetime import date
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql.operators import is_
 from sqlmodel import or_, select
 
+from ..changes import forget_user_changes
 from ..dependencies import SessionDep, get_current_active_user
+from ..idempotency import IdempotentRoute
 from ..models import (
     User,
     UserCreate,
@@ -20,12 +23,15 @@ from ..models import (
     VisitsUserMePublicSummary,
 )
 from ..security import get_password_hash
+from ..stats import record_visit_change
+from ..writes import delete_returning, insert_returning, update_returning
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/users",
     tags=["users"],
+    route_class=IdempotentRoute,
 )
 
 """
@@ -40,7 +46,7 @@ async def create_user(*, session: SessionDep, user: UserCreate) -> User:
     db_user = User.model_validate(user)
     db_user.email = db_user.email.lower()  # email always lower case
     try:
-        session.add(db_user)
+        db_user = insert_returning(session, db_user)
         session.commit()
     except IntegrityError as e:
         session.rollback()
@@ -49,8 +55,6 @@ async def create_user(*, session: SessionDep, user: UserCreate) -> User:
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=repr(e),
         )
-    else:
-        session.refresh(db_user)
 
     return db_user
 
@@ -83,28 +87,45 @@ async def read_user(*, session: SessionDep, user_id: uuid.UUID) -> User:
 
 @router.patch("/{user_id}", response_model=UserPublic)
 def update_user(*, session: SessionDep, user_id: uuid.UUID, user: UserUpdate) -> User:
-    db_user = session.get(User, user_id)
+    user_data = user.model_dump(exclude_unset=True)
+    # TODO - Check for password update, if there then needs hashing for storage in DB
+    try:
+        db_user = update_returning(session, User, user_id, user_data)
+        session.commit()
+    except IntegrityError as e:
+        session.rollback()
+        logger.error(repr(e))
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=repr(e),
+        )
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    user_data = user.model_dump(exclude_unset=True)
-    # TODO - Check for password update, if there then needs hashing for storage in DB
-    for key, value in user_data.items():
-        setattr(db_user, key, value)
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
     return db_user
 
 
 @router.delete("/{user_id}")
 async def delete_user(*, session: SessionDep, user_id: uuid.UUID):
-    user = session.get(User, user_id)
-    if not user:
+    # Visits keep their rows without a user, as the ORM delete did
+    visits = session.execute(
+        update(Visit)
+        .where(Visit.user_id == user_id)
+        .values(user_id=None)
+        .returning(Visit.country_id, Visit.start, Visit.end)
+    ).all()
+    for country_id, start, end in visits:
+        record_visit_change(
+            session,
+            before=(user_id, country_id, start, end),
+            after=(None, country_id, start, end),
+        )
+    forget_user_changes(session, user_id)
+    if not delete_returning(session, User, user_id):
+        session.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
         )
-    session.delete(user)
     session.commit()
     return {"ok": True}
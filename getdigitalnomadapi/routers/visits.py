@@ -2,9 +2,13 @@ import logging
 
 from fastapi import APIRouter, HTTPException, Query, status
 from sqlalchemy.exc import IntegrityError
-from sqlmodel import select
+from sqlmodel import Session, select
 
+from ..changes import log_visit_changes
+from ..config import VISIT_OVERLAP_POLICY
 from ..dependencies import SessionDep
+from ..events import broker
+from ..idempotency import IdempotentRoute
 from ..models import (
     Visit,
     VisitCreate,
@@ -12,20 +16,92 @@ from ..models import (
     VisitPublicWithCountryAndUser,
     VisitUpdate,
 )
+from ..overlaps import find_overlapping_visits, merge_into
+from ..singleflight import single_flight
+from ..stats import record_visit_change, visit_row
+from ..writes import delete_returning, insert_returning, update_returning
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/visits",
     tags=["visits"],
+    route_class=IdempotentRoute,
 )
 
 
+def notify(action: str, visit_id: int, *user_ids):
+    """
+    Tell the users' /me/events streams, after the change is committed, and
+    keep their next /me reads from joining computations from before it
+    """
+    single_flight.written(*user_ids)
+    for user_id in set(user_ids):
+        broker.publish(user_id, "visits", {"action": action, "visit_id": visit_id})
+
+
+def check_overlaps(session: Session, db_visit: Visit) -> list[tuple]:
+    """
+    Reject a visit overlapping the user's other visits with 409, or with
+    VISIT_OVERLAP_POLICY=merge fold overlapping visits of the same country
+    into it. Returns (id, user_id) of the visits merged away, deleted with
+    the caller's commit.
+    """
+    if db_visit.end is not None and db_visit.end < db_visit.start:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="visit end is before start",
+        )
+    if db_visit.user_id is None:
+        return []
+
+    merged = []
+    while overlaps := find_overlapping_visits(
+        session, db_visit.user_id, db_visit.start, db_visit.end, db_visit.id
+    ):
+        if VISIT_OVERLAP_POLICY != "merge" or any(
+            other.country_id != db_visit.country_id for other in overlaps
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "visit overlaps existing visits",
+                    "conflicts": [
+                        VisitPublic.model_validate(other).model_dump(mode="json")
+                        for other in overlaps
+                    ],
+                },
+            )
+        logger.info(
+            "Merging visits %s into visit %s",
+            [other.id for other in overlaps],
+            db_visit.id,
+        )
+        merge_into(db_visit, overlaps)
+        for other in overlaps:
+            record_visit_change(session, before=visit_row(other))
+            session.delete(other)
+        merged += [(other.id, other.user_id) for other in overlaps]
+        # The stretched visit may now overlap others, look again
+    log_visit_changes(
+        session, [(user_id, visit_id, True) for visit_id, user_id in merged]
+    )
+    return merged
+
+
+def notify_merged(merged: list[tuple]):
+    for visit_id, user_id in merged:
+        notify("deleted", visit_id, user_id)
+
+
 @router.post("/", response_model=VisitPublic)
 async def create_visit(*, session: SessionDep, visit: VisitCreate) -> Visit:
     db_visit = Visit.model_validate(visit)
+    merged = check_overlaps(session, db_visit)
     try:
-        session.add(db_visit)
+        record_visit_change(session, after=visit_row(db_visit))
+        db_visit = insert_returning(session, db_visit)
+        log_visit_changes(session, [(db_visit.user_id, db_visit.id, False)])
         session.commit()
     except IntegrityError as e:
         session.rollback()
@@ -34,9 +110,9 @@ async def create_visit(*, session: SessionDep, visit: VisitCreate) -> Visit:
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=repr(e),
         )
-    else:
-        session.refresh(db_visit)
 
+    notify_merged(merged)
+    notify("created", db_visit.id, db_visit.user_id)
     return db_visit
 
 
@@ -65,22 +141,53 @@ def update_visit(*, session: SessionDep, visit_id: int, visit: VisitUpdate) -> V
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="visit not found"
         )
-    visit_data = visit.model_dump(exclude_unset=True)
-    for key, value in visit_data.items():
-        setattr(db_visit, key, value)
-    session.add(db_visit)
+    before = visit_row(db_visit)
+    previous_user_id = db_visit.user_id
+    # Validate and merge a detached copy; the loaded row stays clean so the
+    # commit does not flush a second UPDATE
+    updated = Visit.model_validate(
+        {**db_visit.model_dump(), **visit.model_dump(exclude_unset=True)}
+    )
+    merged = check_overlaps(session, updated)
+    record_visit_change(session, before=before, after=visit_row(updated))
+    db_visit = update_returning(
+        session,
+        Visit,
+        visit_id,
+        {
+            "user_id": updated.user_id,
+            "country_id": updated.country_id,
+            "start": updated.start,
+            "end": updated.end,
+        },
+    )
+    changes = [(db_visit.user_id, visit_id, False)]
+    if previous_user_id != db_visit.user_id:
+        changes.append((previous_user_id, visit_id, True))
+    log_visit_changes(session, changes)
     session.commit()
-    session.refresh(db_visit)
+    notify_merged(merged)
+    notify("updated", visit_id, previous_user_id, db_visit.user_id)
     return db_visit
 
 
 @router.delete("/{visit_id}")
 async def delete_visit(*, session: SessionDep, visit_id: int):
-    visit = session.get(Visit, visit_id)
-    if not visit:
+    row = delete_returning(
+        session,
+        Visit,
+        visit_id,
+        Visit.user_id,
+        Visit.country_id,
+        Visit.start,
+        Visit.end,
+    )
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="visit not found"
         )
-    session.delete(visit)
+    record_visit_change(session, before=tuple(row))
+    log_visit_changes(session, [(row.user_id, visit_id, True)])
     session.commit()
+    notify("deleted", visit_id, row.user_id)
     return {"ok": True}
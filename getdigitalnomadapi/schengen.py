@@ -0,0 +1,94 @@
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+
+from .presence import to_day
+from .visitdays import VisitDays
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 180
+MAX_DAYS = 90
+
+"""
+Schengen 90/180 planner
+    On every day spent in the Schengen area, the days spent there in the 180
+    days ending that day may not exceed 90. SchengenCalendar marks present
+    days on an axis running from WINDOW_DAYS before the first candidate
+    entry to WINDOW_DAYS after the last possible exit and keeps prefix sums
+    of present (used) and absent (free) days, so any window count is one
+    subtraction.
+
+    Entering on day e for k days is allowed when
+        the last day of the trip is within the limit; trip days only add to
+        the windows of later trip days, so that is the fullest one:
+            used[e] - used[e + k - WINDOW_DAYS] + k <= MAX_DAYS
+        every present day d in the WINDOW_DAYS - 1 days after the trip stays
+        within the limit with the trip's previously free days added:
+            window(d) + free[e + k] - free[max(d - WINDOW_DAYS + 1, e)] <= MAX_DAYS
+    Both only get harder as k grows, so the longest stay is a binary search
+    over k. Earlier usage does not drop out of the window monotonically, so
+    the earliest entry checks every candidate day at once.
+"""
+
+
+class SchengenCalendar:
+    def __init__(self, visits: VisitDays, first_entry: date, last_exit: date):
+        """`visits` to Schengen countries, all ended"""
+        self.origin = first_entry - timedelta(days=WINDOW_DAYS)
+        n_days = (last_exit - self.origin).days + WINDOW_DAYS
+        origin = to_day(self.origin)
+        start = np.maximum(visits.start.astype(np.int64) - origin, 0)
+        end = np.minimum(visits.end.astype(np.int64) - origin, n_days - 1)
+        inside = start <= end
+        boundaries = np.zeros(n_days + 1, dtype=np.int32)
+        np.add.at(boundaries, start[inside], 1)
+        np.add.at(boundaries, end[inside] + 1, -1)
+        self.present = np.cumsum(boundaries[:n_days]) > 0
+        self.used = np.concatenate(([0], np.cumsum(self.present)))
+        self.free = np.concatenate(([0], np.cumsum(~self.present)))
+
+    def index(self, day: date) -> int:
+        return (day - self.origin).days
+
+    def day(self, index: int) -> date:
+        return self.origin + timedelta(days=int(index))
+
+    def window(self, index):
+        """Present days in the WINDOW_DAYS ending on `index`"""
+        return self.used[index + 1] - self.used[np.maximum(index - WINDOW_DAYS + 1, 0)]
+
+    def allowed(self, entries: np.ndarray, k: int) -> np.ndarray:
+        """Whether a k day trip may start on each of `entries` (indexes)"""
+        if k == 0:
+            return np.ones(len(entries), dtype=bool)
+        inside = self.used[entries] - self.used[entries + k - WINDOW_DAYS] + k
+        # Present days after the trip, one row per entry
+        after = entries[:, None] + k + np.arange(WINDOW_DAYS - 1)
+        added = (
+            self.free[entries + k][:, None]
+            - self.free[np.maximum(after - WINDOW_DAYS + 1, entries[:, None])]
+        )
+        over = self.present[after] & (self.window(after) + added > MAX_DAYS)
+        return (inside <= MAX_DAYS) & ~over.any(axis=1)
+
+    def max_stay(self, entry: date) -> int:
+        entries = np.array([self.index(entry)])
+        low, high = 0, MAX_DAYS
+        while low < high:
+            k = (low + high + 1) // 2
+            if self.allowed(entries, k)[0]:
+                low = k
+            else:
+                high = k - 1
+        return low
+
+    def earliest_entry(self, k: int, first: date, last: date) -> date | None:
+        entries = np.arange(self.index(first), self.index(last) + 1)
+        allowed = np.flatnonzero(self.allowed(entries, k))
+        return self.day(entries[allowed[0]]) if len(allowed) else None
+
+    def days_used(self, day: date) -> int:
+        """Schengen days in the WINDOW_DAYS ending on `day`"""
+        return int(self.window(self.index(day)))
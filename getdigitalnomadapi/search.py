@@ -0,0 +1,194 @@
+import logging
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+
+from sqlmodel import Session, select
+
+from .models import Country, CountryPublic
+
+logger = logging.getLogger(__name__)
+
+"""
+Country search
+    An in-memory index over normalized (accent and case folded) country
+    names, ISO codes, common aliases and the later words of long names
+    ("kingdom" finds "United Kingdom of ..."). Keys are kept sorted, so a
+    prefix lookup is a bisect followed by a short scan. When no key starts
+    with the query, keys with the same first letter sharing a letter pair
+    with it are ranked by the edit distance between the query and their
+    closest prefix.
+
+    The index is per process. It is loaded at startup and rebuilt on the
+    next search after routers/countries.py writes, so with several workers
+    a country change shows in the others' searches once they restart.
+"""
+
+# Names people use that are not in the ISO 3166 names, keyed by alpha-2 code
+ALIASES = {
+    "AE": ["uae", "emirates"],
+    "BO": ["bolivia"],
+    "CD": ["drc", "congo kinshasa"],
+    "CG": ["congo brazzaville"],
+    "CI": ["ivory coast"],
+    "CV": ["cape verde"],
+    "CZ": ["czech republic"],
+    "FM": ["micronesia"],
+    "GB": ["uk", "united kingdom", "great britain", "britain", "england"],
+    "IR": ["iran"],
+    "KP": ["north korea"],
+    "KR": ["south korea", "korea"],
+    "LA": ["laos"],
+    "MD": ["moldova"],
+    "MK": ["macedonia"],
+    "NL": ["holland"],
+    "PS": ["palestine"],
+    "RU": ["russia"],
+    "SY": ["syria"],
+    "SZ": ["swaziland"],
+    "TR": ["turkey"],
+    "TW": ["taiwan"],
+    "TZ": ["tanzania"],
+    "US": ["usa", "us", "united states", "america"],
+    "VA": ["vatican"],
+    "VE": ["venezuela"],
+    "VN": ["vietnam"],
+}
+STOP_WORDS = {"and", "of", "the"}
+# Shorter queries only match as prefixes
+MIN_FUZZY_LENGTH = 3
+
+# Ranks of the kinds of key, lower first
+CODE, NAME, ALIAS, WORD = range(4)
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+
+def _pairs(text: str) -> set[str]:
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def prefix_distance(query: str, key: str, limit: int) -> int:
+    """
+    Edits (insert, delete, substitute, swap two neighbours) between `query`
+    and the closest prefix of `key`, limit + 1 once it is over `limit`. Only
+    the band of cells within `limit` of the diagonal is computed.
+    """
+    over = limit + 1
+    before: list[int] = []
+    previous = [min(j, over) for j in range(len(key) + 1)]
+    for i, q in enumerate(query, 1):
+        current = [min(i, over)] + [over] * len(key)
+        for j in range(max(1, i - limit), min(len(key), i + limit) + 1):
+            k = key[j - 1]
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (q != k))
+            if i > 1 and j > 1 and q == key[j - 2] and query[i - 2] == k:
+                cost = min(cost, before[j - 2] + 1)
+            current[j] = cost
+        # A swap reaches back two rows
+        if min(current) > limit and min(previous) > limit:
+            return over
+        before, previous = previous, current
+    return min(min(previous), over)
+
+
+class IndexData:
+    def __init__(
+        self,
+        countries: dict[int, CountryPublic],
+        keys: list[str],
+        entries: list[tuple[int, int]],
+        pairs: dict[str, list[int]],
+    ):
+        self.countries = countries
+        self.keys = keys
+        self.entries = entries  # (kind, country_id) per key
+        self.pairs = pairs
+
+
+class CountryIndex:
+    def __init__(self):
+        # Replaced as a whole by build(), which warmup runs in a thread while
+        # searches read it, so a search sees either the old or the new index
+        self.data = IndexData({}, [], [], {})
+        self.stale = True
+        self.generation = 0
+
+    def invalidate(self):
+        self.generation += 1
+        self.stale = True
+
+    def load(self, session: Session):
+        # A write invalidating while the query runs keeps the index stale
+        generation = self.generation
+        self.build(session.exec(select(Country)).all(), generation)
+
+    def build(self, countries, generation: int | None = None):
+        entries = []
+        by_id = {}
+        for country in countries:
+            by_id[country.id] = CountryPublic.model_validate(country)
+            name = normalize(country.name)
+            entries.append((normalize(country.code), CODE, country.id))
+            entries.append((name, NAME, country.id))
+            for alias in ALIASES.get(country.code.upper(), ()):
+                entries.append((alias, ALIAS, country.id))
+            words = name.split()
+            for i in range(1, len(words)):
+                if words[i] not in STOP_WORDS:
+                    entries.append((" ".join(words[i:]), WORD, country.id))
+        entries.sort()
+        keys = [key for key, _, _ in entries]
+        pairs = {}
+        for i, key in enumerate(keys):
+            for pair in _pairs(key):
+                pairs.setdefault(pair, []).append(i)
+        self.data = IndexData(
+            by_id,
+            keys,
+            [(kind, country_id) for _, kind, country_id in entries],
+            pairs,
+        )
+        self.stale = generation is not None and generation != self.generation
+        logger.debug("Country index built, %d keys", len(keys))
+
+    def search(self, q: str, limit: int = 10) -> list[CountryPublic]:
+        query = normalize(q)
+        if not query:
+            return []
+        data = self.data
+        keys = data.keys
+        best: dict[int, tuple] = {}
+        i = bisect_left(keys, query)
+        while i < len(keys) and keys[i].startswith(query):
+            kind, country_id = data.entries[i]
+            score = (keys[i] != query, kind)
+            best[country_id] = min(best.get(country_id, score), score)
+            i += 1
+        if not best and len(query) >= MIN_FUZZY_LENGTH:
+            typos = 1 if len(query) <= 5 else 2
+            # One edit changes at most three letter pairs
+            pairs = _pairs(query)
+            shared = Counter(i for pair in pairs for i in data.pairs.get(pair, ()))
+            for i, count in shared.items():
+                if count < len(pairs) - 3 * typos or keys[i][0] != query[0]:
+                    continue
+                # Longer prefixes are more than `typos` edits away
+                key = keys[i][: len(query) + typos]
+                distance = prefix_distance(query, key, typos)
+                if distance <= typos:
+                    kind, country_id = data.entries[i]
+                    score = (distance, kind)
+                    best[country_id] = min(best.get(country_id, score), score)
+        ranked = sorted(
+            best,
+            key=lambda country_id: (best[country_id], data.countries[country_id].name),
+        )
+        return [data.countries[country_id] for country_id in ranked[:limit]]
+
+
+country_index = CountryIndex()
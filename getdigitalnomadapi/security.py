@@ -1,9 +1,12 @@
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 
 import jwt
 from passlib.context import CryptContext
 
+from .metrics import BCRYPT_DURATION
+
 logger = logging.getLogger(__name__)
 
 # to get a string like this run:
@@ -15,11 +18,17 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    start = time.perf_counter()
+    verified = pwd_context.verify(plain_password, hashed_password)
+    BCRYPT_DURATION.observe(time.perf_counter() - start, "verify")
+    return verified
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    start = time.perf_counter()
+    hashed_password = pwd_context.hash(password)
+    BCRYPT_DURATION.observe(time.perf_counter() - start, "hash")
+    return hashed_password
 
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
@@ -7,6 +7,7 @@ from sqlmodel import Session, select
 from getdigitalnomadapi.models import Country, User, Visit
 from getdigitalnomadapi.security import get_password_hash
 
+from .changes import forget_user_changes, log_visit_changes
 from .database import engine
 
 logger = logging.getLogger(__name__)
@@ -49,6 +50,13 @@ def create_countries():
 def delete_countries():
     with Session(engine) as session:
         countries = session.exec(select(Country)).all()
+        # Their visits lose the country, record them in the change feed
+        visits = session.exec(
+            select(Visit.user_id, Visit.id).where(Visit.country_id.is_not(None))
+        ).all()
+        log_visit_changes(
+            session, [(user_id, visit_id, False) for user_id, visit_id in visits]
+        )
         for country in countries:
             session.delete(country)
         session.commit()
@@ -103,12 +111,14 @@ def delete_users():
     with Session(engine) as session:
         users = session.exec(select(User)).all()
         for user in users:
+            forget_user_changes(session, user.id)
             session.delete(user)
         session.commit()
 
 
 def create_visits():
     with Session(engine) as session:
+        changes = []
         with open("./data/visits.csv", mode="r") as file:
             csvFile = csv.DictReader(file)
             for line in csvFile:
@@ -133,6 +143,8 @@ def create_visits():
                         country=country,
                     )
                     session.add(visit_db)
+                    if user is not None:
+                        changes.append((user.id, int(visit_db.id), False))
                     logging.debug(
                         "Adding visit with id='%s', start='%s', end='%s', user_id='%s', country_it='%s'",
                         visit_db.id,
@@ -141,12 +153,16 @@ def create_visits():
                         visit_db.user.id,
                         visit_db.country.id,
                     )
+            log_visit_changes(session, changes)
             session.commit()
 
 
 def delete_visits():
     with Session(engine) as session:
         visits = session.exec(select(Visit)).all()
+        log_visit_changes(
+            session, [(visit.user_id, visit.id, True) for visit in visits]
+        )
         for visit in visits:
             session.delete(visit)
         session.commit()
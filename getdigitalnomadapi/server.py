@@ -0,0 +1,302 @@
+"""
+Production server
+
+    python -m getdigitalnomadapi.server --workers 4 --port 8000
+
+A pre-fork supervisor for uvicorn. The application is imported once in
+the parent before the workers are forked, so pandas, SQLAlchemy metadata
+and everything else loaded at import time is shared copy-on-write between
+workers instead of being loaded N times. All workers accept on one
+listening socket bound by the parent.
+
+Workers are recycled (gracefully stopped and replaced) after
+WORKER_MAX_REQUESTS requests or once their private memory passes
+WORKER_MAX_MEMORY_MB. SIGTERM or SIGINT stops all workers gracefully,
+SIGHUP replaces them one by one.
+
+Profiles, metrics and the job queue are per worker.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from .config import (
+    GRACEFUL_TIMEOUT,
+    WEB_CONCURRENCY,
+    WORKER_MAX_MEMORY_MB,
+    WORKER_MAX_REQUESTS,
+    WORKER_MAX_REQUESTS_JITTER,
+    WORKER_PIN_CPUS,
+)
+
+logger = logging.getLogger(__name__)
+
+SUPERVISE_INTERVAL = 1.0
+
+"""
+Sizing
+    The app is async but process_summary is CPU bound NumPy work that holds
+    the GIL, so one worker per usable CPU (respecting the affinity mask of a
+    container or taskset) is the default. Extra workers beyond that only add
+    memory; fewer leave cores idle under load.
+"""
+
+
+def usable_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def default_workers() -> int:
+    return WEB_CONCURRENCY or len(usable_cpus())
+
+
+def cpu_for_worker(slot: int, cpus: list[int]) -> int:
+    return cpus[slot % len(cpus)]
+
+
+def private_memory_mb(pid: int) -> float | None:
+    """
+    Memory only this process uses. RSS would count the pages shared
+    copy-on-write with the parent in every worker.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            kb = sum(
+                int(line.split()[1])
+                for line in f
+                if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+    except OSError:
+        return None
+    return kb / 1024
+
+
+"""
+Worker
+"""
+
+
+def _import_app():
+    from .main import app
+
+    return app
+
+
+def _serve(app, sock: socket.socket, slot: int, options: argparse.Namespace):
+    import uvicorn
+
+    from . import database
+
+    forked_at = time.perf_counter()
+    # Own process group, so a Ctrl-C on the terminal reaches only the
+    # supervisor, which then stops each worker exactly once
+    os.setpgid(0, 0)
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(signum, signal.SIG_DFL)
+    if options.pin_cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu_for_worker(slot, usable_cpus())})
+    if app is None:
+        app = _import_app()
+    # Pooled connections must not be shared with the parent or other workers
+    database.engine.dispose(close=False)
+
+    class WorkerServer(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            logger.info(
+                "Worker %d (pid %d) ready in %.0f ms",
+                slot,
+                os.getpid(),
+                (time.perf_counter() - forked_at) * 1000,
+            )
+
+    config = uvicorn.Config(
+        app,
+        log_config=None,
+        limit_max_requests=options.max_requests or None,
+        limit_max_requests_jitter=options.max_requests_jitter,
+        timeout_graceful_shutdown=options.graceful_timeout,
+    )
+    WorkerServer(config).run(sockets=[sock])
+
+
+"""
+Supervisor
+"""
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, options: argparse.Namespace):
+        self.app = app
+        self.sock = sock
+        self.options = options
+        self.workers: dict[int, int] = {}  # pid -> slot
+        self.recycling: set[int] = set()
+        self.stopping = False
+        self.reload = False
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve(self.app, self.sock, slot, self.options)
+            except BaseException:
+                logger.exception("Worker %d crashed", slot)
+                code = 1
+            finally:
+                from .logs import stop_logging
+
+                stop_logging()
+                os._exit(code)
+        self.workers[pid] = slot
+
+    def _handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def _handle_reload(self, signum, frame):
+        self.reload = True
+
+    def reap(self):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            recycled = pid in self.recycling
+            self.recycling.discard(pid)
+            if self.stopping:
+                logger.info("Worker %d (pid %d) stopped", slot, pid)
+                continue
+            # uvicorn re-raises the SIGTERM it handled once it has shut down
+            if recycled or code in (0, -signal.SIGTERM):
+                logger.info("Worker %d (pid %d) exited, replacing it", slot, pid)
+            else:
+                logger.warning(
+                    "Worker %d (pid %d) died with %d, replacing it", slot, pid, code
+                )
+            self.spawn(slot)
+
+    def recycle(self, pid: int, reason: str):
+        if pid in self.recycling:
+            return
+        logger.info("Recycling worker %d (pid %d): %s", self.workers[pid], pid, reason)
+        self.recycling.add(pid)
+        os.kill(pid, signal.SIGTERM)
+
+    def check_memory(self):
+        limit = self.options.max_memory_mb
+        if not limit:
+            return
+        for pid in list(self.workers):
+            used = private_memory_mb(pid)
+            if used is not None and used > limit:
+                self.recycle(pid, f"{used:.0f} MB private memory")
+
+    def rolling_restart(self):
+        self.reload = False
+        for pid in list(self.workers):
+            self.recycle(pid, "reload")
+            # Replace one at a time so the others keep serving
+            while pid in self.workers and not self.stopping:
+                time.sleep(0.1)
+                self.reap()
+
+    def stop(self):
+        logger.info("Stopping %d workers", len(self.workers))
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.options.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self.reap()
+        for pid, slot in self.workers.items():
+            logger.warning("Killing worker %d (pid %d)", slot, pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+        # Objects loaded so far never change; keeping them out of the cyclic
+        # GC stops collections in workers from dirtying the shared pages
+        gc.freeze()
+        for slot in range(self.options.workers):
+            self.spawn(slot)
+        logger.info(
+            "Serving on http://%s:%d with %d workers (pid %d)",
+            self.options.host,
+            self.options.port,
+            self.options.workers,
+            os.getpid(),
+        )
+        while not self.stopping:
+            time.sleep(SUPERVISE_INTERVAL)
+            self.reap()
+            self.check_memory()
+            if self.reload:
+                self.rolling_restart()
+        self.stop()
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m getdigitalnomadapi.server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--max-requests", type=int, default=WORKER_MAX_REQUESTS)
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=WORKER_MAX_REQUESTS_JITTER
+    )
+    parser.add_argument("--max-memory-mb", type=int, default=WORKER_MAX_MEMORY_MB)
+    parser.add_argument(
+        "--pin-cpus", action=argparse.BooleanOptionalAction, default=WORKER_PIN_CPUS
+    )
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT)
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="import the app in the parent before forking (default)",
+    )
+    options = parser.parse_args(argv)
+
+    if options.preload:
+        started = time.perf_counter()
+        app = _import_app()
+        logger.info("Loaded app in %.0f ms", (time.perf_counter() - started) * 1000)
+    else:
+        from .logs import setup_logging
+
+        app = None
+        setup_logging()
+    sock = bind(options.host, options.port)
+    Supervisor(app, sock, options).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
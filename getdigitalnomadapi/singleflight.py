@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+
+from .metrics import (
+    SINGLE_FLIGHT_COALESCED,
+    SINGLE_FLIGHT_COMPUTATIONS,
+    SINGLE_FLIGHT_TIMEOUTS,
+)
+
+logger = logging.getLogger(__name__)
+
+"""
+Single flight
+    Identical concurrent requests await one computation instead of each
+    running their own. The first caller for a key starts the computation as
+    a task and later callers for the same key await that task until it
+    finishes; its result or exception goes to every caller. Each caller
+    waits at most its own timeout, the task is shielded so one caller timing
+    out or disconnecting does not cancel it for the others. Keys are
+    forgotten as soon as the task finishes, nothing is cached.
+
+    A computation that started before a write may have read before it. So
+    that a read after its own write sees it, writers count their committed
+    writes with written() and callers put version() of the owner in their
+    keys: the next caller then starts a new computation instead of joining
+    the older one. One counter per owner written since startup is kept.
+"""
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls: dict[Hashable, asyncio.Task] = {}
+        self.versions: dict[Hashable, int] = {}
+        # written() is also called by sync handlers in the threadpool
+        self._versions_lock = threading.Lock()
+
+    def written(self, *owners: Hashable):
+        """Count a committed write of each of `owners`"""
+        with self._versions_lock:
+            for owner in set(owners):
+                if owner is not None:
+                    self.versions[owner] = self.versions.get(owner, 0) + 1
+
+    def version(self, owner: Hashable) -> int:
+        return self.versions.get(owner, 0)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        # Mark the exception retrieved when every caller timed out
+        if not task.cancelled():
+            task.exception()
+
+    async def do(
+        self,
+        name: str,
+        key: Hashable,
+        compute: Callable[[], Awaitable],
+        timeout: float | None = None,
+    ):
+        """
+        Result of compute() for `key`, shared with concurrent callers. `name`
+        labels the metrics. Raises TimeoutError after `timeout` seconds.
+        """
+        key = (name, key)
+        task = self.calls.get(key)
+        if task is None:
+            SINGLE_FLIGHT_COMPUTATIONS.inc(name)
+            task = asyncio.ensure_future(compute())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            SINGLE_FLIGHT_COALESCED.inc(name)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            SINGLE_FLIGHT_TIMEOUTS.inc(name)
+            logger.warning("%s for %s timed out after %ss", name, key[1], timeout)
+            raise
+
+
+single_flight = SingleFlight()
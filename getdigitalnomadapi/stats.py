@@ -0,0 +1,208 @@
+"""
+Global travel statistics
+
+    python -m getdigitalnomadapi.stats rebuild
+
+The aggregates in CountryMonthStat are updated in the same transaction as
+every visit write (see record_visit_change) and can be rebuilt from the
+visit table at any time with the command above.
+"""
+
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+
+from .database import engine
+from .models import CountryMonthStat, CountryMonthUser, Visit
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 10_000
+
+"""
+Contributions
+    A visit row is (user_id, country_id, start, end). It adds to every month
+    it touches; only the month it starts in counts the visit and its length.
+"""
+
+
+def visit_row(visit: Visit) -> tuple:
+    return (visit.user_id, visit.country_id, visit.start, visit.end)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def contributions(row: tuple) -> list[tuple]:
+    """(country_id, month, visits, stay_days, days) per month of the visit"""
+    _, country_id, start, end = row
+    if country_id is None or end is None or end < start:
+        return []
+    first_month = month_start(start)
+    month = first_month
+    rows = []
+    while month <= end:
+        following = next_month(month)
+        days = (min(end, following - timedelta(days=1)) - max(start, month)).days + 1
+        if month == first_month:
+            rows.append((country_id, month, 1, (end - start).days + 1, days))
+        else:
+            rows.append((country_id, month, 0, 0, days))
+        month = following
+    return rows
+
+
+"""
+Incremental updates
+"""
+
+
+def _apply(session: Session, row: tuple, sign: int):
+    user_id = row[0]
+    stat = CountryMonthStat.__table__
+    member = CountryMonthUser.__table__
+    for country_id, month, visits, stay_days, days in contributions(row):
+        users = 0
+        if user_id is not None:
+            count = session.execute(
+                sqlite_insert(member)
+                .values(
+                    country_id=country_id, month=month, user_id=user_id, visits=sign
+                )
+                .on_conflict_do_update(
+                    index_elements=["country_id", "month", "user_id"],
+                    set_={"visits": member.c.visits + sign},
+                )
+                .returning(member.c.visits)
+            ).scalar_one()
+            if sign > 0 and count == 1:
+                users = 1
+            elif sign < 0 and count <= 0:
+                users = -1
+                session.execute(
+                    delete(member)
+                    .where(member.c.country_id == country_id)
+                    .where(member.c.month == month)
+                    .where(member.c.user_id == user_id)
+                )
+        session.execute(
+            sqlite_insert(stat)
+            .values(
+                country_id=country_id,
+                month=month,
+                visits=sign * visits,
+                stay_days=sign * stay_days,
+                days=sign * days,
+                users=users,
+            )
+            .on_conflict_do_update(
+                index_elements=["country_id", "month"],
+                set_={
+                    "visits": stat.c.visits + sign * visits,
+                    "stay_days": stat.c.stay_days + sign * stay_days,
+                    "days": stat.c.days + sign * days,
+                    "users": stat.c.users + users,
+                },
+            )
+        )
+
+
+def record_visit_change(
+    session: Session, before: tuple | None = None, after: tuple | None = None
+):
+    """
+    Move the aggregates from the `before` to the `after` state of a visit,
+    None for a created or deleted visit. The caller commits.
+    """
+    if before == after:
+        return
+    if before is not None:
+        _apply(session, before, -1)
+    if after is not None:
+        _apply(session, after, 1)
+
+
+"""
+Batch rebuild
+"""
+
+
+def rebuild_stats(session: Session) -> int:
+    """Recompute every aggregate from the visit table, returns visits counted"""
+    stats: dict[tuple, list[int]] = {}
+    members: dict[tuple, int] = {}
+    counted = 0
+    rows = session.execute(
+        select(Visit.user_id, Visit.country_id, Visit.start, Visit.end)
+        .where(Visit.end.is_not(None))
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    for row in rows:
+        counted += 1
+        user_id = row[0]
+        for country_id, month, visits, stay_days, days in contributions(tuple(row)):
+            totals = stats.setdefault((country_id, month), [0, 0, 0, 0])
+            totals[0] += visits
+            totals[1] += stay_days
+            totals[2] += days
+            if user_id is not None:
+                key = (country_id, month, user_id)
+                if key not in members:
+                    totals[3] += 1
+                members[key] = members.get(key, 0) + 1
+
+    session.execute(delete(CountryMonthUser))
+    session.execute(delete(CountryMonthStat))
+    stat_rows = [
+        {
+            "country_id": country_id,
+            "month": month,
+            "visits": visits,
+            "stay_days": stay_days,
+            "days": days,
+            "users": users,
+        }
+        for (country_id, month), (visits, stay_days, days, users) in stats.items()
+    ]
+    member_rows = [
+        {"country_id": country_id, "month": month, "user_id": user_id, "visits": n}
+        for (country_id, month, user_id), n in members.items()
+    ]
+    for table, table_rows in (
+        (CountryMonthStat.__table__, stat_rows),
+        (CountryMonthUser.__table__, member_rows),
+    ):
+        for i in range(0, len(table_rows), REBUILD_BATCH_SIZE):
+            session.execute(insert(table), table_rows[i : i + REBUILD_BATCH_SIZE])
+    session.commit()
+    return counted
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m getdigitalnomadapi.stats")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        counted = rebuild_stats(session)
+    logger.info(
+        "Rebuilt statistics from %d visits in %.1fs",
+        counted,
+        time.perf_counter() - start,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import logging
+import struct
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+EPOCH = date(1970, 1, 1)
+BINARY_MAGIC = b"RLE1"
+
+"""
+Presence timeline
+    A run-length encoded view of where a user was, one segment per change:
+        [country_id, first_day, run_length]
+    country_id is None for a gap (no visit) and a sorted list of ids, one
+    per visit, when visits overlap. Built from visit boundaries, so the cost
+    depends on the number of visits, not on the number of days.
+"""
+
+
+def build_timeline(rows, start_dt: date, end_dt: date) -> list[list]:
+    """`rows` of (country_id, start, end); an open visit (end None) runs to end_dt"""
+    events: dict[date, list] = {}
+    for country_id, start, end in rows:
+        if country_id is None:
+            continue
+        start = max(start, start_dt)
+        end = min(end or end_dt, end_dt)
+        if start > end:
+            continue
+        events.setdefault(start, []).append((country_id, 1))
+        events.setdefault(end + timedelta(days=1), []).append((country_id, -1))
+
+    segments = []
+    active: dict[int, int] = {}
+    day = start_dt
+    for boundary in sorted(events) + [end_dt + timedelta(days=1)]:
+        if boundary > day:
+            visiting = sum(active.values())
+            if not visiting:
+                state = None
+            elif visiting == 1:
+                state = next(iter(active))
+            else:
+                state = sorted(
+                    country_id
+                    for country_id, count in active.items()
+                    for _ in range(count)
+                )
+            run_length = (boundary - day).days
+            if segments and segments[-1][0] == state:
+                segments[-1][2] += run_length
+            else:
+                segments.append([state, day, run_length])
+            day = boundary
+        for country_id, delta in events.get(boundary, ()):
+            active[country_id] = active.get(country_id, 0) + delta
+            if not active[country_id]:
+                del active[country_id]
+    return segments
+
+
+def encode_timeline_binary(segments: list[list], start_dt: date) -> bytes:
+    """
+    Little endian:
+        header  b"RLE1", int32 start day (days since 1970-01-01), uint32 segments
+        segment int32 tag, uint32 run_length
+    tag > 0 is a country id, 0 a gap, -n an overlap of n countries whose
+    int32 ids follow the segment. first_day is implied by the run lengths.
+    """
+    parts = [BINARY_MAGIC, struct.pack("<iI", (start_dt - EPOCH).days, len(segments))]
+    for state, _, run_length in segments:
+        if state is None:
+            parts.append(struct.pack("<iI", 0, run_length))
+        elif isinstance(state, list):
+            parts.append(struct.pack("<iI", -len(state), run_length))
+            parts.append(struct.pack(f"<{len(state)}i", *state))
+        else:
+            parts.append(struct.pack("<iI", state, run_length))
+    return b"".join(parts)
+
+
+def decode_timeline_binary(data: bytes) -> tuple[date, list[list]]:
+    if data[:4] != BINARY_MAGIC:
+        raise ValueError("not a binary timeline")
+    start_days, count = struct.unpack_from("<iI", data, 4)
+    day = EPOCH + timedelta(days=start_days)
+    start_dt = day
+    offset = 12
+    segments = []
+    for _ in range(count):
+        tag, run_length = struct.unpack_from("<iI", data, offset)
+        offset += 8
+        if tag == 0:
+            state = None
+        elif tag < 0:
+            state = list(struct.unpack_from(f"<{-tag}i", data, offset))
+            offset += 4 * -tag
+        else:
+            state = tag
+        segments.append([state, day, run_length])
+        day += timedelta(days=run_length)
+    return start_dt, segments
@@ -0,0 +1,112 @@
+import logging
+import uuid
+from datetime import date, timedelta
+from itertools import chain
+
+import numpy as np
+from sqlmodel import Session
+
+from .presence import EPOCH, OPEN_END_DAY, to_day
+
+logger = logging.getLogger(__name__)
+
+"""
+Columnar visits
+    The analytical endpoints only need (country_id, start, end) of a user's
+    visits. fetch_visit_days selects those three columns with the dates
+    already turned into integer days since 1970-01-01 by SQLite, reads the
+    DB-API cursor straight into one int32 array and returns its columns, so
+    no ORM objects, Row objects or date objects are built. An open visit
+    (end NULL) ends on OPEN_END_DAY, as in presence.py; visits without a
+    country are left out. Rows are ordered by start.
+"""
+
+_START_DAY = "CAST(julianday(start) - 2440587.5 AS INTEGER)"
+_END_DAY = f'COALESCE(CAST(julianday("end") - 2440587.5 AS INTEGER), {OPEN_END_DAY})'
+VISIT_DAYS_SQL = (
+    f"SELECT country_id, {_START_DAY}, {_END_DAY} FROM visit "
+    "WHERE user_id = :user_id AND country_id IS NOT NULL"
+)
+
+
+class VisitDays:
+    def __init__(self, country_id: np.ndarray, start: np.ndarray, end: np.ndarray):
+        self.country_id = country_id
+        self.start = start
+        self.end = end
+
+    def __len__(self) -> int:
+        return len(self.country_id)
+
+    @classmethod
+    def from_rows(cls, rows) -> "VisitDays":
+        """From (country_id, start, end) rows with dates, end None when open"""
+        data = np.fromiter(
+            chain.from_iterable(
+                (
+                    country_id,
+                    to_day(start),
+                    OPEN_END_DAY if end is None else to_day(end),
+                )
+                for country_id, start, end in rows
+            ),
+            dtype=np.int32,
+        ).reshape(-1, 3)
+        return cls(data[:, 0], data[:, 1], data[:, 2])
+
+    def concat(self, other: "VisitDays") -> "VisitDays":
+        return VisitDays(
+            np.concatenate([self.country_id, other.country_id]),
+            np.concatenate([self.start, other.start]),
+            np.concatenate([self.end, other.end]),
+        )
+
+    def take(self, mask: np.ndarray) -> "VisitDays":
+        return VisitDays(self.country_id[mask], self.start[mask], self.end[mask])
+
+    def ending_by(self, day: date) -> "VisitDays":
+        """Open visits end on `day`, or on their start when that is later"""
+        end = np.where(
+            self.end == OPEN_END_DAY, np.maximum(self.start, to_day(day)), self.end
+        )
+        return VisitDays(self.country_id, self.start, end)
+
+
+def to_date(day) -> date:
+    return EPOCH + timedelta(days=int(day))
+
+
+def fetch_visit_days(
+    session: Session,
+    user_id: uuid.UUID,
+    start_dt: date | None = None,
+    end_dt: date | None = None,
+    schengen: bool = False,
+) -> VisitDays:
+    """
+    The user's visits overlapping [start_dt, end_dt], either bound optional,
+    only those to Schengen countries with `schengen`
+    """
+    sql = VISIT_DAYS_SQL
+    params = {"user_id": user_id.hex}
+    if start_dt is not None:
+        sql += ' AND ("end" >= :start_dt OR "end" IS NULL)'
+        params["start_dt"] = start_dt.isoformat()
+    if end_dt is not None:
+        sql += " AND start <= :end_dt"
+        params["end_dt"] = end_dt.isoformat()
+    if schengen:
+        sql += " AND country_id IN (SELECT id FROM country WHERE schengen)"
+    sql += " ORDER BY start"
+
+    # The session's connection, so the read sees its transaction
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        # fromiter grows one buffer as it reads; counting the rows first to
+        # size it exactly costs a second scan of the visits
+        data = np.fromiter(chain.from_iterable(cursor), dtype=np.int32)
+    finally:
+        cursor.close()
+    data = data.reshape(-1, 3)
+    return VisitDays(data[:, 0], data[:, 1], data[:, 2])
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from datetime import date
+
+from sqlalchemy.orm import configure_mappers
+from sqlmodel import Session
+
+from . import database
+from .config import WARMUP_CONNECTIONS
+from .models import Country
+from .routers.me import process_summary
+from .search import country_index
+from .security import get_password_hash
+from .visitdays import VisitDays
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5
+
+"""
+Warm-up
+    Pays the first request costs before /health/ready lets traffic in:
+    mapper configuration, opening pooled database connections, loading the
+    country search index, loading the bcrypt backend and a summary through
+    pandas. Runs as a task started by the lifespan, so /health/live answers
+    meanwhile, and retries every RETRY_SECONDS while a step fails (e.g. the
+    database is not up yet).
+"""
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.warmup_ms: float | None = None
+        self.error: str | None = None
+
+
+readiness = Readiness()
+
+
+def open_connections(engine):
+    # Beyond the pool size connections are closed again on return
+    size = getattr(engine.pool, "size", lambda: WARMUP_CONNECTIONS)()
+    connections = [engine.connect() for _ in range(min(WARMUP_CONNECTIONS, size))]
+    try:
+        for connection in connections:
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def load_reference_data(engine):
+    with Session(engine) as session:
+        country_index.load(session)
+
+
+def hash_password(engine):
+    get_password_hash("warm-up")
+
+
+def compute_summary(engine):
+    countries = [
+        Country(id=1, name="Warm-up A", code="WA", schengen=True),
+        Country(id=2, name="Warm-up B", code="WB"),
+    ]
+    visits = VisitDays.from_rows(
+        [(1, date(2024, 1, 1), date(2024, 1, 20)), (2, date(2024, 1, 21), None)]
+    )
+    process_summary(date(2024, 1, 1), date(2024, 3, 31), visits, countries)
+
+
+STEPS = [
+    ("mappers", lambda engine: configure_mappers()),
+    ("connections", open_connections),
+    ("reference_data", load_reference_data),
+    ("bcrypt", hash_password),
+    ("summary", compute_summary),
+]
+
+
+async def warm_up(engine=None):
+    engine = engine or database.engine
+    while True:
+        started = time.perf_counter()
+        timings = {}
+        try:
+            for name, step in STEPS:
+                step_started = time.perf_counter()
+                await asyncio.to_thread(step, engine)
+                timings[name] = round((time.perf_counter() - step_started) * 1000)
+        except Exception as e:
+            readiness.error = f"{name}: {e!r}"
+            logger.exception("Warm-up step %s failed, retrying", name)
+            await asyncio.sleep(RETRY_SECONDS)
+            continue
+        readiness.warmup_ms = (time.perf_counter() - started) * 1000
+        readiness.error = None
+        readiness.ready = True
+        logger.info("Warm-up finished in %.0f ms %s", readiness.warmup_ms, timings)
+        return
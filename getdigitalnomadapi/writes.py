@@ -0,0 +1,53 @@
+import logging
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, SQLModel
+
+logger = logging.getLogger(__name__)
+
+"""
+Single statement writes
+    INSERT/UPDATE/DELETE ... RETURNING (SQLite 3.35+) instead of loading the
+    row with session.get, flushing it and reading it back with
+    session.refresh. update_returning and delete_returning return None when
+    no row matched, which the routers turn into a 404. The caller commits.
+"""
+
+
+def _columns(model: type[SQLModel]):
+    return model.__table__.columns
+
+
+def insert_returning(session: Session, obj: SQLModel) -> SQLModel:
+    """Insert a validated, unsaved table model and return it as stored"""
+    model = type(obj)
+    values = {
+        name: value
+        for name, value in obj.model_dump().items()
+        if name in _columns(model) and value is not None
+    }
+    row = session.execute(
+        insert(model).values(values).returning(*_columns(model))
+    ).one()
+    return model.model_validate(row._mapping)
+
+
+def update_returning(
+    session: Session, model: type[SQLModel], id, values: dict
+) -> SQLModel | None:
+    """Update the row with primary key `id`, updated_at is set by onupdate"""
+    columns = _columns(model)
+    row = session.execute(
+        update(model)
+        .where(model.id == id)
+        .values({name: value for name, value in values.items() if name in columns})
+        .returning(*_columns(model))
+    ).one_or_none()
+    return None if row is None else model.model_validate(row._mapping)
+
+
+def delete_returning(session: Session, model: type[SQLModel], id, *columns):
+    """Delete the row with primary key `id`, returns `columns` of the deleted row"""
+    return session.execute(
+        delete(model).where(model.id == id).returning(*(columns or [model.id]))
+    ).one_or_none()
@@ -21,6 +21,15 @@ if config.config_file_name is not None:
 # target_metadata = None
 target_metadata = SQLModel.metadata  # noqa: F405
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    Leave out the R*Tree presence index of presence.py and its shadow
+    tables, they are created by raw SQL and not in the metadata
+    """
+    return not (type_ == "table" and name.startswith("visit_rtree"))
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -43,6 +52,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -66,7 +76,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
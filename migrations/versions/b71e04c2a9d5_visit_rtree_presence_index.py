@@ -0,0 +1,57 @@
+"""visit rtree presence index
+
+Revision ID: b71e04c2a9d5
+Revises: 3f2a9c1d7e44
+Create Date: 2026-10-19 10:41:37.502219+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e04c2a9d5'
+down_revision: Union[str, None] = '3f2a9c1d7e44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+START_DAY = "CAST(julianday({table}.start) - 2440587.5 AS INTEGER)"
+END_DAY = 'COALESCE(CAST(julianday({table}."end") - 2440587.5 AS INTEGER), 2147483647)'
+ROW = f"{START_DAY}, {END_DAY}, {{table}}.country_id, {{table}}.country_id, {{table}}.user_id"
+
+
+def upgrade() -> None:
+    new_row = ROW.format(table="NEW")
+    op.execute(
+        "CREATE VIRTUAL TABLE visit_rtree USING rtree_i32("
+        "id, min_day, max_day, min_country, max_country, +user_id)"
+    )
+    op.execute(
+        f"INSERT INTO visit_rtree SELECT visit.id, {ROW.format(table='visit')} "
+        "FROM visit WHERE visit.country_id IS NOT NULL"
+    )
+    op.execute(
+        "CREATE TRIGGER visit_rtree_insert AFTER INSERT ON visit "
+        "WHEN NEW.country_id IS NOT NULL BEGIN "
+        f"INSERT INTO visit_rtree VALUES (NEW.id, {new_row}); END"
+    )
+    op.execute(
+        "CREATE TRIGGER visit_rtree_update AFTER UPDATE ON visit BEGIN "
+        "DELETE FROM visit_rtree WHERE id = OLD.id; "
+        f"INSERT INTO visit_rtree SELECT NEW.id, {new_row} WHERE NEW.country_id IS NOT NULL; "
+        "END"
+    )
+    op.execute(
+        "CREATE TRIGGER visit_rtree_delete AFTER DELETE ON visit BEGIN "
+        "DELETE FROM visit_rtree WHERE id = OLD.id; END"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER visit_rtree_delete")
+    op.execute("DROP TRIGGER visit_rtree_update")
+    op.execute("DROP TRIGGER visit_rtree_insert")
+    op.execute("DROP TABLE visit_rtree")
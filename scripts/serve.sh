@@ -0,0 +1,4 @@
+#!/usr/bin/env bash
+
+# Production: one worker per usable CPU unless WEB_CONCURRENCY or --workers says otherwise
+python -m getdigitalnomadapi.server --host 0.0.0.0 --port 8000 "$@"
@@ -0,0 +1,113 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from getdigitalnomadapi.database import get_session
+from getdigitalnomadapi.main import app
+from getdigitalnomadapi.models import Country, User, Visit
+from getdigitalnomadapi.security import create_access_token, get_password_hash
+
+PASSWORD = "secret"
+
+
+@pytest.fixture(scope="session")
+def hashed_password():
+    return get_password_hash(PASSWORD)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client(engine):
+    def get_session_override():
+        with Session(engine) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = get_session_override
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def countries(session):
+    countries = [
+        Country(name="France", code="FR", schengen=True),
+        Country(name="Spain", code="ES", schengen=True),
+        Country(name="United Kingdom of Great Britain and Northern Ireland", code="GB"),
+    ]
+    session.add_all(countries)
+    session.commit()
+    for country in countries:
+        session.refresh(country)
+    return countries
+
+
+def make_user(session, hashed_password, username, admin=False):
+    user = User(
+        username=username,
+        email=f"{username}@example.com",
+        full_name=username.title(),
+        hashed_password=hashed_password,
+        disabled=False,
+        admin=admin,
+    )
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def user(session, hashed_password):
+    return make_user(session, hashed_password, "nomad")
+
+
+@pytest.fixture
+def admin(session, hashed_password):
+    return make_user(session, hashed_password, "admin", admin=True)
+
+
+@pytest.fixture
+def user_headers(user):
+    token = create_access_token(data={"sub": str(user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def admin_headers(admin):
+    token = create_access_token(data={"sub": str(admin.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def visits(session, user, countries):
+    france, spain, uk = countries
+    visits = [
+        Visit(start=date(2024, 1, 1), end=date(2024, 1, 10), user=user, country=france),
+        Visit(start=date(2024, 1, 11), end=date(2024, 2, 9), user=user, country=uk),
+        Visit(start=date(2024, 2, 10), end=date(2024, 2, 29), user=user, country=spain),
+    ]
+    session.add_all(visits)
+    session.commit()
+    for visit in visits:
+        session.refresh(visit)
+    return visits
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Visit
+
+PREFIX = PREFIX_API_V1 + "/admin/user"
+
+
+def test_admin_users_are_aggregated_and_paged(
+    client, session, user, admin, countries, visits, admin_headers
+):
+    france, spain, uk = countries
+    today = date.today()
+    session.add_all(
+        [
+            # 10 of its 31 days are inside the last 180
+            Visit(
+                start=today - timedelta(days=200),
+                end=today - timedelta(days=170),
+                user=admin,
+                country=spain,
+            ),
+            Visit(
+                start=today - timedelta(days=9), end=None, user=admin, country=france
+            ),
+            Visit(start=today - timedelta(days=30), end=today, user=admin, country=uk),
+        ]
+    )
+    session.commit()
+
+    response = client.get(f"{PREFIX}/", headers=admin_headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert page["next_after"] is None
+    users = {row["username"]: row for row in page["users"]}
+    nomad = users["nomad"]
+    assert (nomad["visits"], nomad["first_visit"], nomad["last_visit"]) == (
+        3,
+        "2024-01-01",
+        "2024-02-10",
+    )
+    assert (nomad["countries"], nomad["schengen_days_180"]) == (3, 0)
+    assert users["admin"]["visits"] == 3
+    assert users["admin"]["countries"] == 3
+    assert users["admin"]["schengen_days_180"] == 20
+    assert "hashed_password" not in users["admin"]
+
+    first = client.get(f"{PREFIX}/", params={"limit": 1}, headers=admin_headers).json()
+    assert len(first["users"]) == 1
+    second = client.get(
+        f"{PREFIX}/",
+        params={"limit": 1, "after": first["next_after"]},
+        headers=admin_headers,
+    ).json()
+    assert [row["id"] for row in first["users"] + second["users"]] == sorted(
+        row["id"] for row in page["users"]
+    )
+
+
+def test_admin_user_detail_and_delete(client, user, visits, admin_headers):
+    response = client.get(f"{PREFIX}/{user.id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()["visits"]) == 3
+
+    response = client.delete(f"{PREFIX}/{user.id}", headers=admin_headers)
+    assert response.status_code == 200
+    assert client.get(f"{PREFIX}/{user.id}", headers=admin_headers).status_code == 404
@@ -0,0 +1,68 @@
+from getdigitalnomadapi.config import BATCH_MAX_REQUESTS
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.metrics import JWT_DECODES
+
+URL = PREFIX_API_V1 + "/batch"
+
+
+def test_launch_batch_authenticates_once(client, user, user_headers, visits):
+    decodes = JWT_DECODES._merged().get((), 0)
+    response = client.post(
+        URL,
+        json={
+            "requests": [
+                {"id": "me", "path": "/me/"},
+                {"id": "visits", "path": "/me/visits/"},
+                {
+                    "id": "summary",
+                    "path": "/me/summary/",
+                    "query": {"start_dt": "2024-01-01", "end_dt": "2024-02-29"},
+                },
+                {"id": "countries", "path": "/countries/", "query": {"limit": 2}},
+            ]
+        },
+        headers=user_headers,
+    )
+    assert response.status_code == 200
+    results = {result["id"]: result for result in response.json()}
+    assert [result["id"] for result in response.json()] == [
+        "me",
+        "visits",
+        "summary",
+        "countries",
+    ]
+    assert all(result["status"] == 200 for result in results.values())
+    assert results["me"]["body"]["id"] == str(user.id)
+    assert results["visits"]["body"]["num_visit"] == 3
+    assert results["summary"]["body"]["totalDays"] == 60
+    assert len(results["countries"]["body"]) == 2
+    assert JWT_DECODES._merged().get((), 0) == decodes + 1
+
+
+def test_writes_run_in_order_with_errors_per_item(client, user, user_headers, visits):
+    response = client.post(
+        URL,
+        json={
+            "requests": [
+                {"method": "DELETE", "path": f"/visits/{visits[0].id}"},
+                {"path": f"/visits/{visits[0].id}"},
+                {"path": "/me/visits/"},
+                {"path": "/me/summary/", "query": {"start_dt": "not a date"}},
+            ]
+        },
+        headers=user_headers,
+    )
+    statuses = [result["status"] for result in response.json()]
+    assert statuses == [200, 404, 200, 422]
+    assert response.json()[2]["body"]["num_visit"] == 2
+
+
+def test_batch_limits(client, user_headers):
+    too_many = [{"path": "/me/"}] * (BATCH_MAX_REQUESTS + 1)
+    response = client.post(URL, json={"requests": too_many}, headers=user_headers)
+    assert response.status_code == 422
+    response = client.post(
+        URL, json={"requests": [{"path": "/batch"}]}, headers=user_headers
+    )
+    assert response.status_code == 422
+    assert client.post(URL, json={"requests": [{"path": "/me/"}]}).status_code == 401
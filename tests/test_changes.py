@@ -0,0 +1,110 @@
+import sqlalchemy as sa
+from sqlmodel import select
+
+from getdigitalnomadapi import seed
+from getdigitalnomadapi.changes import compact_changes, log_visit_range_changes
+from getdigitalnomadapi.datamigrations import run_batched
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import VisitChange
+
+
+def changes(client, headers, **params):
+    response = client.get(
+        PREFIX_API_V1 + "/me/visits/changes", headers=headers, params=params
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_first_sync_is_a_snapshot(client, visits, user_headers):
+    data = changes(client, user_headers)
+    assert data["reset"] is True
+    assert [change["visit_id"] for change in data["changes"]] == [
+        visit.id for visit in visits
+    ]
+    assert data["changes"][0]["visit"]["start"] == "2024-01-01"
+
+
+def test_changes_after_cursor(client, session, user, countries, visits, user_headers):
+    cursor = changes(client, user_headers)["cursor"]
+    created = client.post(
+        PREFIX_API_V1 + "/visits/",
+        json={
+            "start": "2024-03-01",
+            "end": "2024-03-05",
+            "user_id": str(user.id),
+            "country_id": countries[0].id,
+        },
+    ).json()
+    for end in ("2024-01-08", "2024-01-09"):
+        client.patch(PREFIX_API_V1 + f"/visits/{visits[0].id}", json={"end": end})
+    client.delete(PREFIX_API_V1 + f"/visits/{visits[1].id}")
+
+    data = changes(client, user_headers, since=cursor)
+    assert data["reset"] is False
+    # Each visit once, with its latest state
+    assert [(c["visit_id"], c["deleted"]) for c in data["changes"]] == [
+        (created["id"], False),
+        (visits[0].id, False),
+        (visits[1].id, True),
+    ]
+    assert data["changes"][1]["visit"]["end"] == "2024-01-09"
+    assert data["changes"][2]["visit"] is None
+    assert len(session.exec(select(VisitChange)).all()) == 3
+
+    idle = changes(client, user_headers, since=data["cursor"])
+    assert idle == {
+        "changes": [],
+        "cursor": data["cursor"],
+        "reset": False,
+        "more": False,
+    }
+
+    first = changes(client, user_headers, since=cursor, limit=2)
+    assert len(first["changes"]) == 2 and first["more"] is True
+    rest = changes(client, user_headers, since=first["cursor"], limit=2)
+    assert [c["visit_id"] for c in rest["changes"]] == [visits[1].id]
+    assert rest["more"] is False
+
+
+def test_compacted_tombstones_force_a_snapshot(client, session, visits, user_headers):
+    cursor = changes(client, user_headers)["cursor"]
+    client.delete(PREFIX_API_V1 + f"/visits/{visits[2].id}")
+    current = changes(client, user_headers, since=cursor)["cursor"]
+
+    assert compact_changes(session, retention_days=0) == 1
+    assert len(session.exec(select(VisitChange)).all()) == 0
+
+    stale = changes(client, user_headers, since=cursor)
+    assert stale["reset"] is True
+    assert [c["visit_id"] for c in stale["changes"]] == [visits[0].id, visits[1].id]
+    # A client that saw the tombstone carries on
+    assert changes(client, user_headers, since=current)["reset"] is False
+
+
+def test_seed_and_data_migrations_log_their_changes(
+    client, session, engine, visits, user_headers, monkeypatch
+):
+    cursor = changes(client, user_headers)["cursor"]
+    visit_table = sa.table("visit", sa.column("id"), sa.column("end"))
+
+    def reopen_visits(connection, first_id, last_id):
+        connection.execute(
+            sa.update(visit_table)
+            .where(visit_table.c.id.between(first_id, last_id))
+            .values(end=None)
+        )
+        log_visit_range_changes(connection, first_id, last_id)
+
+    with engine.connect() as connection:
+        run_batched(connection, "reopen", visit_table.c.id, reopen_visits, pause=0)
+    data = changes(client, user_headers, since=cursor)
+    assert [change["visit"]["end"] for change in data["changes"]] == [None] * 3
+
+    monkeypatch.setattr(seed, "engine", engine)
+    seed.delete_visits()
+    data = changes(client, user_headers, since=data["cursor"])
+    assert data["reset"] is False
+    assert [(change["visit_id"], change["deleted"]) for change in data["changes"]] == [
+        (visit.id, True) for visit in visits
+    ]
@@ -0,0 +1,97 @@
+import pytest
+
+from getdigitalnomadapi import search
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Country
+from getdigitalnomadapi.search import CountryIndex, country_index, normalize
+
+SEARCH = PREFIX_API_V1 + "/countries/search"
+
+
+@pytest.fixture
+def more_countries(session, countries):
+    session.add_all(
+        [
+            Country(name="Côte d'Ivoire", code="CI"),
+            Country(name="Türkiye", code="TR"),
+            Country(name="Finland", code="FI", schengen=True),
+        ]
+    )
+    session.commit()
+    country_index.invalidate()
+
+
+def names(response) -> list[str]:
+    assert response.status_code == 200
+    return [country["name"] for country in response.json()]
+
+
+def test_normalize():
+    assert normalize("  Côte d'Ivoire ") == "cote d ivoire"
+    assert normalize("KOREA, Republic of") == "korea republic of"
+
+
+def test_search_countries(client, more_countries):
+    assert names(client.get(SEARCH, params={"q": "f"})) == ["Finland", "France"]
+    assert names(client.get(SEARCH, params={"q": "FR"})) == ["France"]
+    assert names(client.get(SEARCH, params={"q": "cote"})) == ["Côte d'Ivoire"]
+    assert names(client.get(SEARCH, params={"q": "turk"})) == ["Türkiye"]
+    assert names(client.get(SEARCH, params={"q": "kingdom"})) == [
+        "United Kingdom of Great Britain and Northern Ireland"
+    ]
+    assert names(client.get(SEARCH, params={"q": "uk"}))[0].startswith("United")
+    # Typos fall back to the closest prefixes
+    assert names(client.get(SEARCH, params={"q": "fnland"})) == ["Finland"]
+    assert names(client.get(SEARCH, params={"q": "spian"})) == ["Spain"]
+    assert names(client.get(SEARCH, params={"q": "zz"})) == []
+
+
+def test_search_follows_country_writes(client, countries):
+    country_index.invalidate()
+    assert names(client.get(SEARCH, params={"q": "port"})) == []
+    response = client.post(
+        PREFIX_API_V1 + "/countries/", json={"name": "Portugal", "code": "PT"}
+    )
+    assert names(client.get(SEARCH, params={"q": "port"})) == ["Portugal"]
+
+    client.patch(
+        PREFIX_API_V1 + f"/countries/{response.json()['id']}",
+        json={"name": "Portugalia"},
+    )
+    assert names(client.get(SEARCH, params={"q": "portugali"})) == ["Portugalia"]
+
+    client.delete(PREFIX_API_V1 + f"/countries/{response.json()['id']}")
+    assert names(client.get(SEARCH, params={"q": "port"})) == []
+
+
+def test_invalidate_during_load_keeps_the_index_stale(session, countries, monkeypatch):
+    index = CountryIndex()
+    exec_ = session.exec
+
+    def exec_then_write(statement):
+        result = exec_(statement)
+        index.invalidate()  # a country write landing mid-load
+        return result
+
+    monkeypatch.setattr(session, "exec", exec_then_write)
+    index.load(session)
+    assert index.stale
+    monkeypatch.undo()
+    index.load(session)
+    assert not index.stale
+
+
+def test_search_during_build_sees_the_old_index(session, countries, monkeypatch):
+    index = CountryIndex()
+    index.load(session)
+    found = []
+    model_validate = search.CountryPublic.model_validate
+
+    def search_meanwhile(country):
+        # A search on the event loop while warmup builds in a thread
+        found.append([country.name for country in index.search("fr")])
+        return model_validate(country)
+
+    monkeypatch.setattr(search.CountryPublic, "model_validate", search_meanwhile)
+    index.build(countries[:1])
+    assert found == [["France"]]
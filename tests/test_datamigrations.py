@@ -0,0 +1,89 @@
+from datetime import date, datetime, timezone
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from getdigitalnomadapi.datamigrations import run_batched, run_batched_op
+from getdigitalnomadapi.models import DataMigration, Visit
+
+# Light table, as a revision would declare it
+visit = sa.table("visit", sa.column("id"), sa.column("start"), sa.column("end"))
+
+
+@pytest.fixture
+def many_visits(engine):
+    with engine.begin() as connection:
+        connection.execute(
+            sa.insert(Visit),
+            [
+                {
+                    "id": i,
+                    "start": date(2024, 1, 1),
+                    "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                    "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                }
+                for i in range(1, 2501)
+            ],
+        )
+
+
+def close_visits(connection, first_id, last_id):
+    connection.execute(
+        sa.update(visit)
+        .where(visit.c.id.between(first_id, last_id))
+        .values(end=visit.c.start)
+    )
+
+
+def open_visits(engine) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            sa.select(sa.func.count()).where(visit.c.end.is_(None))
+        ).scalar_one()
+
+
+def test_resumes_after_the_last_committed_batch(engine, many_visits):
+    batches = []
+
+    def failing(connection, first_id, last_id):
+        batches.append((first_id, last_id))
+        if len(batches) == 2:
+            raise RuntimeError("interrupted")
+        close_visits(connection, first_id, last_id)
+
+    with engine.connect() as connection, pytest.raises(RuntimeError):
+        run_batched(connection, "close", visit.c.id, failing, batch_size=1000, pause=0)
+    assert open_visits(engine) == 1500
+
+    def resumed(connection, first_id, last_id):
+        batches.append((first_id, last_id))
+        close_visits(connection, first_id, last_id)
+
+    with engine.connect() as connection:
+        walked = run_batched(
+            connection, "close", visit.c.id, resumed, batch_size=1000, pause=0
+        )
+    assert walked == 1500
+    assert batches == [(1, 1000), (1001, 2000), (1001, 2000), (2001, 2500)]
+    assert open_visits(engine) == 0
+
+    with engine.connect() as connection:
+        checkpoint = connection.execute(sa.select(DataMigration.__table__)).one()
+        assert (checkpoint.last_id, checkpoint.rows) == (2500, 2500)
+        assert checkpoint.finished_at is not None
+    # A finished migration is not run again
+    with engine.connect() as connection:
+        assert run_batched(connection, "close", visit.c.id, failing) == 0
+
+
+def test_runs_inside_an_alembic_migration(engine, many_visits):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        with Operations.context(context), context.begin_transaction():
+            walked = run_batched_op(
+                "close", visit.c.id, close_visits, batch_size=700, pause=0
+            )
+    assert walked == 2500
+    assert open_visits(engine) == 0
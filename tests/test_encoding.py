@@ -0,0 +1,79 @@
+import uuid
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from getdigitalnomadapi.encoding import MSGPACK, accepts_msgpack, packb, unpackb
+from getdigitalnomadapi.main import PREFIX_API_V1
+
+
+def test_native_types_round_trip():
+    value = {
+        "start": date(2024, 2, 29),
+        "before_epoch": date(1969, 12, 31),
+        "user_id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "at": datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc),
+        "days": np.int64(3),
+        "end": None,
+    }
+    decoded = unpackb(packb(value))
+    assert decoded == {**value, "days": 3}
+    # A naive datetime is taken as UTC
+    naive = datetime(2024, 1, 1, 12, 30)
+    assert unpackb(packb(naive)) == naive.replace(tzinfo=timezone.utc)
+
+
+def test_accept_negotiation():
+    assert accepts_msgpack(MSGPACK)
+    assert accepts_msgpack("application/x-msgpack, application/json;q=0.9")
+    assert accepts_msgpack("application/json;q=0.5, application/msgpack")
+    assert not accepts_msgpack("")
+    assert not accepts_msgpack("*/*")
+    assert not accepts_msgpack("application/json, application/msgpack;q=0.5")
+    assert not accepts_msgpack("application/msgpack;q=0")
+
+
+def test_me_visits_in_msgpack(client, visits, user_headers):
+    url = PREFIX_API_V1 + "/me/visits/"
+    as_json = client.get(url, headers=user_headers)
+    response = client.get(url, headers={**user_headers, "Accept": MSGPACK})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == MSGPACK
+    assert "Accept" in response.headers["vary"]
+    data = unpackb(response.content)
+    assert data["num_visit"] == 3
+    assert data["visits"][0]["start"] == date(2024, 1, 1)
+    assert data["visits"][0]["country_id"] == visits[0].country_id
+    assert len(response.content) < len(as_json.content)
+    assert as_json.headers["content-type"] == "application/json"
+
+
+def test_create_visit_from_msgpack_body(client, user, countries):
+    response = client.post(
+        PREFIX_API_V1 + "/visits/",
+        content=packb(
+            {
+                "start": date(2025, 1, 1),
+                "end": date(2025, 1, 5),
+                "user_id": user.id,
+                "country_id": countries[0].id,
+            }
+        ),
+        headers={"Content-Type": MSGPACK, "Accept": MSGPACK},
+    )
+    assert response.status_code == 200
+    visit = unpackb(response.content)
+    assert visit["end"] == date(2025, 1, 5)
+    assert visit["user_id"] == user.id
+
+    listing = client.get(PREFIX_API_V1 + "/visits/", headers={"Accept": MSGPACK})
+    assert [item["id"] for item in unpackb(listing.content)] == [visit["id"]]
+
+
+def test_invalid_msgpack_body_is_validated(client, countries):
+    response = client.post(
+        PREFIX_API_V1 + "/visits/",
+        content=packb({"end": date(2025, 1, 5)}),
+        headers={"Content-Type": MSGPACK},
+    )
+    assert response.status_code == 422
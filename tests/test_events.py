@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from getdigitalnomadapi import events
+from getdigitalnomadapi.events import EventBroker, TooManyStreams
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.routers.me import event_stream
+
+
+def parse(chunk: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return {"event": fields["event"], "data": json.loads(fields["data"])}
+
+
+def test_slow_subscriber_gets_resync_and_streams_are_capped(user):
+    broker = EventBroker(max_streams=1, queue_size=3)
+
+    async def scenario():
+        subscription = broker.subscribe(user.id)
+        with pytest.raises(TooManyStreams):
+            broker.subscribe(user.id)
+        for visit_id in range(5):
+            broker.publish(user.id, "visits", {"visit_id": visit_id})
+        await asyncio.sleep(0)
+        received = []
+        while not subscription.queue.empty():
+            received.append(subscription.queue.get_nowait())
+        broker.unsubscribe(subscription)
+        assert not broker.full
+        return received
+
+    received = asyncio.run(scenario())
+    assert [message["event"] for message in received] == ["resync", "visits"]
+    assert received[1]["data"] == {"visit_id": 4}
+
+
+def test_stream_limit_refused(client, user_headers, monkeypatch):
+    monkeypatch.setattr(events.broker, "max_streams", 0)
+    response = client.get(PREFIX_API_V1 + "/me/events", headers=user_headers)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_visit_change_streams_summary_delta(
+    client, session, user, countries, visits, monkeypatch
+):
+    broker = EventBroker()
+    monkeypatch.setattr(events, "broker", broker)
+    monkeypatch.setattr("getdigitalnomadapi.routers.me.broker", broker)
+    monkeypatch.setattr("getdigitalnomadapi.routers.visits.broker", broker)
+
+    async def scenario():
+        stream = event_stream(user.id, session, True, None, None, heartbeat=0.05)
+        assert (await anext(stream)).startswith("retry:")
+        initial = parse(await anext(stream))
+        # Visit writes run in the threadpool like the sync PATCH handler
+        await asyncio.to_thread(
+            client.patch,
+            PREFIX_API_V1 + f"/visits/{visits[0].id}",
+            json={"end": "2024-01-05"},
+        )
+        chunks = [await anext(stream), await anext(stream)]
+        heartbeat = await anext(stream)
+        await stream.aclose()
+        return initial, [parse(chunk) for chunk in chunks], heartbeat
+
+    initial, (change, delta), heartbeat = asyncio.run(scenario())
+    assert initial["event"] == "summary"
+    assert len(initial["data"]["changed"]) == 4  # 3 countries and Schengen
+    assert change == {
+        "event": "visits",
+        "data": {"action": "updated", "visit_id": visits[0].id},
+    }
+    assert delta["event"] == "summary"
+    changed = {row["country_code"]: row["days"] for row in delta["data"]["changed"]}
+    assert changed == {"FR": 5, None: 25}
+    assert heartbeat == ": heartbeat\n\n"
+    assert not broker._subscribers
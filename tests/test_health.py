@@ -0,0 +1,41 @@
+import asyncio
+
+from getdigitalnomadapi import warmup
+from getdigitalnomadapi.search import country_index
+from getdigitalnomadapi.warmup import readiness, warm_up
+
+
+def test_live_answers_while_warming_up(client, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", False)
+    assert client.get("/health/live").json() == {"status": "ok"}
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_ready_after_warm_up(client, engine, countries, monkeypatch):
+    monkeypatch.setattr(readiness, "ready", False)
+    monkeypatch.setattr(readiness, "warmup_ms", None)
+    country_index.invalidate()
+    asyncio.run(warm_up(engine))
+    assert not country_index.stale
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["warmup_ms"] >= 0
+
+
+def test_warm_up_retries_failed_steps(engine, monkeypatch, caplog):
+    monkeypatch.setattr(readiness, "ready", False)
+    monkeypatch.setattr(warmup, "RETRY_SECONDS", 0)
+    attempts = []
+
+    def database_down(engine):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("database is starting")
+
+    monkeypatch.setattr(warmup, "STEPS", [("database", database_down)])
+    asyncio.run(warm_up(engine))
+    assert len(attempts) == 2
+    assert readiness.ready
+    assert readiness.error is None
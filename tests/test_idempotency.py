@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import Response
+from sqlmodel import select
+
+from getdigitalnomadapi import idempotency
+from getdigitalnomadapi.main import PREFIX_API_V1, app
+from getdigitalnomadapi.models import IdempotencyKey, User, Visit
+
+
+def new_visit(user, countries, start="2024-03-01"):
+    return {
+        "start": start,
+        "end": start,
+        "user_id": str(user.id),
+        "country_id": countries[0].id,
+    }
+
+
+def test_retry_replays_the_first_response(client, session, user, countries):
+    body = new_visit(user, countries)
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post(PREFIX_API_V1 + "/visits/", json=body, headers=headers)
+    retry = client.post(PREFIX_API_V1 + "/visits/", json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert "idempotent-replayed" not in first.headers
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(session.exec(select(Visit)).all()) == 1
+
+    other = new_visit(user, countries, start="2024-04-01")
+    reused = client.post(PREFIX_API_V1 + "/visits/", json=other, headers=headers)
+    assert reused.status_code == 422
+    fresh = client.post(
+        PREFIX_API_V1 + "/visits/", json=other, headers={"Idempotency-Key": "retry-2"}
+    )
+    assert fresh.status_code == 200 and fresh.json()["id"] != first.json()["id"]
+
+
+def test_errors(client, session, user, visits):
+    # Client errors are replayed, the key stays used
+    overlapping = {"start": "2024-01-05", "end": "2024-01-06", "user_id": str(user.id)}
+    headers = {"Idempotency-Key": "overlap"}
+    first = client.post(PREFIX_API_V1 + "/visits/", json=overlapping, headers=headers)
+    retry = client.post(PREFIX_API_V1 + "/visits/", json=overlapping, headers=headers)
+    assert first.status_code == retry.status_code == 409
+    assert retry.json() == first.json()
+    # Invalid bodies never ran, their keys are released
+    client.post(PREFIX_API_V1 + "/visits/", json={}, headers={"Idempotency-Key": "x"})
+    assert session.get(IdempotencyKey, "x") is None
+    assert len(session.exec(select(IdempotencyKey)).all()) == 1
+
+    long_key = {"Idempotency-Key": "k" * 256}
+    response = client.post(PREFIX_API_V1 + "/visits/", json={}, headers=long_key)
+    assert response.status_code == 400
+
+
+def test_concurrent_duplicates_run_once(client, session):
+    body = {
+        "username": "twice",
+        "email": "twice@example.com",
+        "full_name": "Twice",
+        "password": "secret",
+    }
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await asyncio.gather(
+                *(
+                    c.post(
+                        PREFIX_API_V1 + "/users/",
+                        json=body,
+                        headers={"Idempotency-Key": "signup"},
+                    )
+                    for _ in range(4)
+                )
+            )
+
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.json()["id"] for response in responses}) == 1
+    replayed = [r.headers.get("idempotent-replayed") for r in responses]
+    assert replayed.count("true") == 3
+    assert len(session.exec(select(User).where(User.username == "twice")).all()) == 1
+
+
+class WorkerDied(Exception):
+    pass
+
+
+def test_write_committed_before_the_worker_died(
+    client, session, user, countries, monkeypatch
+):
+    def die(*args):
+        raise WorkerDied()
+
+    monkeypatch.setattr(idempotency.store, "save", die)
+    body = new_visit(user, countries)
+    headers = {"Idempotency-Key": "died"}
+    with pytest.raises(WorkerDied):
+        client.post(PREFIX_API_V1 + "/visits/", json=body, headers=headers)
+    monkeypatch.undo()
+
+    # The pending row was marked in the write's transaction
+    [row] = session.exec(select(IdempotencyKey)).all()
+    assert row.status_code is None and row.committed_at is not None
+    row.created_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    session.add(row)
+    session.commit()
+
+    retry = client.post(PREFIX_API_V1 + "/visits/", json=body, headers=headers)
+    assert retry.status_code == 409
+    assert "response was lost" in retry.json()["detail"]
+    assert len(session.exec(select(Visit)).all()) == 1
+
+
+def test_pending_key_in_another_worker(session):
+    idempotency.store.claim(session, "pending", "hash")
+    with pytest.raises(idempotency.HTTPException) as e:
+        idempotency.store.claim(session, "pending", "hash")
+    assert e.value.status_code == 409
+
+
+def test_oldest_keys_are_evicted(session, monkeypatch, caplog):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_MAX_KEYS", 2)
+    monkeypatch.setattr(idempotency, "EVICT_EVERY", 1)
+    response = Response(content=b"{}", status_code=200)
+    idempotency.store.claim(session, "pending", "hash")
+    for key in ("a", "b", "c"):
+        idempotency.store.claim(session, key, "hash")
+        idempotency.store.save(session, key, "hash", response)
+    idempotency.store.claim(session, "d", "hash")
+    # Only stored responses count, requests still running keep their rows
+    kept = session.exec(select(IdempotencyKey.id)).all()
+    assert sorted(kept) == ["b", "c", "d", "pending"]
+
+    idempotency.store.save(session, "a", "hash", response)
+    assert session.get(IdempotencyKey, "a") is None
+    assert "Idempotency key a was gone" in caplog.text
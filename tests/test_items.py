@@ -1,71 +0,0 @@
-from fastapi.testclient import TestClient
-
-from getdigitalnomadapi.main import app, PREFIX_API_V1
-
-client = TestClient(app)
-
-
-def test_read_item():
-    response = client.get(
-        PREFIX_API_V1 + "/items/foo", headers={"X-Token": "coneofsilence"}
-    )
-    assert response.status_code == 200
-    assert response.json() == {
-        "id": "foo",
-        "title": "Foo",
-        "description": "There goes my hero",
-    }
-
-
-def test_read_item_bad_token():
-    response = client.get(
-        PREFIX_API_V1 + "/items/foo", headers={"X-Token": "hailhydra"}
-    )
-    assert response.status_code == 400
-    assert response.json() == {"detail": "Invalid X-Token header"}
-
-
-def test_read_nonexistent_item():
-    response = client.get(
-        PREFIX_API_V1 + "/items/baz", headers={"X-Token": "coneofsilence"}
-    )
-    assert response.status_code == 404
-    assert response.json() == {"detail": "Item not found"}
-
-
-def test_create_item():
-    response = client.post(
-        PREFIX_API_V1 + "/items/",
-        headers={"X-Token": "coneofsilence"},
-        json={"id": "foobar", "title": "Foo Bar", "description": "The Foo Barters"},
-    )
-    assert response.status_code == 200
-    assert response.json() == {
-        "id": "foobar",
-        "title": "Foo Bar",
-        "description": "The Foo Barters",
-    }
-
-
-def test_create_item_bad_token():
-    response = client.post(
-        PREFIX_API_V1 + "/items/",
-        headers={"X-Token": "hailhydra"},
-        json={"id": "bazz", "title": "Bazz", "description": "Drop the bazz"},
-    )
-    assert response.status_code == 400
-    assert response.json() == {"detail": "Invalid X-Token header"}
-
-
-def test_create_existing_item():
-    response = client.post(
-        PREFIX_API_V1 + "/items/",
-        headers={"X-Token": "coneofsilence"},
-        json={
-            "id": "foo",
-            "title": "The Foo ID Stealers",
-            "description": "There goes my stealer",
-        },
-    )
-    assert response.status_code == 409
-    assert response.json() == {"detail": "Item already exists"}
@@ -0,0 +1,255 @@
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from getdigitalnomadapi import jobs
+from getdigitalnomadapi.models import Job
+from getdigitalnomadapi.routers import jobs as jobs_router
+
+PREFIX = "/api/v1/jobs"
+
+
+def test_summary_job(client, engine, user_headers, visits):
+    response = client.post(
+        f"{PREFIX}/",
+        json={
+            "kind": "summary",
+            "params": {"start_dt": "2024-01-01", "end_dt": "2024-02-29"},
+        },
+        headers=user_headers,
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["status"] == "queued"
+
+    # The runner is not started by TestClient without a lifespan
+    jobs.run_job(uuid.UUID(job_id), engine)
+
+    job = client.get(f"{PREFIX}/{job_id}", headers=user_headers).json()
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["attempts"] == 1
+    result = client.get(f"{PREFIX}/{job_id}/result", headers=user_headers)
+    assert result.headers["content-type"] == "application/json"
+    assert (
+        sum(row["days"] for row in result.json()["summary"] if row["country_id"]) == 60
+    )
+
+
+def test_export_job_in_runner(client, engine, user_headers, visits, monkeypatch):
+    runner = jobs.JobRunner(workers=1, processes=0, engine=engine)
+    monkeypatch.setattr(jobs, "runner", runner)
+
+    async def submit_and_wait():
+        await runner.start()
+        response = client.post(
+            f"{PREFIX}/", json={"kind": "export"}, headers=user_headers
+        )
+        await runner.join()
+        await runner.stop()
+        return response.json()["id"]
+
+    job_id = asyncio.run(submit_and_wait())
+    result = client.get(f"{PREFIX}/{job_id}/result", headers=user_headers)
+    assert result.status_code == 200
+    rows = list(csv.reader(io.StringIO(result.text)))
+    assert rows[0] == ["id", "country_code", "country_name", "start", "end"]
+    assert [row[1] for row in rows[1:]] == ["FR", "GB", "ES"]
+
+
+def test_cancel_and_ownership(client, engine, user_headers, admin_headers):
+    job_id = client.post(
+        f"{PREFIX}/", json={"kind": "export"}, headers=user_headers
+    ).json()["id"]
+
+    assert client.get(f"{PREFIX}/{job_id}", headers=admin_headers).status_code == 404
+    assert (
+        client.get(f"{PREFIX}/{job_id}/result", headers=user_headers).status_code == 409
+    )
+
+    response = client.delete(f"{PREFIX}/{job_id}", headers=user_headers)
+    assert response.json()["status"] == "cancelled"
+    # Cancelled before it ran, so a worker does not pick it up
+    jobs.run_job(uuid.UUID(job_id), engine)
+    job = client.get(f"{PREFIX}/{job_id}", headers=user_headers).json()
+    assert job["status"] == "cancelled"
+    assert job["attempts"] == 0
+    assert client.delete(f"{PREFIX}/{job_id}", headers=user_headers).status_code == 409
+
+
+def test_cancel_racing_the_worker(client, engine, user_headers, visits, monkeypatch):
+    read_own_job = jobs_router._get_own_job
+    worker = []
+
+    def read_then_worker_runs(session, job_id, user):
+        job = read_own_job(session, job_id, user)
+        if worker:
+            worker.pop()(job_id)
+        return job
+
+    monkeypatch.setattr(jobs_router, "_get_own_job", read_then_worker_runs)
+
+    def claim(job_id):
+        with Session(engine) as session:
+            session.execute(
+                update(Job).where(Job.id == job_id).values(status="running")
+            )
+            session.commit()
+
+    # Claimed after the cancel read it as queued: cancelling, not cancelled
+    job_id = client.post(
+        f"{PREFIX}/", json={"kind": "export"}, headers=user_headers
+    ).json()["id"]
+    worker.append(claim)
+    response = client.delete(f"{PREFIX}/{job_id}", headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelling"
+
+    # Finished after the cancel read it: the result is kept
+    job_id = client.post(
+        f"{PREFIX}/", json={"kind": "export"}, headers=user_headers
+    ).json()["id"]
+    worker.append(lambda job_id: jobs.run_job(job_id, engine))
+    response = client.delete(f"{PREFIX}/{job_id}", headers=user_headers)
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Job is succeeded"
+    job = client.get(f"{PREFIX}/{job_id}", headers=user_headers).json()
+    assert job["status"] == "succeeded"
+
+
+def test_running_job_cancelled_at_progress(session, engine, user, visits, monkeypatch):
+    job = Job(kind="export", user_id=user.id)
+    session.add(job)
+    session.commit()
+
+    def cancel_then_export(session, job, report):
+        session.get(Job, job.id).status = "cancelling"
+        session.commit()
+        return jobs.export_job(session, job, report)
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "export", cancel_then_export)
+    jobs.run_job(job.id, engine)
+    session.refresh(job)
+    assert job.status == "cancelled"
+    assert job.result is None
+
+
+def test_recover_requeues_orphaned_jobs(session, engine, user):
+    long_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    orphaned = Job(
+        kind="export",
+        user_id=user.id,
+        status="running",
+        attempts=1,
+        lease_expires_at=long_ago,
+    )
+    # No progress for long, but its worker still renews the lease
+    busy = Job(
+        kind="export",
+        user_id=user.id,
+        status="running",
+        attempts=1,
+        lease_expires_at=long_ago + timedelta(hours=2),
+    )
+    gave_up = Job(kind="export", user_id=user.id, status="queued", attempts=3)
+    session.add_all([orphaned, busy, gave_up])
+    session.commit()
+    busy.updated_at = long_ago
+    session.add(busy)
+    session.commit()
+
+    queued = jobs.JobRunner(processes=0, engine=engine).recover()
+    assert set(queued) == {orphaned.id, gave_up.id}
+
+    jobs.run_job(gave_up.id, engine)
+    session.refresh(gave_up)
+    assert gave_up.status == "failed"
+    assert "attempts" in gave_up.error
+
+
+def die_once(job_id, engine=None, owner=None):
+    """run_job in a pool process that dies the first time for each job"""
+    marker = os.path.join(tempfile.gettempdir(), f"job-{job_id}.died")
+    if os.path.exists(marker):
+        with open(marker, "a") as file:
+            file.write("ran again")
+        return
+    open(marker, "w").close()
+    os._exit(1)
+
+
+def test_broken_process_pool_is_replaced(session, engine, user, monkeypatch):
+    job = Job(
+        kind="export",
+        user_id=user.id,
+        status="running",
+        attempts=1,
+        lease_expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+    )
+    session.add(job)
+    session.commit()
+    marker = os.path.join(tempfile.gettempdir(), f"job-{job.id}.died")
+    runner = jobs.JobRunner(workers=1, processes=1, engine=engine)
+    monkeypatch.setattr(jobs, "run_job", die_once)
+
+    async def run():
+        await runner.start()
+        broken = runner.executor
+        runner.submit(job.id)
+        await runner.join()
+        replaced = runner.executor
+        pid = await asyncio.get_running_loop().run_in_executor(replaced, os.getpid)
+        await runner.stop()
+        return broken, replaced, pid
+
+    try:
+        broken, replaced, pid = asyncio.run(run())
+        with open(marker) as file:
+            ran_again = file.read()
+    finally:
+        if os.path.exists(marker):
+            os.remove(marker)
+    assert replaced is not broken and pid != os.getpid()
+    # Requeued and submitted again, to a process that lived
+    assert ran_again == "ran again"
+    session.refresh(job)
+    assert job.status == "queued"
+
+
+def test_runner_renews_the_lease(session, engine, user, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0.3)
+    job = Job(kind="export", user_id=user.id)
+    session.add(job)
+    session.commit()
+    leases = []
+
+    def quiet(session, job, report):
+        # No progress for more than a lease
+        for _ in range(6):
+            time.sleep(0.1)
+            leases.append(session.get(Job, job.id).lease_expires_at)
+            session.expire_all()
+        return "", "text/plain"
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "export", quiet)
+    runner = jobs.JobRunner(workers=1, processes=0, engine=engine)
+
+    async def run():
+        await runner.start()
+        runner.submit(job.id)
+        await runner.join()
+        await runner.stop()
+
+    asyncio.run(run())
+    session.refresh(job)
+    assert job.status == "succeeded"
+    assert job.owner == runner.owner
+    assert leases[-1] > leases[0] + timedelta(seconds=0.3)
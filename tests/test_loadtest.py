@@ -0,0 +1,67 @@
+import asyncio
+import random
+
+from sqlalchemy import create_engine, text
+
+from benchmarks import loadtest, synthetic
+
+
+def test_generate_and_run(tmp_path):
+    countries_csv = tmp_path / "countries.csv"
+    countries_csv.write_text("name,alpha-2\nFrance,FR\nSpain,ES\nJapan,JP\n")
+    schengen_csv = tmp_path / "schengen.csv"
+    schengen_csv.write_text("name\nFrance\nSpain\n")
+    database_url = f"sqlite:///{tmp_path / 'loadtest.db'}"
+
+    counts = synthetic.generate(
+        database_url,
+        users=20,
+        visits=400,
+        countries_csv=str(countries_csv),
+        schengen_csv=str(schengen_csv),
+    )
+    assert counts["countries"] == 3
+    assert counts["users"] == 20
+    assert 0 < counts["visits"] <= 400
+
+    async def run_load():
+        async with loadtest.in_process_client(database_url) as client:
+            return await loadtest.run(
+                client,
+                duration=1.5,
+                concurrency=2,
+                users=20,
+                scenarios=["me_visits", "countries", "visit_write"],
+            )
+
+    samples, elapsed = asyncio.run(run_load())
+    report = loadtest.build_report(samples, elapsed, {})
+    assert set(report["endpoints"]) == {
+        "login",
+        "me_visits",
+        "countries",
+        "visit_write",
+    }
+    assert report["endpoints"]["login"]["errors"] == 0
+    assert report["endpoints"]["me_visits"]["p99_ms"] > 0
+    assert report["endpoints"]["visit_write"]["requests"] > 0
+    # Written visits belong to the virtual user that wrote them
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        orphans = connection.execute(
+            text("SELECT count(*) FROM visit WHERE user_id IS NULL")
+        ).scalar_one()
+    assert orphans == 0
+
+
+def test_visit_counts_total():
+    for users, visits in ((20, 400), (300, 400), (1000, 1000)):
+        counts = synthetic._visit_counts(random.Random(0), users, visits)
+        assert sum(counts) == visits and min(counts) >= 1
+
+
+def test_percentile():
+    ordered = [float(i) for i in range(1, 101)]
+    assert loadtest.percentile(ordered, 0.50) == 50.0
+    assert loadtest.percentile(ordered, 0.99) == 99.0
+    assert loadtest.percentile([], 0.5) == 0.0
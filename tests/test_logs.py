@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+from logging.handlers import QueueHandler
+
+import pytest
+
+from getdigitalnomadapi import logs
+
+
+def queue_handlers() -> list[QueueHandler]:
+    # pytest adds its own capture handlers to the root logger
+    return [h for h in logging.getLogger().handlers if isinstance(h, QueueHandler)]
+
+
+@pytest.fixture
+def json_log(tmp_path):
+    """The file the listener writes JSON lines to, instead of stderr"""
+    logs.stop_logging()
+    logs.setup_logging("INFO", "json")
+    path = tmp_path / "log.jsonl"
+    with open(path, "a") as stream:
+        logs._listener.handlers[0].setStream(stream)
+        yield path
+    logs.stop_logging()
+    logs.setup_logging()
+
+
+def test_record_goes_through_the_queue_as_one_json_line(json_log):
+    assert len(queue_handlers()) == 1
+    logging.getLogger("tests.logs").info("hello %s", "queue")
+    logs.stop_logging()
+
+    lines = json_log.read_text().splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "tests.logs"
+    assert entry["message"] == "hello queue"
+    assert entry["location"].startswith("test_logs.py:")
+    assert entry["timestamp"].endswith("Z")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_forked_child_restarts_the_listener(json_log):
+    [handler] = queue_handlers()
+    parent_queue = handler.queue
+    pid = os.fork()
+    if pid == 0:
+        # The parent's listener thread is gone, only a new one can write this
+        code = 1
+        try:
+            if handler.queue is not parent_queue:
+                logging.getLogger("tests.logs").info("from the child")
+                logs.stop_logging()
+                code = 0
+        finally:
+            os._exit(code)
+    _, wait_status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(wait_status) == 0
+
+    messages = [
+        json.loads(line)["message"] for line in json_log.read_text().splitlines()
+    ]
+    assert messages == ["from the child"]
@@ -0,0 +1,148 @@
+from datetime import date
+
+from getdigitalnomadapi import periods
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Visit
+
+
+def test_read_me(client, user, user_headers):
+    response = client.get(PREFIX_API_V1 + "/me/", headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == user.username
+
+
+def test_read_me_bad_token(client):
+    response = client.get(
+        PREFIX_API_V1 + "/me/", headers={"Authorization": "Bearer hailhydra"}
+    )
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Could not validate credentials"}
+
+
+def test_read_me_visits(client, visits, user_headers):
+    response = client.get(
+        PREFIX_API_V1 + "/me/visits/",
+        headers=user_headers,
+        params={"start_dt": "2024-01-15", "end_dt": "2024-12-31"},
+    )
+    assert response.status_code == 200
+    assert response.json()["num_visit"] == 2
+
+
+def test_read_me_summary(client, visits, user_headers):
+    response = client.get(
+        PREFIX_API_V1 + "/me/summary/",
+        headers=user_headers,
+        params={"start_dt": "2024-01-01", "end_dt": "2024-12-31"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["totalDays"] == 366
+    days = {row["country_name"]: row["days"] for row in data["summary"]}
+    assert days == {
+        "France": 10,
+        "United Kingdom of Great Britain and Northern Ireland": 30,
+        "Spain": 20,
+        "Schengen": 30,
+    }
+
+
+def test_read_me_summary_periods_match_summary(client, visits, user_headers):
+    response = client.get(
+        PREFIX_API_V1 + "/me/summary/periods",
+        headers=user_headers,
+        params={"granularity": "month"},
+    )
+    assert response.status_code == 200
+    periods = response.json()["periods"]
+    assert [(p["startDate"], p["endDate"]) for p in periods] == [
+        ("2024-01-01", "2024-01-31"),
+        ("2024-02-01", "2024-02-29"),
+    ]
+    for period in periods:
+        summary = client.get(
+            PREFIX_API_V1 + "/me/summary/",
+            headers=user_headers,
+            params={"start_dt": period["startDate"], "end_dt": period["endDate"]},
+        ).json()
+        expected = {row["country_name"]: row["days"] for row in summary["summary"]}
+        days = {row["country_name"]: row["days"] for row in period["summary"]}
+        assert days == {name: n for name, n in expected.items() if n}
+
+
+def test_read_me_summary_periods_explicit_and_fiscal(client, visits, user_headers):
+    response = client.get(
+        PREFIX_API_V1 + "/me/summary/periods",
+        headers=user_headers,
+        params={"period": ["2024-01-05/2024-01-14", "2024-02-20/2024-03-31"]},
+    )
+    first, second = response.json()["periods"]
+    assert {row["country_name"]: row["days"] for row in first["summary"]} == {
+        "France": 6,
+        "United Kingdom of Great Britain and Northern Ireland": 4,
+        "Schengen": 6,
+    }
+    assert {row["country_name"]: row["days"] for row in second["summary"]} == {
+        "Spain": 10,
+        "Schengen": 10,
+    }
+
+    response = client.get(
+        PREFIX_API_V1 + "/me/summary/periods",
+        headers=user_headers,
+        params={"granularity": "quarter", "year_start": 2},
+    )
+    # Quarters from February: November to January, February to April
+    assert [p["endDate"] for p in response.json()["periods"]] == [
+        "2024-01-31",
+        "2024-02-29",
+    ]
+
+    for params in ({}, {"granularity": "year", "period": "2024-01-01/2024-12-31"}):
+        response = client.get(
+            PREFIX_API_V1 + "/me/summary/periods", headers=user_headers, params=params
+        )
+        assert response.status_code == 422
+
+
+def test_read_me_summary_periods_far_out(
+    client, session, user, countries, visits, user_headers, monkeypatch
+):
+    france = countries[0]
+    session.add(Visit(start=date(2024, 3, 1), user=user, country=france))
+    session.commit()
+    axes = []
+    daily_presence = periods.daily_presence
+
+    def recording(visits, schengen_ids, first, last):
+        axes.append((first, last))
+        return daily_presence(visits, schengen_ids, first, last)
+
+    monkeypatch.setattr(periods, "daily_presence", recording)
+    response = client.get(
+        PREFIX_API_V1 + "/me/summary/periods",
+        headers=user_headers,
+        params={
+            "period": [
+                "0001-01-01/9999-12-31",
+                "0001-01-01/0001-12-31",
+                "9000-01-01/9000-12-31",
+            ]
+        },
+    )
+    assert response.status_code == 200
+    # Only the visits' own days, the open one counts on beyond them
+    assert axes == [(date(2024, 1, 1), date(2024, 3, 2))]
+    everything, empty, far = response.json()["periods"]
+    open_days = (date(9999, 12, 31) - date(2024, 3, 1)).days + 1
+    assert {row["country_name"]: row["days"] for row in everything["summary"]} == {
+        "France": 10 + open_days,
+        "United Kingdom of Great Britain and Northern Ireland": 30,
+        "Spain": 20,
+        "Schengen": 30 + open_days,
+    }
+    assert empty["summary"] == []
+    assert {row["country_name"]: row["days"] for row in far["summary"]} == {
+        "France": 365,
+        "Schengen": 365,
+    }
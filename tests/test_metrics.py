@@ -0,0 +1,89 @@
+import re
+import threading
+
+import pytest
+
+from getdigitalnomadapi import metrics
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.metrics import Counter, Gauge, Histogram, render_metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Metrics made by a test are left out of /metrics after it"""
+    monkeypatch.setattr(metrics, "_registry", list(metrics._registry))
+
+
+def test_exposition_format():
+    counter = Counter("test_requests_total", "Requests", ("method",))
+    counter.inc("GET")
+    counter.inc("GET", amount=2)
+    counter.inc("POST")
+    gauge = Gauge("test_in_flight", "In flight")
+    gauge.inc()
+    gauge.dec()
+    gauge.inc()
+
+    assert counter.render() == "\n".join(
+        [
+            "# HELP test_requests_total Requests",
+            "# TYPE test_requests_total counter",
+            'test_requests_total{method="GET"} 3',
+            'test_requests_total{method="POST"} 1',
+        ]
+    )
+    assert gauge.samples() == ["test_in_flight 1"]
+    assert "# TYPE test_in_flight gauge\ntest_in_flight 1\n" in render_metrics()
+
+
+def test_histogram_buckets():
+    histogram = Histogram("test_duration_seconds", "Duration", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        'test_duration_seconds_bucket{le="0.1"} 2',
+        'test_duration_seconds_bucket{le="1.0"} 3',
+        'test_duration_seconds_bucket{le="+Inf"} 4',
+        "test_duration_seconds_sum 3.65",
+        "test_duration_seconds_count 4",
+    ]
+
+
+def test_finished_threads_are_folded():
+    counter = Counter("test_threads_total", "Writes from threads")
+    histogram = Histogram("test_thread_seconds", "Writes from threads", buckets=(1,))
+
+    def write():
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(20):
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+
+    assert counter.samples() == ["test_threads_total 20"]
+    assert histogram.samples()[-1] == "test_thread_seconds_count 20"
+    assert counter._shards == {} and histogram._shards == {}
+
+
+def test_middleware_labels_by_route_template(client, visits):
+    for visit in visits:
+        client.get(PREFIX_API_V1 + f"/visits/{visit.id}")
+    client.get("/no-such-path")
+
+    text = client.get("/metrics").text
+    # The template, with or without the /api/v1 prefix depending on FastAPI
+    assert re.search(
+        r'http_requests_total\{method="GET",route="[^"]*/visits/\{visit_id\}",'
+        r'status="200"\}',
+        text,
+    )
+    assert 'route="unmatched",status="404"' in text
+    assert f'/visits/{visits[0].id}"' not in text
+
+
+def test_metrics_of_earlier_tests_are_unregistered():
+    text = render_metrics()
+    assert "test_requests_total" not in text and "test_duration_seconds" not in text
@@ -0,0 +1,26 @@
+from benchmarks import micro
+
+
+def test_measure_summary_case():
+    result = micro.measure(micro.summary_case(10, 1))
+    assert result["time_ms"] > 0
+    assert result["peak_kb"] > 0
+    assert result["repeats"] >= micro.MIN_REPEATS
+
+
+def test_measure_auth_case():
+    result = micro.measure(micro.auth_case("admin"))
+    assert result["time_ms"] > 0
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baselines = {"case": {"time_ms": 10.0, "peak_kb": 100.0}}
+    assert (
+        micro.compare({"case": {"time_ms": 12.0, "peak_kb": 100.0}}, baselines, 0.25)
+        == []
+    )
+    regressions = micro.compare(
+        {"case": {"time_ms": 13.0, "peak_kb": 200.0}}, baselines, 0.25
+    )
+    assert len(regressions) == 2
+    assert micro.compare({"new_case": {"time_ms": 1, "peak_kb": 1}}, baselines, 0) == []
@@ -0,0 +1,81 @@
+from datetime import date
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Visit
+from getdigitalnomadapi.presence import find_present_users
+
+
+def test_find_present_users(session, user, admin, countries, visits):
+    france, spain, uk = countries
+    session.add(Visit(start=date(2024, 1, 8), end=None, user=admin, country=france))
+    session.commit()
+
+    present = find_present_users(
+        session, date(2024, 1, 1), date(2024, 1, 31), country_id=france.id
+    )
+    assert {row["user_id"]: row["days"] for row in present} == {
+        user.id: 10,
+        admin.id: 24,
+    }
+
+    present = find_present_users(
+        session, date(2024, 2, 1), date(2024, 2, 29), schengen=True
+    )
+    assert {row["user_id"]: row["days"] for row in present} == {
+        user.id: 20,
+        admin.id: 29,
+    }
+
+    present = find_present_users(
+        session, date(2024, 1, 11), date(2024, 1, 20), country_id=spain.id
+    )
+    assert present == []
+
+
+def test_presence_index_follows_visit_writes(session, user, countries, visits):
+    france = countries[0]
+    visits[0].start = date(2024, 1, 5)
+    session.add(visits[0])
+    session.commit()
+    present = find_present_users(
+        session, date(2024, 1, 1), date(2024, 1, 31), country_id=france.id
+    )
+    assert present == [{"user_id": user.id, "days": 6}]
+
+    session.delete(visits[0])
+    session.commit()
+    assert (
+        find_present_users(
+            session, date(2024, 1, 1), date(2024, 1, 31), country_id=france.id
+        )
+        == []
+    )
+
+
+def test_admin_visit_presence_paginates(
+    client, user, admin, countries, visits, session, admin_headers
+):
+    session.add(
+        Visit(start=date(2024, 1, 1), end=None, user=admin, country=countries[0])
+    )
+    session.commit()
+    params = {
+        "start_dt": "2024-01-01",
+        "end_dt": "2024-01-31",
+        "country_id": countries[0].id,
+        "limit": 1,
+    }
+    first = client.get(
+        PREFIX_API_V1 + "/admin/visits/presence", headers=admin_headers, params=params
+    ).json()
+    assert len(first["users"]) == 1
+    second = client.get(
+        PREFIX_API_V1 + "/admin/visits/presence",
+        headers=admin_headers,
+        params={**params, "after": first["next_after"]},
+    ).json()
+    assert len(second["users"]) == 1
+    assert {first["users"][0]["user_id"], second["users"][0]["user_id"]} == {
+        str(user.id),
+        str(admin.id),
+    }
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections import deque
+
+import httpx
+import pytest
+
+from getdigitalnomadapi import profiling
+from getdigitalnomadapi.main import PREFIX_API_V1, app
+from getdigitalnomadapi.routers import me
+
+
+def test_only_admins_profile_on_request(
+    client, user_headers, admin_headers, monkeypatch
+):
+    monkeypatch.setattr(profiling, "profiles", deque(maxlen=10))
+    url = PREFIX_API_V1 + "/me/"
+
+    # Others are served as without the flag
+    for headers in (user_headers, {}):
+        response = client.get(url + "?profile=1", headers=headers)
+        plain = client.get(url, headers=headers)
+        assert response.status_code == plain.status_code
+        assert response.json() == plain.json()
+        assert "x-profile-id" not in response.headers
+    response = client.get(url, headers={**user_headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    for query in ("noprofile=1", "profile=10", "x=profile=1"):
+        response = client.get(f"{url}?{query}", headers=admin_headers)
+        assert response.status_code == 200
+        assert "x-profile-id" not in response.headers
+    assert len(profiling.profiles) == 0
+
+    response = client.get(url + "?profile=1", headers=admin_headers)
+    assert response.headers["x-profile-id"] == profiling.profiles[0]["id"]
+
+
+def test_buffer_evicts_the_oldest(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(profiling, "profiles", deque(maxlen=2))
+    ids = [
+        client.get(
+            PREFIX_API_V1 + "/me/", headers={**admin_headers, "X-Profile": "1"}
+        ).headers["x-profile-id"]
+        for _ in range(3)
+    ]
+    assert [profile["id"] for profile in profiling.list_profiles()] == ids[:0:-1]
+    assert profiling.get_profile(ids[0]) is None
+
+
+@pytest.mark.usefixtures("client")
+def test_profile_flags_its_limits(visits, user_headers, admin_headers, monkeypatch):
+    monkeypatch.setattr(profiling, "profiles", deque(maxlen=10))
+    profile = {**admin_headers, "X-Profile": "1"}
+    load_summary = me.load_summary
+
+    def slow_load_summary(*args):
+        time.sleep(0.1)
+        return load_summary(*args)
+
+    monkeypatch.setattr(me, "load_summary", slow_load_summary)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            alone = await c.get(PREFIX_API_V1 + "/me/", headers=profile)
+            sync = await c.patch(
+                PREFIX_API_V1 + f"/visits/{visits[0].id}",
+                json={"end": "2024-01-09"},
+                headers=profile,
+            )
+            crowded, _ = await asyncio.gather(
+                c.get(PREFIX_API_V1 + "/me/summary/", headers=profile),
+                c.get(PREFIX_API_V1 + "/me/", headers=user_headers),
+            )
+            return alone, sync, crowded
+
+    responses = asyncio.run(scenario())
+    alone, sync, crowded = (
+        profiling.get_profile(response.headers["x-profile-id"])
+        for response in responses
+    )
+    assert alone["concurrent_requests"] == 0 and not alone["threadpool"]
+    assert sync["threadpool"]
+    assert crowded["concurrent_requests"] == 1
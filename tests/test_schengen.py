@@ -0,0 +1,92 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.schengen import MAX_DAYS, WINDOW_DAYS, SchengenCalendar
+from getdigitalnomadapi.visitdays import VisitDays
+
+PLAN = PREFIX_API_V1 + "/me/schengen/plan"
+
+
+def simulate(intervals, entry: date, k: int) -> bool:
+    """Day by day: add the trip and check every present day it can affect"""
+    origin = entry - timedelta(days=2 * WINDOW_DAYS)
+    present = np.zeros(5 * WINDOW_DAYS, dtype=int)
+    for start, end in intervals + [(entry, entry + timedelta(days=k - 1))]:
+        first = max((start - origin).days, 0)
+        last = min((end - origin).days, len(present) - 1)
+        if first <= last:
+            present[first : last + 1] = 1
+    windows = np.convolve(present, np.ones(WINDOW_DAYS, dtype=int))[: len(present)]
+    days = np.arange((entry - origin).days, (entry - origin).days + k + WINDOW_DAYS)
+    return not np.any(present[days] & (windows[days] > MAX_DAYS))
+
+
+def test_calendar_matches_simulation():
+    rng = random.Random(7)
+    first = date(2025, 1, 1)
+    for _ in range(30):
+        intervals = []
+        for _ in range(rng.randint(0, 8)):
+            start = first + timedelta(days=rng.randint(-300, 400))
+            intervals.append((start, start + timedelta(days=rng.randint(0, 60))))
+        last = first + timedelta(days=200)
+        calendar = SchengenCalendar(
+            VisitDays.from_rows((0, start, end) for start, end in intervals),
+            first,
+            last + timedelta(days=MAX_DAYS - 1),
+        )
+
+        entry = first + timedelta(days=rng.randint(0, 200))
+        allowed = [simulate(intervals, entry, k) for k in range(1, MAX_DAYS + 1)]
+        assert calendar.max_stay(entry) == (allowed + [False]).index(False)
+
+        k = rng.randint(1, MAX_DAYS)
+        expected = next(
+            (
+                first + timedelta(days=i)
+                for i in range(201)
+                if simulate(intervals, first + timedelta(days=i), k)
+            ),
+            None,
+        )
+        assert calendar.earliest_entry(k, first, last) == expected
+
+
+def test_plan_me_schengen(client, visits, countries, user_headers):
+    # 10 days in France in January and 20 in Spain in February 2024
+    response = client.post(
+        PLAN,
+        headers=user_headers,
+        json={"entry": "2024-03-01", "trip_days": 90, "earliest_from": "2024-03-01"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "entry": "2024-03-01",
+        "days_used": 30,
+        "max_stay": 60,
+        "leave_by": "2024-04-29",
+        "trip_days": 90,
+        "earliest_entry": "2024-05-30",
+    }
+
+    # A 60 day trip in June and July leaves room for 10 days in March,
+    # a trip to the United Kingdom does not count
+    uk = countries[2]
+    response = client.post(
+        PLAN,
+        headers=user_headers,
+        json={
+            "entry": "2024-03-01",
+            "trips": [
+                {"start": "2024-06-01", "end": "2024-07-30"},
+                {"start": "2024-03-20", "end": "2024-05-30", "country_id": uk.id},
+            ],
+        },
+    )
+    assert response.json()["max_stay"] == 10
+
+    response = client.post(PLAN, headers=user_headers, json={"trips": []})
+    assert response.status_code == 422
@@ -0,0 +1,68 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from sqlmodel import SQLModel, create_engine
+
+from getdigitalnomadapi.server import cpu_for_worker, private_memory_mb
+
+
+def test_workers_pinned_round_robin():
+    cpus = [2, 3, 5]
+    assert [cpu_for_worker(slot, cpus) for slot in range(5)] == [2, 3, 5, 2, 3]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="uses fork and /proc")
+def test_server_recycles_and_stops_gracefully(tmp_path):
+    assert private_memory_mb(0) is None
+    database_url = f"sqlite:///{tmp_path}/test.db"
+    SQLModel.metadata.create_all(create_engine(database_url))
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "getdigitalnomadapi.server",
+            "--workers",
+            "2",
+            "--port",
+            str(port),
+            "--max-requests",
+            "2",
+        ],
+        env=dict(
+            os.environ,
+            DATABASE_URL=database_url,
+            JOB_PROCESSES="0",
+        ),
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        statuses = []
+        deadline = time.monotonic() + 30
+        while len(statuses) < 10 and time.monotonic() < deadline:
+            try:
+                statuses.append(
+                    httpx.get(f"http://127.0.0.1:{port}/metrics").status_code
+                )
+            except httpx.TransportError:
+                time.sleep(0.2)
+        assert statuses == [200] * 10
+    finally:
+        process.send_signal(signal.SIGTERM)
+        _, log = process.communicate(timeout=30)
+    assert process.returncode == 0
+    assert "exited, replacing it" in log
+    assert log.count("stopped") == 2
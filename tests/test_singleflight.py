@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from getdigitalnomadapi.main import PREFIX_API_V1, app
+from getdigitalnomadapi.metrics import (
+    SINGLE_FLIGHT_COALESCED,
+    SINGLE_FLIGHT_COMPUTATIONS,
+    SINGLE_FLIGHT_TIMEOUTS,
+)
+from getdigitalnomadapi.routers import me
+from getdigitalnomadapi.singleflight import SingleFlight
+
+
+def count(metric, name: str) -> float:
+    return metric._merged().get((name,), 0)
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"days": 3}
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("test_shared", "key", compute) for _ in range(5))
+        )
+
+    coalesced = count(SINGLE_FLIGHT_COALESCED, "test_shared")
+    results = asyncio.run(scenario())
+    assert results == [{"days": 3}] * 5
+    assert len(calls) == 1
+    assert count(SINGLE_FLIGHT_COALESCED, "test_shared") - coalesced == 4
+    assert flight.calls == {}
+
+
+def test_errors_reach_every_caller_and_are_not_kept():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("broken")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flight.do("test_error", "key", compute) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    assert [type(result) for result in asyncio.run(scenario())] == [ValueError] * 3
+    assert [type(result) for result in asyncio.run(scenario())] == [ValueError] * 3
+    assert len(calls) == 2
+
+
+def test_timeout_does_not_cancel_the_computation_for_others():
+    flight = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("test_timeout", "key", compute, timeout=0.01),
+            flight.do("test_timeout", "key", compute),
+            return_exceptions=True,
+        )
+
+    timeouts = count(SINGLE_FLIGHT_TIMEOUTS, "test_timeout")
+    impatient, patient = asyncio.run(scenario())
+    assert isinstance(impatient, TimeoutError)
+    assert patient == "done"
+    assert count(SINGLE_FLIGHT_TIMEOUTS, "test_timeout") - timeouts == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_identical_summary_requests_are_coalesced(visits, user_headers, monkeypatch):
+    load_summary = me.load_summary
+
+    def slow_load_summary(*args):
+        time.sleep(0.1)
+        return load_summary(*args)
+
+    monkeypatch.setattr(me, "load_summary", slow_load_summary)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            return await asyncio.gather(
+                *(
+                    c.get(
+                        PREFIX_API_V1 + "/me/summary/",
+                        headers=user_headers,
+                        params={"start_dt": "2024-01-01", "end_dt": "2024-12-31"},
+                    )
+                    for _ in range(4)
+                )
+            )
+
+    computations = count(SINGLE_FLIGHT_COMPUTATIONS, "summary")
+    responses = asyncio.run(scenario())
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.text for response in responses}) == 1
+    assert count(SINGLE_FLIGHT_COMPUTATIONS, "summary") - computations == 1
+
+
+@pytest.mark.usefixtures("client")
+def test_summary_after_a_write_sees_it(
+    user, countries, visits, user_headers, monkeypatch
+):
+    load_summary = me.load_summary
+
+    def slow_load_summary(*args):
+        # Reads before the write below commits, then takes a while
+        result = load_summary(*args)
+        time.sleep(0.2)
+        return result
+
+    monkeypatch.setattr(me, "load_summary", slow_load_summary)
+    params = {"start_dt": "2024-01-01", "end_dt": "2024-12-31"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+            before = asyncio.create_task(
+                c.get(
+                    PREFIX_API_V1 + "/me/summary/", headers=user_headers, params=params
+                )
+            )
+            await asyncio.sleep(0.05)
+            written = await c.post(
+                PREFIX_API_V1 + "/visits/",
+                json={
+                    "start": "2024-03-01",
+                    "end": "2024-03-05",
+                    "user_id": str(user.id),
+                    "country_id": countries[0].id,
+                },
+            )
+            after = await c.get(
+                PREFIX_API_V1 + "/me/summary/", headers=user_headers, params=params
+            )
+            return await before, written, after
+
+    before, written, after = asyncio.run(scenario())
+    assert written.status_code == 200
+
+    def france(response):
+        rows = response.json()["summary"]
+        return next(row["days"] for row in rows if row["country_name"] == "France")
+
+    assert france(before) == 10
+    assert france(after) == 15
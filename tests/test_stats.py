@@ -0,0 +1,124 @@
+from datetime import date
+
+from sqlmodel import select
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import CountryMonthStat, CountryMonthUser
+from getdigitalnomadapi.stats import contributions, rebuild_stats
+
+
+def snapshot(session):
+    stats = session.exec(
+        select(
+            CountryMonthStat.country_id,
+            CountryMonthStat.month,
+            CountryMonthStat.visits,
+            CountryMonthStat.stay_days,
+            CountryMonthStat.days,
+            CountryMonthStat.users,
+        )
+    ).all()
+    members = session.exec(select(*CountryMonthUser.__table__.columns)).all()
+    return sorted(tuple(stat) for stat in stats), sorted(
+        tuple(member) for member in members
+    )
+
+
+def test_contributions_split_by_month():
+    row = (None, 7, date(2024, 1, 30), date(2024, 3, 2))
+    assert contributions(row) == [
+        (7, date(2024, 1, 1), 1, 33, 2),
+        (7, date(2024, 2, 1), 0, 0, 29),
+        (7, date(2024, 3, 1), 0, 0, 2),
+    ]
+    assert contributions((None, 7, date(2024, 1, 30), None)) == []
+
+
+def test_visit_writes_update_stats(client, session, user, admin, countries, visits):
+    rebuild_stats(session)  # fixture visits bypass the write paths
+    france = countries[0]
+    response = client.post(
+        PREFIX_API_V1 + "/visits/",
+        json={
+            "start": "2024-01-20",
+            "end": "2024-02-02",
+            "user_id": str(admin.id),
+            "country_id": france.id,
+        },
+    )
+    assert response.status_code == 200
+    january = session.get(CountryMonthStat, (france.id, date(2024, 1, 1)))
+    assert (january.visits, january.stay_days, january.days, january.users) == (
+        2,
+        24,
+        22,
+        2,
+    )
+
+    client.patch(PREFIX_API_V1 + f"/visits/{visits[0].id}", json={"end": "2024-01-05"})
+    client.delete(PREFIX_API_V1 + f"/visits/{response.json()['id']}")
+    session.expire_all()
+    january = session.get(CountryMonthStat, (france.id, date(2024, 1, 1)))
+    assert (january.visits, january.stay_days, january.days, january.users) == (
+        1,
+        5,
+        5,
+        1,
+    )
+    assert session.get(CountryMonthStat, (france.id, date(2024, 2, 1))).users == 0
+
+    incremental = snapshot(session)
+    rebuild_stats(session)
+    rebuilt = snapshot(session)
+    # Months emptied by deletes stay as zero rows incrementally
+    assert [row for row in incremental[0] if any(row[2:])] == rebuilt[0]
+    assert incremental[1] == rebuilt[1]
+
+
+def test_user_and_country_deletes_update_stats(
+    client, session, user, admin, countries, visits
+):
+    france, spain, _ = countries
+    for visit in (
+        {"start": "2024-01-20", "end": "2024-02-02", "country_id": france.id},
+        {"start": "2024-03-01", "end": "2024-03-10", "country_id": spain.id},
+    ):
+        client.post(
+            PREFIX_API_V1 + "/visits/", json={**visit, "user_id": str(admin.id)}
+        )
+    rebuild_stats(session)
+
+    assert client.delete(PREFIX_API_V1 + f"/users/{user.id}").status_code == 200
+    assert client.delete(PREFIX_API_V1 + f"/countries/{spain.id}").status_code == 200
+    session.expire_all()
+    january = session.get(CountryMonthStat, (france.id, date(2024, 1, 1)))
+    # Both visits still count, only the admin as a user
+    assert (january.visits, january.users) == (2, 1)
+
+    incremental = snapshot(session)
+    rebuild_stats(session)
+    rebuilt = snapshot(session)
+    assert [row for row in incremental[0] if any(row[2:])] == rebuilt[0]
+    assert incremental[1] == rebuilt[1]
+
+
+def test_read_stats(client, session, visits, countries):
+    rebuild_stats(session)
+    france, spain, uk = countries
+
+    ranking = client.get(PREFIX_API_V1 + "/stats/countries").json()
+    assert {row["country_code"] for row in ranking} == {"FR", "ES", "GB"}
+    uk_row = next(row for row in ranking if row["country_id"] == uk.id)
+    assert (uk_row["visits"], uk_row["days"], uk_row["avg_stay_days"]) == (1, 30, 30)
+
+    months = client.get(PREFIX_API_V1 + f"/stats/countries/{uk.id}").json()
+    assert [(row["month"], row["days"]) for row in months] == [
+        ("2024-01-01", 21),
+        ("2024-02-01", 9),
+    ]
+
+    schengen = client.get(PREFIX_API_V1 + "/stats/schengen").json()
+    assert schengen == [
+        {"month": "2024-01-01", "schengen_days": 10, "days": 31, "share": 0.3226},
+        {"month": "2024-02-01", "schengen_days": 20, "days": 29, "share": 0.6897},
+    ]
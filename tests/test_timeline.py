@@ -0,0 +1,68 @@
+from datetime import date
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.timeline import (
+    build_timeline,
+    decode_timeline_binary,
+    encode_timeline_binary,
+)
+
+
+def test_build_timeline_gaps_and_overlaps():
+    rows = [
+        (1, date(2024, 1, 3), date(2024, 1, 5)),
+        (2, date(2024, 1, 5), date(2024, 1, 6)),
+        (2, date(2024, 1, 7), None),
+    ]
+    segments = build_timeline(rows, date(2024, 1, 1), date(2024, 1, 10))
+    assert segments == [
+        [None, date(2024, 1, 1), 2],
+        [1, date(2024, 1, 3), 2],
+        [[1, 2], date(2024, 1, 5), 1],
+        [2, date(2024, 1, 6), 5],
+    ]
+    assert sum(run_length for _, _, run_length in segments) == 10
+
+
+def test_build_timeline_clips_to_range():
+    rows = [(1, date(2023, 12, 1), date(2024, 2, 1))]
+    assert build_timeline(rows, date(2024, 1, 1), date(2024, 1, 31)) == [
+        [1, date(2024, 1, 1), 31]
+    ]
+
+
+def test_binary_round_trip():
+    segments = [
+        [None, date(2024, 1, 1), 2],
+        [1, date(2024, 1, 3), 2],
+        [[1, 2], date(2024, 1, 5), 1],
+    ]
+    data = encode_timeline_binary(segments, date(2024, 1, 1))
+    assert decode_timeline_binary(data) == (date(2024, 1, 1), segments)
+
+
+def test_read_me_timeline(client, visits, user_headers, countries):
+    france, spain, uk = countries
+    response = client.get(
+        PREFIX_API_V1 + "/me/timeline",
+        headers=user_headers,
+        params={"start_dt": "2023-12-30", "end_dt": "2024-03-02"},
+    )
+    assert response.status_code == 200
+    assert response.json()["segments"] == [
+        [None, "2023-12-30", 2],
+        [france.id, "2024-01-01", 10],
+        [uk.id, "2024-01-11", 30],
+        [spain.id, "2024-02-10", 20],
+        [None, "2024-03-01", 2],
+    ]
+
+    response = client.get(
+        PREFIX_API_V1 + "/me/timeline",
+        headers=user_headers,
+        params={"format": "binary"},
+    )
+    assert response.headers["content-type"] == "application/octet-stream"
+    start_dt, segments = decode_timeline_binary(response.content)
+    assert start_dt == date(2024, 1, 1)
+    assert [state for state, _, _ in segments] == [france.id, uk.id, spain.id]
@@ -0,0 +1,30 @@
+from datetime import date
+
+from getdigitalnomadapi.models import Visit
+from getdigitalnomadapi.presence import OPEN_END_DAY
+from getdigitalnomadapi.visitdays import VisitDays, fetch_visit_days, to_date
+
+
+def test_fetch_matches_the_orm(session, user, countries, visits):
+    france, spain, uk = countries
+    session.add(Visit(start=date(2024, 3, 1), user=user, country=france))
+    session.add(Visit(start=date(2024, 3, 5), end=date(2024, 3, 6), user=user))
+    session.commit()
+
+    fetched = fetch_visit_days(session, user.id)
+    expected = VisitDays.from_rows(
+        (visit.country_id, visit.start, visit.end)
+        for visit in sorted(user.visits, key=lambda visit: visit.start)
+        if visit.country_id is not None
+    )
+    for column in ("country_id", "start", "end"):
+        assert getattr(fetched, column).tolist() == getattr(expected, column).tolist()
+    assert fetched.end[-1] == OPEN_END_DAY
+    assert to_date(fetched.start[0]) == date(2024, 1, 1)
+
+    window = fetch_visit_days(session, user.id, date(2024, 2, 1), date(2024, 2, 15))
+    assert window.country_id.tolist() == [uk.id, spain.id]
+    schengen = fetch_visit_days(session, user.id, schengen=True)
+    assert set(schengen.country_id.tolist()) == {
+        country.id for country in countries if country.schengen
+    }
@@ -0,0 +1,128 @@
+from datetime import date
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Visit
+from getdigitalnomadapi.overlaps import scan_overlaps
+from getdigitalnomadapi.routers import visits as visits_router
+
+
+def post_visit(client, user, country, start, end):
+    return client.post(
+        PREFIX_API_V1 + "/visits/",
+        json={
+            "start": start,
+            "end": end,
+            "user_id": str(user.id),
+            "country_id": country.id,
+        },
+    )
+
+
+def test_create_visit(client, user, countries):
+    response = post_visit(client, user, countries[0], "2025-01-01", "2025-01-05")
+    assert response.status_code == 200
+    assert response.json()["country_id"] == countries[0].id
+
+
+def test_create_overlapping_visit_rejected(client, user, countries, visits):
+    response = post_visit(client, user, countries[1], "2024-01-05", "2024-01-12")
+    assert response.status_code == 409
+    conflicts = response.json()["detail"]["conflicts"]
+    assert [conflict["id"] for conflict in conflicts] == [visits[0].id, visits[1].id]
+
+
+def test_create_visit_end_before_start(client, user, countries):
+    response = post_visit(client, user, countries[0], "2025-01-05", "2025-01-01")
+    assert response.status_code == 422
+
+
+def test_update_visit_into_overlap_rejected(client, visits):
+    response = client.patch(
+        PREFIX_API_V1 + f"/visits/{visits[0].id}", json={"end": "2024-01-20"}
+    )
+    assert response.status_code == 409
+
+
+def test_create_overlapping_visit_merged(client, user, countries, visits, monkeypatch):
+    monkeypatch.setattr(visits_router, "VISIT_OVERLAP_POLICY", "merge")
+    response = post_visit(client, user, countries[0], "2023-12-25", "2024-01-03")
+    assert response.status_code == 200
+    assert response.json()["start"] == "2023-12-25"
+    assert response.json()["end"] == "2024-01-10"
+    assert client.get(PREFIX_API_V1 + f"/visits/{visits[0].id}").status_code == 404
+
+
+def test_merge_notifies_and_rechecks(
+    client, session, user, countries, visits, monkeypatch
+):
+    monkeypatch.setattr(visits_router, "VISIT_OVERLAP_POLICY", "merge")
+    notified = []
+    monkeypatch.setattr(
+        visits_router,
+        "notify",
+        lambda action, visit_id, *_: notified.append((action, visit_id)),
+    )
+    france = countries[0]
+    response = post_visit(client, user, france, "2023-12-25", "2024-01-03")
+    merged_id = response.json()["id"]
+    assert notified == [("deleted", visits[0].id), ("created", merged_id)]
+
+    # Written directly, overlapping the UK visit from January 11
+    stretch = Visit(
+        start=date(2024, 1, 5), end=date(2024, 1, 15), user=user, country=france
+    )
+    session.add(stretch)
+    session.commit()
+    # Merging the first overlap reaches the stretch, merging that the UK visit
+    response = post_visit(client, user, france, "2023-12-20", "2023-12-26")
+    assert response.status_code == 409
+    conflicts = response.json()["detail"]["conflicts"]
+    assert [conflict["id"] for conflict in conflicts] == [visits[1].id]
+    assert client.get(PREFIX_API_V1 + f"/visits/{merged_id}").status_code == 200
+
+
+def test_scan_overlaps():
+    rows = [
+        (1, "a", date(2024, 1, 1), date(2024, 1, 31)),
+        (2, "a", date(2024, 1, 10), date(2024, 1, 12)),
+        (3, "a", date(2024, 1, 20), None),
+        (4, "a", date(2024, 3, 1), date(2024, 3, 2)),
+        (5, "b", date(2024, 1, 1), date(2024, 1, 2)),
+        (6, "b", date(2024, 1, 3), date(2024, 1, 4)),
+    ]
+    overlaps = scan_overlaps(rows)
+    assert [(o["visit_id"], o["overlapping_visit_id"]) for o in overlaps] == [
+        (2, 1),
+        (3, 1),
+        (4, 3),
+    ]
+    assert overlaps[1]["end"] == date(2024, 1, 31)
+    assert overlaps[2]["end"] == date(2024, 3, 2)
+
+
+def test_admin_visit_overlaps(client, session, user, countries, visits, admin_headers):
+    # Written directly, bypassing the write path checks
+    session.add(
+        Visit(start=date(2024, 2, 1), end=None, user=user, country=countries[0])
+    )
+    session.commit()
+    response = client.get(
+        PREFIX_API_V1 + "/admin/visits/overlaps", headers=admin_headers
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "user_id": str(user.id),
+            "visit_id": 4,
+            "overlapping_visit_id": visits[1].id,
+            "start": "2024-02-01",
+            "end": "2024-02-09",
+        },
+        {
+            "user_id": str(user.id),
+            "visit_id": visits[2].id,
+            "overlapping_visit_id": 4,
+            "start": "2024-02-10",
+            "end": "2024-02-29",
+        },
+    ]
@@ -0,0 +1,65 @@
+import re
+
+from sqlalchemy import event
+
+from getdigitalnomadapi.main import PREFIX_API_V1
+from getdigitalnomadapi.models import Visit
+
+
+def visit_statements(engine) -> list[str]:
+    """Leading keyword of every statement touching the visit table"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        if re.search(r"\bvisit\b", statement.split("\n")[0]):
+            statements.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_country_writes(client, session, countries, visits):
+    france = countries[0]
+    url = PREFIX_API_V1 + "/countries/"
+    response = client.post(url, json={"name": "Portugal", "code": "PT"})
+    assert response.status_code == 200
+    assert response.json()["id"] and response.json()["created_at"]
+
+    response = client.patch(url + str(france.id), json={"schengen": False})
+    assert response.json()["schengen"] is False
+    assert response.json()["updated_at"] > response.json()["created_at"]
+    response = client.patch(url + str(france.id), json={"code": "ES"})
+    assert response.status_code == 422
+    assert client.patch(url + "999", json={"code": "XX"}).status_code == 404
+
+    assert client.delete(url + str(france.id)).json() == {"ok": True}
+    assert client.delete(url + str(france.id)).status_code == 404
+    session.expire_all()
+    assert session.get(Visit, visits[0].id).country_id is None
+
+
+def test_user_writes(client, session, user, visits):
+    url = PREFIX_API_V1 + f"/users/{user.id}"
+    response = client.patch(url, json={"full_name": "Renamed"})
+    assert response.json()["full_name"] == "Renamed"
+    assert response.json()["username"] == user.username
+
+    assert client.delete(url).json() == {"ok": True}
+    assert client.patch(url, json={"full_name": "Gone"}).status_code == 404
+    assert client.delete(url).status_code == 404
+    session.expire_all()
+    assert session.get(Visit, visits[0].id).user_id is None
+
+
+def test_visit_writes_are_single_statements(client, engine, visits):
+    statements = visit_statements(engine)
+    url = PREFIX_API_V1 + f"/visits/{visits[2].id}"
+    response = client.patch(url, json={"end": "2024-03-05"})
+    assert response.json()["end"] == "2024-03-05"
+    # load, overlap check, UPDATE ... RETURNING and no refresh
+    assert statements == ["SELECT", "SELECT", "UPDATE"]
+
+    statements.clear()
+    assert client.delete(url).json() == {"ok": True}
+    assert client.delete(url).status_code == 404
+    assert statements == ["DELETE", "DELETE"]